@@ -5,8 +5,17 @@ Usage:
   python3 scripts/collect-signals.py [--agent all|claude|codex|qwen|antigravity|iflow]
                                       [--host user@host] [--days 30] [--issues]
                                       [--output data/signals.json]
+                                      [--state data/signals-state.json]
+                                      [--jobs 4]
+  python3 scripts/collect-signals.py --check-remote
+
+Remote hosts run this script with `--output -` and the caller parses its
+stdout as JSON, so status lines go to stderr. `--check-remote` runs that
+remote command locally, over a fixture log under a temporary HOME, and
+verifies the output parses and counts the fixture session.
 """
-import argparse, json, os, subprocess, sys
+import argparse, copy, hashlib, json, os, re, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -72,67 +81,423 @@ def discover_log_files(agent_root: Path, days: int) -> list:
     return log_files
 
 
-def analyze_log_files(log_files: list) -> dict:
-    """Extract skill triggers, command uses, and errors from log files."""
-    skill_signals = {s: {"triggered": 0, "errors": 0, "sessions": 0} for s in SKILL_NAMES}
-    command_signals = {c: {"uses": 0} for c in COMMAND_NAMES}
-    sessions_seen = set()
+ERROR_MARKERS = ('"type":"error"', '"type": "error"')
+STATE_VERSION = 2
+ANCHOR_BYTES = 64
+
+
+def _empty_counts() -> dict:
+    return {"skills": [], "error": False, "commands": {}}
+
+
+CHUNK_BYTES = 1 << 20
 
-    for f in log_files:
-        session_id = f.parent.name
+
+def _build_matcher():
+    """One regex for every skill name, command name and error marker.
+
+    The pattern is a lookahead, so a match is reported at every start
+    position (overlapping matches included). Alternatives are ordered longest
+    first; a match also credits every shorter pattern that is a prefix of it
+    (e.g. "/diagnose-openclaw" also counts "/diagnose"), which reproduces
+    per-name str.count() results in a single pass.
+    """
+    patterns = [(s.encode(), "skill", s) for s in SKILL_NAMES]
+    patterns += [(c.encode(), "command", c) for c in COMMAND_NAMES]
+    patterns += [(m.encode(), "error", m) for m in ERROR_MARKERS]
+    ordered = sorted({p for p, _, _ in patterns}, key=len, reverse=True)
+    regex = re.compile(b"(?=(" + b"|".join(re.escape(p) for p in ordered) + b"))")
+    credits = {
+        token: [(kind, name) for p, kind, name in patterns if token.startswith(p)]
+        for token in ordered
+    }
+    return regex, credits, max(len(p) for p in ordered)
+
+
+MATCHER, MATCH_CREDITS, MAX_TOKEN_BYTES = _build_matcher()
+
+
+def _credited(data: bytes, limit: int = None):
+    """(kind, name) for every match starting before `limit`, prefix credits included.
+
+    Both the text and the JSONL event parsers count through this, so the
+    same log gives the same command/skill signals whichever path reads it.
+    """
+    for m in MATCHER.finditer(data):
+        if limit is not None and m.start() >= limit:
+            break
+        yield from MATCH_CREDITS[m.group(1)]
+
+
+def _stream_counts(fh, start: int, end: int) -> dict:
+    """Count matches in bytes [start, end) reading fixed-size chunks.
+
+    The last MAX_TOKEN_BYTES - 1 bytes of each chunk are carried into the next
+    one, and matches starting in that carried region are deferred, so tokens
+    split across chunk boundaries are counted exactly once.
+    """
+    skills, commands, error = set(), {}, False
+    overlap = MAX_TOKEN_BYTES - 1
+    carry = b""
+    fh.seek(start)
+    remaining = end - start
+    while True:
+        chunk = fh.read(min(CHUNK_BYTES, remaining)) if remaining > 0 else b""
+        remaining -= len(chunk)
+        data = carry + chunk
+        final = not chunk or remaining <= 0
+        limit = len(data) if final else max(0, len(data) - overlap)
+        for kind, name in _credited(data, limit):
+            if kind == "command":
+                commands[name] = commands.get(name, 0) + 1
+            elif kind == "skill":
+                skills.add(name)
+            else:
+                error = True
+        if final:
+            break
+        carry = data[limit:]
+    return {"skills": sorted(skills), "error": error, "commands": commands}
+
+
+def _find_cut(fh, start: int, end: int) -> int:
+    """Offset just past the last newline in [start, end), or start if none."""
+    pos = end
+    while pos > start:
+        block_start = max(start, pos - 65536)
+        fh.seek(block_start)
+        idx = fh.read(pos - block_start).rfind(b"\n")
+        if idx >= 0:
+            return block_start + idx + 1
+        pos = block_start
+    return start
+
+
+# A JSONL line is only decoded when it could change the result: it names a
+# skill/command, mentions an error, or may start a new user turn.
+EVENT_FILTER = re.compile(b"|".join(
+    re.escape(t.encode()) for t in SKILL_NAMES + COMMAND_NAMES + ['"user"', "error"]))
+
+
+def _empty_events() -> dict:
+    return {"sessions": {}, "turn": None}
+
+
+def _record_blocks(rec: dict) -> list:
+    msg = rec.get("message") or rec.get("payload") or rec
+    content = msg.get("content") if isinstance(msg, dict) else None
+    return [b for b in content if isinstance(b, dict)] if isinstance(content, list) else []
+
+
+def _record_role(rec: dict):
+    msg = rec.get("message") or rec.get("payload")
+    if isinstance(msg, dict) and msg.get("role"):
+        return msg["role"]
+    return rec.get("role") or rec.get("type")
+
+
+def _is_error(rec: dict, blocks: list) -> bool:
+    if rec.get("type") == "error" or rec.get("level") == "error":
+        return True
+    return any(b.get("type") == "error" or b.get("is_error") is True for b in blocks)
+
+
+def _starts_turn(rec: dict, blocks: list) -> bool:
+    """A user message opens a turn; tool results sent back as user records do not."""
+    if _record_role(rec) != "user":
+        return False
+    return not (blocks and all(b.get("type") == "tool_result" for b in blocks))
+
+
+def _close_turn(events: dict) -> None:
+    """Close the open turn; each skill/command used in it gets one trigger,
+    plus one error if any record of the turn failed."""
+    turn, events["turn"] = events["turn"], None
+    if not turn:
+        return
+    sess = events["sessions"].setdefault(
+        turn["session"], {"turns": 0, "errors": 0, "skills": {}, "commands": {}})
+    sess["turns"] += 1
+    sess["errors"] += turn["errors"]
+    for group, key, names in (("skills", "triggered", turn["skills"]),
+                              ("commands", "uses", turn["commands"])):
+        for name in names:
+            counts = sess[group].setdefault(name, {key: 0, "errors": 0})
+            counts[key] += 1
+            counts["errors"] += bool(turn["errors"])
+
+
+def _scan_events(fh, start: int, end: int, events: dict, default_session: str) -> None:
+    """Fold the JSONL records in [start, end) into events, one line at a time.
+
+    A turn runs from one user message to the next; it stays open in
+    events["turn"] across runs until the next user message (or a session
+    change) closes it.
+    """
+    fh.seek(start)
+    pos = start
+    while pos < end:
+        line = fh.readline()
+        pos += len(line)
+        if not EVENT_FILTER.search(line):
+            continue
         try:
-            content = f.read_text(errors="ignore")
-        except OSError:
+            rec = json.loads(line)
+        except (UnicodeDecodeError, json.JSONDecodeError):
             continue
-
-        sessions_seen.add(session_id)
-        for skill in SKILL_NAMES:
-            if skill in content:
-                skill_signals[skill]["triggered"] += 1
-            if '"type":"error"' in content or '"type": "error"' in content:
+        if not isinstance(rec, dict):
+            continue
+        blocks = _record_blocks(rec)
+        session = str(rec.get("sessionId") or rec.get("session_id") or default_session)
+        turn = events["turn"]
+        if turn and (turn["session"] != session or _starts_turn(rec, blocks)):
+            _close_turn(events)
+            turn = None
+        if turn is None:
+            turn = events["turn"] = {"session": session, "skills": [], "commands": [], "errors": 0}
+        for kind, name in _credited(line):
+            group = turn["skills"] if kind == "skill" else turn["commands"] if kind == "command" else None
+            if group is not None and name not in group:
+                group.append(name)
+        if _is_error(rec, blocks):
+            turn["errors"] += 1
+
+
+def _settled_sessions(events: dict) -> dict:
+    """Per-session counts with the still-open turn included."""
+    settled = {"sessions": copy.deepcopy(events["sessions"]), "turn": events["turn"]}
+    _close_turn(settled)
+    return settled["sessions"]
+
+
+def _merge_counts(base: dict, extra: dict) -> dict:
+    """Combine counts of two consecutive byte ranges of the same file."""
+    merged = {
+        "skills": sorted(set(base["skills"]) | set(extra["skills"])),
+        "error": base["error"] or extra["error"],
+        "commands": dict(base["commands"]),
+    }
+    for cmd, n in extra["commands"].items():
+        merged["commands"][cmd] = merged["commands"].get(cmd, 0) + n
+    return merged
+
+
+def _anchor(fh, offset: int) -> str:
+    """Checksum of the bytes just before offset, used to detect in-place rewrites."""
+    start = max(0, offset - ANCHOR_BYTES)
+    fh.seek(start)
+    return hashlib.sha1(fh.read(offset - start)).hexdigest()
+
+
+def scan_file(f: Path, entry: dict = None) -> tuple:
+    """Scan a log file from its stored cursor; return (entry, bytes_read).
+
+    Only complete lines advance the cursor. A trailing partial line is counted
+    into "tail" and re-read on the next run, so nothing is counted twice.
+    A new inode, a shrunk file or a changed anchor triggers a full rescan.
+    .jsonl files are parsed as events (see _scan_events); other logs are
+    scanned as text.
+    """
+    st = f.stat()
+    if entry and entry["inode"] == st.st_ino and entry["size"] == st.st_size \
+            and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry, 0
+
+    with open(f, "rb") as fh:
+        if not entry or entry["inode"] != st.st_ino or st.st_size < entry["offset"] \
+                or _anchor(fh, entry["offset"]) != entry["anchor"]:
+            entry = {"offset": 0, "counts": _empty_counts(), "events": _empty_events()}
+        start = entry["offset"]
+        offset = _find_cut(fh, start, st.st_size)
+        new_entry = {
+            "inode": st.st_ino,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "offset": offset,
+            "anchor": _anchor(fh, offset),
+        }
+        if f.suffix == ".jsonl":
+            # A trailing partial line is an incomplete record; it is parsed once complete.
+            events = copy.deepcopy(entry.get("events") or _empty_events())
+            _scan_events(fh, start, offset, events, f.stem)
+            new_entry["events"] = events
+        else:
+            new_entry["session"] = f.parent.name
+            new_entry["counts"] = _merge_counts(entry["counts"], _stream_counts(fh, start, offset))
+            new_entry["tail"] = _stream_counts(fh, offset, st.st_size)
+    return new_entry, st.st_size - start
+
+
+def aggregate_entries(entries: list) -> dict:
+    """Fold per-file entries into skill/command signals.
+
+    Event-parsed (.jsonl) entries contribute per-turn triggers and errors and
+    per-session counts. Text-scanned entries count one trigger per file and
+    charge a file's error only to the skills found in that file.
+    """
+    skill_signals = {s: {"triggered": 0, "errors": 0, "sessions": 0} for s in SKILL_NAMES}
+    command_signals = {c: {"uses": 0, "errors": 0} for c in COMMAND_NAMES}
+    session_signals = {}
+    sessions_seen = set()
+    skill_sessions = {s: set() for s in SKILL_NAMES}
+
+    for entry in entries:
+        if "events" in entry:
+            for sid, sess in _settled_sessions(entry["events"]).items():
+                sessions_seen.add(sid)
+                merged = session_signals.setdefault(sid, {"turns": 0, "errors": 0, "skills": {}, "commands": {}})
+                merged["turns"] += sess["turns"]
+                merged["errors"] += sess["errors"]
+                for skill, c in sess["skills"].items():
+                    skill_sessions[skill].add(sid)
+                    skill_signals[skill]["triggered"] += c["triggered"]
+                    skill_signals[skill]["errors"] += c["errors"]
+                    merged["skills"][skill] = merged["skills"].get(skill, 0) + c["triggered"]
+                for cmd, c in sess["commands"].items():
+                    command_signals[cmd]["uses"] += c["uses"]
+                    command_signals[cmd]["errors"] += c["errors"]
+                    merged["commands"][cmd] = merged["commands"].get(cmd, 0) + c["uses"]
+            continue
+        counts = _merge_counts(entry["counts"], entry.get("tail") or _empty_counts())
+        sessions_seen.add(entry["session"])
+        for skill in counts["skills"]:
+            skill_signals[skill]["triggered"] += 1
+            skill_sessions[skill].add(entry["session"])
+            if counts["error"]:
                 skill_signals[skill]["errors"] += 1
-        for cmd in COMMAND_NAMES:
-            command_signals[cmd]["uses"] += content.count(cmd)
+        for cmd, n in counts["commands"].items():
+            command_signals[cmd]["uses"] += n
 
-    total_sessions = len(sessions_seen)
     for skill in skill_signals:
-        skill_signals[skill]["sessions"] = total_sessions
+        skill_signals[skill]["sessions"] = len(skill_sessions[skill])
 
     return {"skill_signals": skill_signals, "command_signals": command_signals,
-            "sessions_total": total_sessions}
+            "session_signals": session_signals, "sessions_total": len(sessions_seen)}
+
+
+def _scan_job(job: tuple) -> tuple:
+    """Pool entry point: scan one file, returning (entry, bytes_read) or None."""
+    f, entry = job
+    try:
+        return scan_file(f, entry)
+    except OSError:
+        return None
 
 
-def collect_local(agents: list, days: int) -> dict:
-    """Collect from local agent log dirs."""
+def scan_files(log_files: list, state: dict = None, jobs: int = 1) -> list:
+    """Scan files (in a process pool when jobs > 1).
+
+    Returns one entry per input file, None for files that could not be read.
+
+    With a state dict, files are scanned incrementally from their stored
+    cursors and the state is updated in place.
+    """
+    files_state = state.setdefault("files", {}) if state is not None else {}
+    stats = state.setdefault("last_run", {}) if state is not None else {}
+    work = [(f, files_state.get(str(f))) for f in log_files]
+    if jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(work))) as pool:
+            results = list(pool.map(_scan_job, work, chunksize=max(1, len(work) // (jobs * 4))))
+    else:
+        results = [_scan_job(job) for job in work]
+
+    entries = []
+    for f, result in zip(log_files, results):
+        if result is None:
+            entries.append(None)
+            continue
+        entry, read = result
+        files_state[str(f)] = entry
+        entries.append(entry)
+        stats["bytes_read"] = stats.get("bytes_read", 0) + read
+        stats["files_scanned" if read else "files_skipped"] = \
+            stats.get("files_scanned" if read else "files_skipped", 0) + 1
+    return entries
+
+
+def analyze_log_files(log_files: list, state: dict = None, jobs: int = 1) -> dict:
+    """Extract skill triggers, command uses, and errors from log files."""
+    return aggregate_entries([e for e in scan_files(log_files, state, jobs) if e])
+
+
+def load_state(path: Path) -> dict:
+    """Load the incremental scan state; start fresh if missing or incompatible."""
+    try:
+        state = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return {"version": STATE_VERSION, "files": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "files": {}}
+    state["last_run"] = {}
+    return state
+
+
+def save_state(path: Path, state: dict, keep: set) -> None:
+    """Persist state, dropping files that left the window or disappeared."""
+    state["files"] = {k: v for k, v in state.get("files", {}).items() if k in keep}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    tmp.replace(path)
+
+
+def collect_local(agents: list, days: int, state: dict = None, jobs: int = 1) -> dict:
+    """Collect from local agent log dirs.
+
+    Files from every agent root go through one scan, so --jobs spreads the
+    pool across agents as well as files.
+    """
     all_skill = {s: {"triggered": 0, "errors": 0, "sessions": 0} for s in SKILL_NAMES}
-    all_cmd = {c: {"uses": 0} for c in COMMAND_NAMES}
+    all_cmd = {c: {"uses": 0, "errors": 0} for c in COMMAND_NAMES}
+    all_sessions = {}
     sources = []
     total_sessions = 0
 
+    per_agent = []
     for agent in agents:
         root = Path(AGENT_ROOTS.get(agent, f"~/.{agent}")).expanduser()
         if not root.exists():
             continue
         log_files = discover_log_files(root, days)
-        if not log_files:
-            continue
-        result = analyze_log_files(log_files)
+        if log_files:
+            per_agent.append((agent, log_files))
+    all_files = [f for _, files in per_agent for f in files]
+    all_entries = scan_files(all_files, state, jobs)
+    if state is not None:
+        state.setdefault("seen", set()).update(str(f) for f in all_files)
+
+    pos = 0
+    for agent, log_files in per_agent:
+        entries = [e for e in all_entries[pos:pos + len(log_files)] if e]
+        pos += len(log_files)
+        result = aggregate_entries(entries)
         sources.append(f"{agent}-local")
         total_sessions += result["sessions_total"]
         for s in SKILL_NAMES:
-            for k in ("triggered", "errors"):
+            for k in ("triggered", "errors", "sessions"):
                 all_skill[s][k] += result["skill_signals"][s][k]
         for c in COMMAND_NAMES:
-            all_cmd[c]["uses"] += result["command_signals"][c]["uses"]
-
-    for s in SKILL_NAMES:
-        all_skill[s]["sessions"] = total_sessions
+            for k in ("uses", "errors"):
+                all_cmd[c][k] += result["command_signals"][c][k]
+        all_sessions.update(result["session_signals"])
 
     return {"skill_signals": all_skill, "command_signals": all_cmd,
-            "sessions_total": total_sessions, "sources": sources}
+            "session_signals": all_sessions, "sessions_total": total_sessions, "sources": sources}
+
+
+def _remote_args(agents: list, days: int, jobs: int) -> list:
+    """Arguments a remote host runs this script with; its stdout must be the signals JSON only."""
+    return ["--agent", ",".join(agents), "--days", str(days), "--jobs", str(jobs), "--no-issues", "--output", "-"]
 
 
-def collect_remote(host: str, agents: list, days: int) -> dict:
+def _parse_remote(stdout: str) -> dict:
+    signals = json.loads(stdout)
+    if not isinstance(signals, dict) or "skill_signals" not in signals:
+        raise json.JSONDecodeError("not a signals document", stdout, 0)
+    return signals
+
+
+def collect_remote(host: str, agents: list, days: int, jobs: int = 1) -> dict:
     """Collect signals from a remote host via SSH."""
     script_path = Path(__file__).resolve()
     remote_tmp = "/tmp/collect-signals-remote.py"
@@ -141,18 +506,33 @@ def collect_remote(host: str, agents: list, days: int) -> dict:
         subprocess.run(["scp", "-q", str(script_path), f"{host}:{remote_tmp}"],
                        check=True, timeout=30)
         result = subprocess.run(
-            ["ssh", host, f"python3 {remote_tmp} --agent {','.join(agents)} --days {days} --no-issues --output -"],
+            ["ssh", host, " ".join(["python3", remote_tmp, *_remote_args(agents, days, jobs)])],
             capture_output=True, text=True, timeout=120
         )
         if result.returncode != 0:
             print(f"[warn] SSH {host} failed: {result.stderr.strip()}", file=sys.stderr)
             return {}
-        return json.loads(result.stdout)
+        return _parse_remote(result.stdout)
     except (subprocess.TimeoutExpired, subprocess.CalledProcessError, json.JSONDecodeError) as e:
         print(f"[warn] Remote collect from {host} failed: {e}", file=sys.stderr)
         return {}
 
 
+def _timed_remote(host: str, agents: list, days: int, jobs: int) -> tuple:
+    start = time.monotonic()
+    remote = collect_remote(host, agents, days, jobs)
+    return remote, {"seconds": round(time.monotonic() - start, 3), "ok": bool(remote)}
+
+
+def collect_hosts(hosts: list, agents: list, days: int, jobs: int = 1) -> list:
+    """Collect from up to `jobs` hosts at a time; return [(host, signals, timing)] in input order."""
+    if jobs > 1 and len(hosts) > 1:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(hosts))) as pool:
+            futures = [pool.submit(_timed_remote, h, agents, days, jobs) for h in hosts]
+            return [(h, *fut.result()) for h, fut in zip(hosts, futures)]
+    return [(h, *_timed_remote(h, agents, days, jobs)) for h in hosts]
+
+
 def collect_openclaw_version() -> dict:
     """Detect installed OpenClaw version and latest release."""
     local_version = None
@@ -194,19 +574,70 @@ def collect_openclaw_version() -> dict:
     }
 
 
-def merge_signals(base: dict, remote: dict) -> dict:
-    """Merge remote signals into base."""
+def merge_signals(base: dict, remote: dict, host: str = "remote") -> dict:
+    """Merge remote signals into base; remote session ids are prefixed with `host:`."""
     if not remote:
         return base
     for s in SKILL_NAMES:
         for k in ("triggered", "errors", "sessions"):
             base["skill_signals"][s][k] += remote.get("skill_signals", {}).get(s, {}).get(k, 0)
     for c in COMMAND_NAMES:
-        base["command_signals"][c]["uses"] += remote.get("command_signals", {}).get(c, {}).get("uses", 0)
+        for k in ("uses", "errors"):
+            base["command_signals"][c][k] += remote.get("command_signals", {}).get(c, {}).get(k, 0)
+    base["sessions_total"] = base.get("sessions_total", 0) + remote.get("sessions_total", 0)
+    # A bare session id is only unique per host; keep a remote session next to a local one with the same id.
+    base.setdefault("session_signals", {}).update(
+        (f"{host}:{sid}", sess) for sid, sess in remote.get("session_signals", {}).items())
     base["sources"] += remote.get("sources", [])
     return base
 
 
+CHECK_REMOTE_TIMEOUT = 120
+
+
+def _write_check_fixture(home: Path) -> None:
+    """One claude session that uses a skill and a command, under a throwaway HOME."""
+    log = home / ".claude" / "projects" / "check" / "session.jsonl"
+    log.parent.mkdir(parents=True)
+    log.write_text(json.dumps({"type": "user", "sessionId": "check", "message": {
+        "role": "user", "content": f"use {SKILL_NAMES[0]} and run {COMMAND_NAMES[0]}"}}) + "\n")
+
+
+def check_remote(jobs: int = 1) -> int:
+    """Run the remote collection command locally and parse it the way collect_remote does.
+
+    The command runs with HOME pointed at a fixture directory, so the check
+    is deterministic and never reads the developer's own agent logs.
+    """
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix="collect-signals-check-") as tmp:
+        _write_check_fixture(Path(tmp))
+        cmd = [sys.executable, str(Path(__file__).resolve()), *_remote_args(["claude"], 1, jobs)]
+        env = {**os.environ, "HOME": tmp, "USERPROFILE": tmp}
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=CHECK_REMOTE_TIMEOUT, env=env)
+        except subprocess.TimeoutExpired:
+            print(f"[collect-signals] remote command timed out after {CHECK_REMOTE_TIMEOUT}s", file=sys.stderr)
+            return 1
+    if result.returncode != 0:
+        print(f"[collect-signals] remote command failed: {result.stderr.strip()}", file=sys.stderr)
+        return 1
+    try:
+        signals = _parse_remote(result.stdout)
+    except json.JSONDecodeError as e:
+        print(f"[collect-signals] remote output is not signals JSON: {e}", file=sys.stderr)
+        return 1
+    skill = signals["skill_signals"].get(SKILL_NAMES[0], {})
+    command = signals.get("command_signals", {}).get(COMMAND_NAMES[0], {})
+    if signals.get("sessions_total") != 1 or not skill.get("triggered") or not command.get("uses"):
+        print(f"[collect-signals] remote output does not count the fixture session: "
+              f"sessions_total={signals.get('sessions_total')} {SKILL_NAMES[0]}={skill} {COMMAND_NAMES[0]}={command}",
+              file=sys.stderr)
+        return 1
+    print("[collect-signals] remote output OK (fixture session counted)", file=sys.stderr)
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--agent", default="all")
@@ -215,20 +646,34 @@ def main():
     parser.add_argument("--issues", action="store_true", default=True)
     parser.add_argument("--no-issues", dest="issues", action="store_false")
     parser.add_argument("--output", default="data/signals.json")
+    parser.add_argument("--state", help="Incremental scan state file; later runs only read appended bytes")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Parallel workers: log files are parsed in a process pool, hosts collected concurrently")
+    parser.add_argument("--check-remote", action="store_true",
+                        help="Run the command remote hosts run against a fixture HOME and verify its stdout parses as signals JSON")
     args = parser.parse_args()
 
     agents = list(AGENT_ROOTS.keys()) if args.agent == "all" else args.agent.split(",")
+    if args.check_remote:
+        sys.exit(check_remote(args.jobs))
 
-    print(f"[collect-signals] agents={agents} days={args.days} hosts={args.host}")
+    print(f"[collect-signals] agents={agents} days={args.days} hosts={args.host}", file=sys.stderr)
 
-    signals = collect_local(agents, args.days)
+    state = load_state(Path(args.state)) if args.state else None
+    signals = collect_local(agents, args.days, state, args.jobs)
     signals.setdefault("sources", [])
+    if state is not None:
+        save_state(Path(args.state), state, state.pop("seen", set()))
+        signals["scan_stats"] = state["last_run"]
 
-    for host in args.host:
-        remote = collect_remote(host, agents, args.days)
-        signals = merge_signals(signals, remote)
+    host_timings = {}
+    for host, remote, timing in collect_hosts(args.host, agents, args.days, args.jobs):
+        signals = merge_signals(signals, remote, host)
         if remote:
             signals["sources"].append(f"ssh:{host}")
+        host_timings[host] = timing
+    if host_timings:
+        signals["host_timings"] = host_timings
 
     signals["issues"] = collect_issues() if args.issues else []
     signals["openclaw_version"] = collect_openclaw_version()
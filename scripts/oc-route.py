@@ -2,17 +2,37 @@
 """Convenience wrapper for model-routing-governor route_openclaw_agent.py.
 
 Provides short presets for common scenarios while preserving full override support.
+Routing runs in-process by importing the skill's route_openclaw_agent module.
+
+`--bulk FILE` dispatches a JSONL file of messages in one process: every line
+is routed with one loaded policy, and `openclaw agent` calls run on a worker
+pool under per-agent / per-provider concurrency caps and a token-bucket rate
+limit. Input lines look like
+  {"id": "m1", "message": "...", "preset": "coding-cn", "labels": {...}, "to": "...", "session_id": "..."}
+(labels apply over the preset and the command-line label flags). Results are
+written as JSONL in completion order, followed by one {"type": "stats"} record.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import math
 import shlex
-import subprocess
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict
+from typing import Any, Deque, Dict, Iterator, List, Optional, TextIO, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SKILL_SCRIPTS = REPO_ROOT / "skills" / "model-routing-governor" / "scripts"
+sys.path.insert(0, str(SKILL_SCRIPTS))
+
+import route_openclaw_agent  # noqa: E402
+from router import LABEL_KEYS, Router  # noqa: E402
 
 
 PRESETS: Dict[str, Dict[str, str]] = {
@@ -75,22 +95,6 @@ PRESETS: Dict[str, Dict[str, str]] = {
 }
 
 
-LABEL_KEYS = [
-    "scene",
-    "sensitivity",
-    "task_type",
-    "modality",
-    "complexity",
-    "value",
-    "context_size",
-    "language",
-    "latency_budget",
-    "cost_budget",
-    "privacy_requirement",
-    "provider_preference",
-]
-
-
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="Shortcut wrapper for routed OpenClaw agent execution.",
@@ -100,6 +104,7 @@ def build_parser() -> argparse.ArgumentParser:
             "  oc-route.py sensitive-research -m '先给我一版调研框架' --pretty\n"
             "  oc-route.py coding-cn -m '重构这个模块并加测试' --run --pretty\n"
             "  oc-route.py research-cn --message '调研这个赛道' --run --to +15555550123 --deliver\n"
+            "  oc-route.py --bulk messages.jsonl --bulk-output results.jsonl --run --concurrency 8 --rate 2\n"
         ),
     )
     p.add_argument("preset", nargs="?", default="sensitive-research", help="Preset name (use --list-presets)")
@@ -107,8 +112,24 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("-m", "--message", help="Message text for OpenClaw agent")
     p.add_argument("--stdin-message", action="store_true", help="Read message body from stdin")
     p.add_argument("--run", action="store_true", help="Execute OpenClaw agent (default is dry-run)")
+    p.add_argument("--fallback", action="store_true", help="With --run, walk primary + fallbacks until one succeeds")
+    p.add_argument("--deadline", type=float, metavar="SECONDS", help="Overall budget for --fallback attempts")
+    p.add_argument("--model-flag", help="openclaw agent option that pins the routed model (e.g. --model-flag=--model); needed by --fallback")
+    p.add_argument("--hedge", action="store_true", help="With --run, race the first fallback against a slow primary (needs --model-flag)")
+    p.add_argument("--hedge-delay", type=float, metavar="SECONDS", help="--hedge: race the first fallback after SECONDS")
+    p.add_argument("--hedge-percentile", type=int, choices=[50, 90, 99], help="--hedge: telemetry latency percentile for the default delay")
+    p.add_argument("--hedge-cap", type=int, help="Concurrent hedges allowed per provider on this host")
+    p.add_argument("--openclaw-bin", help="openclaw executable to run (e.g. a fake for testing)")
+    p.add_argument("--stream", choices=["raw", "ndjson"], help="With --run, forward agent output as it arrives")
+    p.add_argument("--adaptive", action="store_true", help="Order candidates by observed latency/failures (telemetry)")
+    p.add_argument("--telemetry", metavar="FILE", help="Telemetry database (default: $OC_ROUTE_TELEMETRY)")
+    p.add_argument("--no-telemetry", action="store_true", help="Do not record executed attempts")
     p.add_argument("--pretty", action="store_true", help="Pretty-print JSON output")
     p.add_argument("--show-command", action="store_true", help="Print delegated command before execution")
+    p.add_argument("--router-socket", help="Router daemon socket passed through to route_openclaw_agent.py")
+    p.add_argument("--no-daemon", action="store_true", help="Skip the router daemon and route in-process")
+    p.add_argument("--trace", action="store_true", help="Include per-phase timings in the output")
+    p.add_argument("--profile", metavar="FILE", help="Write cProfile stats for the routed run to FILE")
 
     for key in LABEL_KEYS:
         cli = "--" + key.replace("_", "-")
@@ -121,6 +142,15 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--timeout", type=int)
     p.add_argument("--thinking", choices=["off", "minimal", "low", "medium", "high"])
     p.add_argument("--json-output", action="store_true", help="Pass --json to openclaw agent")
+
+    bulk = p.add_argument_group("bulk dispatch")
+    bulk.add_argument("--bulk", metavar="FILE", help="JSONL messages to route (and with --run, execute); '-' reads stdin")
+    bulk.add_argument("--bulk-output", metavar="FILE", help="JSONL results file (default: stdout)")
+    bulk.add_argument("--concurrency", type=int, default=4, help="Concurrent openclaw agent calls (default: 4)")
+    bulk.add_argument("--per-agent", type=int, default=2, help="Concurrent calls per agent (default: 2)")
+    bulk.add_argument("--per-provider", type=int, default=2, help="Concurrent calls per primary model provider (default: 2)")
+    bulk.add_argument("--rate", type=float, help="Max call starts per second (token bucket; default: unlimited)")
+    bulk.add_argument("--burst", type=int, default=1, help="Token bucket size for --rate (default: 1)")
     return p
 
 
@@ -131,30 +161,13 @@ def print_presets() -> None:
         print(f"  {name:18} {labels}")
 
 
-def main() -> None:
-    args = build_parser().parse_args()
-    if args.list_presets:
-        print_presets()
-        return
-
-    if args.preset not in PRESETS:
-        print(f"Unknown preset: {args.preset}", file=sys.stderr)
-        print("Use --list-presets to see valid values.", file=sys.stderr)
-        sys.exit(2)
-
-    repo_root = Path(__file__).resolve().parents[1]
-    route_script = repo_root / "skills" / "model-routing-governor" / "scripts" / "route_openclaw_agent.py"
-    if not route_script.exists():
-        print(f"Missing route script: {route_script}", file=sys.stderr)
-        sys.exit(2)
+def _flag_labels(args: argparse.Namespace) -> Dict[str, str]:
+    return {key: getattr(args, key) for key in LABEL_KEYS if getattr(args, key) is not None}
 
-    labels = dict(PRESETS[args.preset])
-    for key in LABEL_KEYS:
-        val = getattr(args, key)
-        if val is not None:
-            labels[key] = val
 
-    cmd = [sys.executable, str(route_script), "--labels-json", json.dumps(labels)]
+def _delegate_argv(args: argparse.Namespace, labels: Dict[str, str]) -> List[str]:
+    """route_openclaw_agent.py arguments equivalent to these oc-route options."""
+    cmd = ["--labels-json", json.dumps(labels)]
     if args.message:
         cmd.extend(["--message", args.message])
     if args.stdin_message:
@@ -173,10 +186,296 @@ def main() -> None:
         cmd.extend(["--thinking", args.thinking])
     if args.json_output:
         cmd.append("--json-output")
+    if args.router_socket:
+        cmd.extend(["--router-socket", args.router_socket])
+    if args.no_daemon:
+        cmd.append("--no-daemon")
+    if args.trace:
+        cmd.append("--trace")
+    if args.profile:
+        cmd.extend(["--profile", args.profile])
     if args.pretty:
         cmd.append("--pretty")
     if args.run:
         cmd.append("--run")
+    if args.fallback:
+        cmd.append("--fallback")
+    if args.deadline is not None:
+        cmd.extend(["--deadline", str(args.deadline)])
+    if args.model_flag:
+        cmd.append(f"--model-flag={args.model_flag}")
+    if args.hedge:
+        cmd.append("--hedge")
+    if args.hedge_delay is not None:
+        cmd.extend(["--hedge-delay", str(args.hedge_delay)])
+    if args.hedge_percentile is not None:
+        cmd.extend(["--hedge-percentile", str(args.hedge_percentile)])
+    if args.hedge_cap is not None:
+        cmd.extend(["--hedge-cap", str(args.hedge_cap)])
+    if args.openclaw_bin:
+        cmd.extend(["--openclaw-bin", args.openclaw_bin])
+    if args.stream:
+        cmd.extend(["--stream", args.stream])
+    if args.adaptive:
+        cmd.append("--adaptive")
+    if args.telemetry:
+        cmd.extend(["--telemetry", args.telemetry])
+    if args.no_telemetry:
+        cmd.append("--no-telemetry")
+    return cmd
+
+
+class _TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                pause = (1 - self.tokens) / self.rate
+            time.sleep(pause)
+            waited += pause
+
+
+class _Limits:
+    """Per-agent / per-provider in-flight counts, claimed and released by the bulk dispatcher."""
+
+    def __init__(self, per_agent: int, per_provider: int, bucket: Optional[_TokenBucket]) -> None:
+        self.caps = {"agent": max(1, per_agent), "provider": max(1, per_provider)}
+        self.bucket = bucket
+        self.inflight: Dict[Tuple[str, str], int] = {}
+
+    def free(self, agent: str, provider: str) -> bool:
+        return (self.inflight.get(("agent", agent), 0) < self.caps["agent"]
+                and self.inflight.get(("provider", provider), 0) < self.caps["provider"])
+
+    def claim(self, agent: str, provider: str) -> None:
+        """Wait for a rate token (no slots held yet), then take one slot for agent and provider."""
+        if self.bucket is not None:
+            self.bucket.acquire()
+        for key in (("agent", agent), ("provider", provider)):
+            self.inflight[key] = self.inflight.get(key, 0) + 1
+
+    def release(self, agent: str, provider: str) -> None:
+        for key in (("agent", agent), ("provider", provider)):
+            self.inflight[key] -= 1
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 1)
+
+    return {"p50": rank(0.50), "p90": rank(0.90), "p99": rank(0.99), "max": round(ordered[-1], 1)}
+
+
+def _bulk_items(handle: TextIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    for index, raw in enumerate(handle):
+        if not raw.strip():
+            continue
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            yield index, None, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(item, dict) or not item.get("message"):
+            yield index, None, "each line needs an object with a non-empty 'message'"
+            continue
+        yield index, item, None
+
+
+def run_bulk(args: argparse.Namespace) -> int:
+    """Route every message with one policy load and run the calls on a bounded pool."""
+    base = route_openclaw_agent._parse_args(_delegate_argv(args, {}) + ["--message", "-"])
+    adaptive = None
+    if base.adaptive:
+        from telemetry import load_adaptive_scores
+        adaptive = load_adaptive_scores(base.telemetry)
+    router = Router.from_files(base.policy, base.aliases, snapshot=True, adaptive=adaptive)
+    agent_cfg = route_openclaw_agent.load_json(Path(base.agent_routing))
+    providers = {name: meta.get("provider", name.split("/", 1)[0]) for name, meta in router.policy.get("models", {}).items()}
+    bucket = _TokenBucket(args.rate, args.burst) if args.rate else None
+    limits = _Limits(args.per_agent, args.per_provider, bucket)
+    flag_labels = _flag_labels(args)
+
+    def plan(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        preset = item.get("preset", args.preset)
+        if preset not in PRESETS:
+            raise ValueError(f"unknown preset: {preset}")
+        labels = {**PRESETS[preset], **flag_labels, **(item.get("labels") or {})}
+        routed = router.route(labels)
+        pick = route_openclaw_agent._pick_agent(agent_cfg, routed["labels"])
+        thinking = route_openclaw_agent._pick_thinking(agent_cfg, routed["labels"], item.get("thinking") or args.thinking)
+        ns = argparse.Namespace(**vars(base))
+        ns.message = item["message"]
+        for key in ("to", "session_id", "timeout"):
+            if item.get(key) is not None:
+                setattr(ns, key, item[key])
+        primary = routed.get("primary") or ""
+        return {
+            "ns": ns,
+            "record": {
+                "type": "result",
+                "index": index,
+                "id": item.get("id", index),
+                "agent": pick["agent"],
+                "agent_rule": pick.get("matched_rule"),
+                "thinking": thinking,
+                "primary": primary,
+                "provider": providers.get(primary, primary.split("/", 1)[0]),
+                "fallbacks": routed.get("fallbacks", []),
+                "openclaw_command": route_openclaw_agent._build_openclaw_cmd(ns, pick["agent"], thinking, primary if ns.model_flag else None),
+                "executed": False,
+            },
+            "routed": routed,
+        }
+
+    def execute(job: Dict[str, Any], submitted: float) -> Dict[str, Any]:
+        ns, record = job["ns"], job["record"]
+
+        def call() -> Dict[str, Any]:
+            started = time.monotonic()
+            if ns.fallback:
+                attempt_plan = route_openclaw_agent._attempt_plan(ns, job["routed"], job["routed"]["labels"])
+                deadline = route_openclaw_agent._deadline_seconds(ns, job["routed"]["labels"])
+                out = route_openclaw_agent._run_fallback_chain(ns, record["agent"], record["thinking"], attempt_plan, deadline)
+                out["openclaw_command"] = route_openclaw_agent._command_ran(out) or record["openclaw_command"]
+            else:
+                out = route_openclaw_agent._run_captured(record["openclaw_command"], ns.timeout)
+            out["run_ms"] = round((time.monotonic() - started) * 1000, 1)
+            attempts = out.get("attempts") or [{**out, "model": record["primary"], "cmd": record["openclaw_command"], "elapsed_ms": out["run_ms"]}]
+            route_openclaw_agent._record_attempts(ns, record["agent"], attempts, providers)
+            return out
+
+        queued = time.monotonic() - submitted
+        out = call()
+        return {**record, "executed": True, **out, "queued_ms": round(queued * 1000, 1),
+                "latency_ms": round((time.monotonic() - submitted) * 1000, 1)}
+
+    source = sys.stdin if args.bulk == "-" else open(args.bulk, encoding="utf-8")
+    sink = open(args.bulk_output, "w", encoding="utf-8") if args.bulk_output else sys.stdout
+    stats: Dict[str, Any] = {"type": "stats", "total": 0, "ok": 0, "failed": 0, "invalid": 0}
+    run_ms: List[float] = []
+    latency_ms: List[float] = []
+    started = time.monotonic()
+
+    def emit(record: Dict[str, Any]) -> None:
+        stats["total"] += 1
+        if record.get("error"):
+            stats["invalid"] += 1
+        elif record["executed"]:
+            stats["ok" if record["returncode"] == 0 else "failed"] += 1
+            run_ms.append(record["run_ms"])
+            latency_ms.append(record["latency_ms"])
+        sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sink.flush()
+
+    # Caps are applied here, before pool.submit: a job whose agent or provider is
+    # at its cap waits in `blocked` while later jobs go ahead, so workers never
+    # sit on a semaphore and the rate wait never holds a slot.
+    items = _bulk_items(source)
+    exhausted = False
+    blocked: Deque[Tuple[Dict[str, Any], float]] = deque()
+    running: Dict[Future, Dict[str, Any]] = {}
+    concurrency = max(1, args.concurrency)
+    window = concurrency * 4
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                while not exhausted and len(blocked) < window:
+                    try:
+                        index, item, error = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is not None:
+                        try:
+                            job = plan(index, item)
+                        except (ValueError, SystemExit) as exc:
+                            error = str(exc)
+                    if error is not None:
+                        emit({"type": "result", "index": index, "id": (item or {}).get("id", index), "error": error, "executed": False})
+                    elif not args.run:
+                        emit(job["record"])
+                    else:
+                        blocked.append((job, time.monotonic()))
+                for _ in range(len(blocked)):
+                    if len(running) >= concurrency:
+                        break
+                    job, submitted = blocked.popleft()
+                    record = job["record"]
+                    if not limits.free(record["agent"], record["provider"]):
+                        blocked.append((job, submitted))
+                        continue
+                    limits.claim(record["agent"], record["provider"])
+                    running[pool.submit(execute, job, submitted)] = job
+                if not running:
+                    if exhausted and not blocked:
+                        break
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = running.pop(future)["record"]
+                    limits.release(record["agent"], record["provider"])
+                    try:
+                        result = future.result()
+                    except Exception as exc:  # one bad job (e.g. missing openclaw binary) must not end the run
+                        result = {**record, "error": str(exc), "executed": False}
+                    emit(result)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        elapsed = time.monotonic() - started
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["throughput_per_s"] = round(stats["total"] / elapsed, 2) if elapsed else None
+        if run_ms:
+            stats["run_ms"] = _percentiles(run_ms)
+            stats["latency_ms"] = _percentiles(latency_ms)
+        stats["limits"] = {"concurrency": args.concurrency, "per_agent": args.per_agent,
+                           "per_provider": args.per_provider, "rate": args.rate, "burst": args.burst}
+        sink.write(json.dumps(stats, ensure_ascii=False) + "\n")
+        if sink is not sys.stdout:
+            sink.close()
+    return 0 if not stats["failed"] and not stats["invalid"] else 1
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    if args.list_presets:
+        print_presets()
+        return
+
+    if args.preset not in PRESETS:
+        print(f"Unknown preset: {args.preset}", file=sys.stderr)
+        print("Use --list-presets to see valid values.", file=sys.stderr)
+        sys.exit(2)
+
+    if args.bulk:
+        if args.hedge:
+            print("--hedge is not supported with --bulk (use --fallback)", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(run_bulk(args))
+
+    labels = dict(PRESETS[args.preset])
+    labels.update(_flag_labels(args))
+    cmd = _delegate_argv(args, labels)
 
     default_preview_message = None
     if not args.message and not args.stdin_message:
@@ -185,10 +484,9 @@ def main() -> None:
         cmd.extend(["--message", default_preview_message])
 
     if args.show_command:
-        print(shlex.join(cmd), flush=True)
+        print(shlex.join([sys.executable, route_openclaw_agent.__file__] + cmd), flush=True)
 
-    proc = subprocess.run(cmd, text=True, input=None if not args.stdin_message else sys.stdin.read())
-    raise SystemExit(proc.returncode)
+    route_openclaw_agent.main(cmd)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Routing benchmark suite over a synthetic policy and skewed traffic.
+
+Scenarios (see synthetic.py for the generated inputs):
+
+- `route_uncached`: `Router.route` with the LRU cache off, one call per label set
+- `route_cached`: `Router.route` with the default cache (skewed traffic hits it)
+- `pick_agent`: `route_openclaw_agent._pick_agent` on the merged labels
+- `cli_select_model`: a full `select_model.py` process per route
+- `cli_route_agent`: a full `route_openclaw_agent.py` process per route (no `--run`)
+
+Each scenario reports calls, routes/sec, p50/p99/mean latency and memory
+(tracemalloc peak for in-process scenarios, the largest per-process peak RSS
+for the CLIs). Each CLI call runs under a small launcher process that times
+it and reads its peak RSS with RUSAGE_CHILDREN. A child forked straight from
+this process would report the benchmark's own RSS. Every scenario runs
+`--repeat` passes and reports the median of each metric. Results go to
+`--output` as JSON. `--baseline FILE` compares against an earlier result
+and exits 1 when a metric regresses by more than `--tolerance`. p99 uses
+the looser `--p99-tolerance`, because a tail percentile moves more between
+runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SKILL_ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS = SKILL_ROOT / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import router  # noqa: E402
+from route_openclaw_agent import _pick_agent  # noqa: E402
+from synthetic import skewed_traffic, synthetic_policy, write_files  # noqa: E402
+
+RESULT_VERSION = 2
+SCENARIOS = ["route_uncached", "route_cached", "pick_agent", "cli_select_model", "cli_route_agent"]
+# metric -> True when a larger value is better
+METRICS = {"routes_per_s": True, "p50_us": False, "p99_us": False, "peak_kb": False}
+
+# Runs one CLI call; prints "<elapsed ns> <peak RSS of the call>" (RSS empty without resource).
+_LAUNCHER = """
+import subprocess, sys, time
+try:
+    import resource
+except ImportError:
+    resource = None
+started = time.perf_counter_ns()
+proc = subprocess.run(sys.argv[1:], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+elapsed = time.perf_counter_ns() - started
+sys.stderr.buffer.write(proc.stderr)
+rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss if resource else ""
+print(elapsed, rss)
+sys.exit(proc.returncode)
+"""
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def _stats(latencies_ns: List[int], wall_s: float) -> Dict[str, Any]:
+    ordered = sorted(latencies_ns)
+    return {
+        "calls": len(ordered),
+        "routes_per_s": round(len(ordered) / wall_s, 1) if wall_s else None,
+        "p50_us": round(_percentile(ordered, 0.50) / 1000, 2),
+        "p99_us": round(_percentile(ordered, 0.99) / 1000, 2),
+        "mean_us": round(sum(ordered) / len(ordered) / 1000, 2),
+    }
+
+
+def _median(passes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-metric median over passes (metrics missing from any pass stay None)."""
+    result: Dict[str, Any] = {"passes": len(passes)}
+    for key in passes[0]:
+        values = [p[key] for p in passes]
+        result[key] = None if None in values else round(statistics.median(values), 2)
+    return result
+
+
+def _in_process(setup: Callable[[], Callable[[Dict[str, str]], Any]], traffic: List[Dict[str, str]], repeat: int) -> Dict[str, Any]:
+    """Median of `repeat` passes (each from a fresh setup), plus a traced pass for memory."""
+    clock = time.perf_counter_ns
+    passes = []
+    for _ in range(max(1, repeat)):
+        fn = setup()
+        latencies = []
+        started = clock()
+        for labels in traffic:
+            t0 = clock()
+            fn(labels)
+            latencies.append(clock() - t0)
+        passes.append(_stats(latencies, (clock() - started) / 1e9))
+    result = _median(passes)
+    # Memory is measured on a separate pass: tracemalloc slows every allocation.
+    tracemalloc.start()
+    fn = setup()
+    for labels in traffic[:2000]:
+        fn(labels)
+    result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    tracemalloc.stop()
+    return result
+
+
+def _run_child(cmd: List[str], env: Dict[str, str]) -> Tuple[int, Optional[int]]:
+    """Run one CLI process under the launcher; returns (elapsed ns, peak RSS in KiB or None)."""
+    proc = subprocess.run([sys.executable, "-c", _LAUNCHER, *cmd], capture_output=True, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(f"CLI failed ({proc.returncode}): {proc.stderr.decode(errors='replace').strip()}")
+    elapsed, _, rss = proc.stdout.decode().strip().partition(" ")
+    if not rss:
+        return int(elapsed), None
+    # Linux reports KiB, macOS bytes.
+    return int(elapsed), int(rss) // 1024 if sys.platform == "darwin" else int(rss)
+
+
+def _cli(cmd: Callable[[Dict[str, str]], List[str]], traffic: List[Dict[str, str]], env: Dict[str, str], repeat: int) -> Dict[str, Any]:
+    """Median of `repeat` passes; call latency excludes the launcher's own startup."""
+    passes = []
+    for _ in range(max(1, repeat)):
+        latencies = []
+        peaks = []
+        wall = 0
+        for labels in traffic:
+            elapsed, rss = _run_child(cmd(labels), env)
+            latencies.append(elapsed)
+            wall += elapsed
+            if rss is not None:
+                peaks.append(rss)
+        stats = _stats(latencies, wall / 1e9)
+        stats["peak_kb"] = float(max(peaks)) if peaks else None
+        passes.append(stats)
+    return _median(passes)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    docs = synthetic_policy(args.rules, args.slots, args.models, args.constraints, args.alias_depth, args.agent_rules, seed=args.seed)
+    traffic = skewed_traffic(docs["policy"], args.traffic, args.distinct, args.skew, seed=args.seed + 1)
+    policy, aliases, agent_cfg = docs["policy"], docs["aliases"]["aliases"], docs["agent_routing"]
+    wanted = args.scenario or SCENARIOS
+    results: Dict[str, Any] = {}
+
+    if "route_uncached" in wanted:
+        results["route_uncached"] = _in_process(lambda: router.Router(policy, aliases, cache_size=0).route, traffic, args.repeat)
+    if "route_cached" in wanted:
+        results["route_cached"] = _in_process(lambda: router.Router(policy, aliases).route, traffic, args.repeat)
+    if "pick_agent" in wanted:
+        defaults = policy["defaults"]
+        merged = [router.merge_labels(defaults, labels) for labels in traffic]
+        results["pick_agent"] = _in_process(lambda: lambda labels: _pick_agent(agent_cfg, labels), merged, args.repeat)
+
+    cli = [name for name in ("cli_select_model", "cli_route_agent") if name in wanted]
+    if cli:
+        with tempfile.TemporaryDirectory(prefix="oc-route-bench-") as tmp:
+            paths = write_files(docs, Path(tmp))
+            # Keep snapshots and daemon lookups away from the user's real cache and socket.
+            env = {**os.environ, "OC_ROUTE_SNAPSHOT_DIR": str(Path(tmp) / "snapshots"), "OC_ROUTER_SOCKET": str(Path(tmp) / "none.sock")}
+            sample = traffic[:args.cli_calls]
+            common = ["--policy", str(paths["policy"]), "--aliases", str(paths["aliases"])]
+            if "cli_select_model" in cli:
+                results["cli_select_model"] = _cli(
+                    lambda labels: [sys.executable, str(SCRIPTS / "select_model.py"), *common, "--labels-json", json.dumps(labels)],
+                    sample, env, args.repeat)
+            if "cli_route_agent" in cli:
+                results["cli_route_agent"] = _cli(
+                    lambda labels: [sys.executable, str(SCRIPTS / "route_openclaw_agent.py"), *common,
+                                    "--agent-routing", str(paths["agent_routing"]), "--no-daemon",
+                                    "--labels-json", json.dumps(labels), "--message", "bench"],
+                    sample, env, args.repeat)
+
+    return {
+        "version": RESULT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: getattr(args, k) for k in ("rules", "slots", "models", "constraints", "alias_depth", "agent_rules",
+                                                 "traffic", "distinct", "skew", "cli_calls", "repeat", "seed")},
+        "scenarios": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, p99_tolerance: float) -> Dict[str, Any]:
+    """Per scenario and metric: baseline, current, relative change and whether it regressed."""
+    tolerances = {metric: p99_tolerance if metric == "p99_us" else tolerance for metric in METRICS}
+    report: Dict[str, Any] = {"tolerance": tolerances, "regressions": [], "scenarios": {}}
+    if baseline.get("version") != current.get("version"):
+        report["version_differs"] = True
+    if baseline.get("params") != current.get("params"):
+        report["params_differ"] = True
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rows = {}
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = (-change if higher_is_better else change) > tolerances[metric]
+            rows[metric] = {"baseline": old, "current": new, "change": round(change, 4), "regressed": regressed}
+            if regressed:
+                report["regressions"].append(f"{name}.{metric}")
+        report["scenarios"][name] = rows
+    return report
+
+
+def _print_table(result: Dict[str, Any], comparison: Optional[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<18} {'routes/s':>12} {'p50 us':>10} {'p99 us':>10} {'peak KB':>10}", file=sys.stderr)
+    for name, r in result["scenarios"].items():
+        line = f"{name:<18} {r['routes_per_s']:>12.1f} {r['p50_us']:>10.2f} {r['p99_us']:>10.2f} {r['peak_kb'] or 0:>10.1f}"
+        rows = (comparison or {}).get("scenarios", {}).get(name)
+        if rows:
+            line += "  " + " ".join(
+                f"{metric}{'!' if row['regressed'] else ''}={row['change']:+.1%}" for metric, row in rows.items())
+        print(line, file=sys.stderr)
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark routing, agent selection and CLI invocations on a synthetic policy.")
+    p.add_argument("--rules", type=int, default=200)
+    p.add_argument("--slots", type=int, default=40)
+    p.add_argument("--models", type=int, default=60)
+    p.add_argument("--constraints", type=int, default=10)
+    p.add_argument("--alias-depth", type=int, default=2)
+    p.add_argument("--agent-rules", type=int, default=30)
+    p.add_argument("--traffic", type=int, default=20000, help="Label sets routed by the in-process scenarios")
+    p.add_argument("--distinct", type=int, default=2000, help="Distinct label sets the traffic draws from")
+    p.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the traffic")
+    p.add_argument("--cli-calls", type=int, default=20, help="Process invocations per CLI scenario")
+    p.add_argument("--repeat", type=int, default=3, help="Passes per scenario; the median of each metric is reported")
+    p.add_argument("--scenario", action="append", choices=SCENARIOS, help="Run only these scenarios (repeatable)")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--output", metavar="FILE", help="Write the JSON result to FILE (default: stdout)")
+    p.add_argument("--baseline", metavar="FILE", help="Compare against an earlier result; exit 1 on regressions")
+    p.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression per metric (default 0.10)")
+    p.add_argument("--p99-tolerance", type=float, default=0.30, help="Allowed relative regression of p99_us (default 0.30)")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    result = run(args)
+    comparison = None
+    if args.baseline:
+        comparison = compare(result, router.load_json(Path(args.baseline)), args.tolerance, args.p99_tolerance)
+        result["comparison"] = comparison
+    _print_table(result, comparison)
+    doc = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(doc + "\n")
+    else:
+        print(doc)
+    if comparison and comparison["regressions"]:
+        print(f"[bench_routing] regressions: {', '.join(comparison['regressions'])}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark the indexed rule matcher against the linear rule scan.
+
+Builds synthetic policies with N route rules (default 10, 100, 1000) on top of
+the shipped policy's slots and label vocabulary, routes the same random label
+sets through both `_resolve_route(policy_dict, ...)` (linear scan, sorted per
+call) and `_resolve_route(CompiledPolicy(...), ...)`, checks that the results
+are identical, and reports per-route latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+SKILL_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SKILL_ROOT / "scripts"))
+
+import router  # noqa: E402
+
+
+def _label_domains(policy: Dict[str, Any], extra_values: int) -> Dict[str, List[str]]:
+    domains: Dict[str, set] = {k: {v} for k, v in policy.get("defaults", {}).items()}
+    for entry in policy.get("route_rules", []) + policy.get("constraints", []):
+        for cond in [entry.get("when", {})] + list(entry.get("when_any", [])):
+            for key, expected in cond.items():
+                values = expected if isinstance(expected, list) else [expected]
+                domains.setdefault(key, set()).update(str(v) for v in values)
+    # Synthetic values keep large policies from collapsing onto a handful of labels.
+    for key in domains:
+        domains[key].update(f"{key}_{i}" for i in range(extra_values))
+    return {k: sorted(v) for k, v in domains.items()}
+
+
+def _synthetic_policy(base: Dict[str, Any], domains: Dict[str, List[str]], n_rules: int, rng: random.Random) -> Dict[str, Any]:
+    keys = sorted(domains)
+    slots = sorted(base["slots"])
+
+    def cond() -> Dict[str, List[str]]:
+        picked = rng.sample(keys, rng.randint(1, 3))
+        return {k: rng.sample(domains[k], rng.randint(1, 2)) for k in picked}
+
+    rules = []
+    for i in range(n_rules):
+        rule: Dict[str, Any] = {"id": f"rule_{i}", "priority": rng.randint(0, 1000)}
+        shape = rng.random()
+        if shape < 0.6:
+            rule["when"] = cond()
+        elif shape < 0.95:
+            rule["when_any"] = [cond() for _ in range(rng.randint(1, 3))]
+        else:
+            rule["when"] = {}
+        stage = {"name": f"stage_{i % 4}", "slot": rng.choice(slots)}
+        if rng.random() < 0.7:
+            rule["stages"] = [stage]
+        else:
+            rule["augment_stages"] = [dict(stage, position=rng.choice(["prepend", "append"]))]
+        rules.append(rule)
+
+    policy = dict(base)
+    policy["route_rules"] = rules
+    return policy
+
+
+def _time_per_call(fn, labels_list: List[Dict[str, str]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for labels in labels_list:
+            fn(labels)
+        best = min(best, time.perf_counter() - start)
+    return best / len(labels_list)
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark indexed vs linear route rule matching.")
+    p.add_argument("--policy", default=str(SKILL_ROOT / "assets" / "routing-policy.json"))
+    p.add_argument("--rules", type=int, action="append", help="Rule counts to benchmark (repeatable). Default: 10, 100, 1000")
+    p.add_argument("--label-sets", type=int, default=2000, help="Random label sets routed per measurement")
+    p.add_argument("--extra-values", type=int, default=6, help="Synthetic values added to each label key")
+    p.add_argument("--repeat", type=int, default=3, help="Take the best of N timing runs")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--json", action="store_true", help="Emit JSON instead of a table")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    base = router.load_json(Path(args.policy))
+    rng = random.Random(args.seed)
+    domains = _label_domains(base, args.extra_values)
+    labels_list = [{k: rng.choice(v) for k, v in domains.items()} for _ in range(args.label_sets)]
+
+    results = []
+    for n_rules in args.rules or [10, 100, 1000]:
+        policy = _synthetic_policy(base, domains, n_rules, rng)
+        compiled = router.CompiledPolicy(policy)
+        for labels in labels_list:
+            if router._resolve_route(policy, labels) != router._resolve_route(compiled, labels):
+                raise SystemExit(f"Mismatch at {n_rules} rules for labels {json.dumps(labels)}")
+        linear = _time_per_call(lambda l: router._resolve_route(policy, l), labels_list, args.repeat)
+        indexed = _time_per_call(lambda l: router._resolve_route(compiled, l), labels_list, args.repeat)
+        results.append({
+            "rules": n_rules,
+            "linear_us": round(linear * 1e6, 2),
+            "indexed_us": round(indexed * 1e6, 2),
+            "speedup": round(linear / indexed, 2) if indexed else None,
+        })
+
+    if args.json:
+        print(json.dumps({"label_sets": args.label_sets, "results": results}, indent=2))
+        return
+    print(f"{'rules':>6}  {'linear us/route':>16}  {'indexed us/route':>17}  {'speedup':>8}")
+    for r in results:
+        print(f"{r['rules']:>6}  {r['linear_us']:>16.2f}  {r['indexed_us']:>17.2f}  {r['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Synthetic routing policies and skewed label traffic for benchmarks.
+
+`synthetic_policy()` builds a policy, alias map and agent routing config with
+a configurable number of route rules, slots, models, constraints and agent
+rules. Slot candidates refer to models through alias chains `alias_depth`
+hops long, so canonicalization cost scales too. Conditions draw from the
+shipped label vocabulary widened with `extra_values` synthetic values per key.
+
+`skewed_traffic()` samples label sets from a pool of distinct ones with Zipf
+weights, so a few label sets dominate like real traffic; each label is
+omitted with some probability so policy defaults fill in.
+
+Run directly to write the generated files (and a traffic JSONL) to a
+directory for use with the CLIs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+SKILL_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SKILL_ROOT / "scripts"))
+
+import router  # noqa: E402
+
+CAPABILITIES = ["text", "image", "multimodal", "long_context", "batch_fast", "zh_strong", "coding_strong", "reasoning_high", "reasoning_mid"]
+TIERS = ["low", "mid", "high"]
+LATENCY_TIERS = ["fast", "mid", "slow"]
+
+
+def label_vocabulary(extra_values: int = 4) -> Dict[str, List[str]]:
+    """The shipped `label_domains`, each widened with synthetic values."""
+    base = router.load_json(router.DEFAULT_POLICY).get("label_domains", {})
+    return {key: list(values) + [f"{key}_{i}" for i in range(extra_values)] for key, values in base.items()}
+
+
+def synthetic_policy(
+    rules: int = 100,
+    slots: int = 30,
+    models: int = 40,
+    constraints: int = 5,
+    alias_depth: int = 1,
+    agent_rules: int = 20,
+    providers: int = 6,
+    extra_values: int = 4,
+    seed: int = 7
+) -> Dict[str, Dict[str, Any]]:
+    """Return {"policy": ..., "aliases": ..., "agent_routing": ...} documents."""
+    rng = random.Random(seed)
+    vocab = label_vocabulary(extra_values)
+    keys = sorted(vocab)
+    provider_ids = [f"prov{i}" for i in range(providers)]
+
+    model_ids = [f"{provider_ids[i % providers]}/model-{i}" for i in range(models)]
+    model_meta = {
+        model_id: {
+            "provider": model_id.split("/", 1)[0],
+            "capabilities": sorted(rng.sample(CAPABILITIES, rng.randint(1, 4))),
+            "cost_tier": rng.choice(TIERS),
+            "latency_tier": rng.choice(LATENCY_TIERS),
+        }
+        for model_id in model_ids
+    }
+
+    # alias_<i>_<depth> -> ... -> alias_<i>_1 -> model; slots name the outermost alias.
+    aliases: Dict[str, str] = {}
+    entry_name = {}
+    for i, model_id in enumerate(model_ids):
+        target = model_id
+        for depth in range(1, alias_depth + 1):
+            name = f"alias-{i}-{depth}"
+            aliases[name] = target
+            target = name
+        entry_name[model_id] = target
+
+    slot_ids = [f"slot.{i}" for i in range(slots)]
+    slot_docs = {
+        slot_id: {"candidates": [entry_name[m] for m in rng.sample(model_ids, min(len(model_ids), rng.randint(3, 6)))]}
+        for slot_id in slot_ids
+    }
+
+    def cond() -> Dict[str, List[str]]:
+        picked = rng.sample(keys, rng.randint(1, 3))
+        return {k: rng.sample(vocab[k], rng.randint(1, 2)) for k in picked}
+
+    route_rules: List[Dict[str, Any]] = [
+        {"id": "default", "priority": 0, "when": {}, "stages": [{"name": "primary", "slot": slot_ids[0]}]}
+    ]
+    for i in range(rules - 1):
+        rule: Dict[str, Any] = {"id": f"rule_{i}", "priority": rng.randint(1, 1000)}
+        if rng.random() < 0.6:
+            rule["when"] = cond()
+        else:
+            rule["when_any"] = [cond() for _ in range(rng.randint(1, 3))]
+        stage = {"name": f"stage_{i % 4}", "slot": rng.choice(slot_ids)}
+        if rng.random() < 0.7:
+            rule["stages"] = [stage]
+        else:
+            rule["augment_stages"] = [dict(stage, position=rng.choice(["prepend", "append"]))]
+        route_rules.append(rule)
+
+    constraint_docs = []
+    for i in range(constraints):
+        banned = rng.choice(provider_ids)
+        constraint_docs.append({
+            "id": f"constraint_{i}",
+            "when": cond(),
+            "ban_providers": [banned],
+            "ban_model_prefixes": [f"{banned}/"],
+            "prefer_providers": [rng.choice(provider_ids)],
+        })
+
+    policy = {
+        "version": 2,
+        "defaults": {key: values[0] for key, values in vocab.items()},
+        "label_domains": vocab,
+        "models": model_meta,
+        "slots": slot_docs,
+        "constraints": constraint_docs,
+        "route_rules": route_rules,
+    }
+    agent_routing = {
+        "version": 1,
+        "defaults": {"agent": "agent-default", "thinking_by_complexity": {"high": "high"}, "thinking_by_value": {"high": "high"}},
+        "rules": [
+            {"id": f"agent_rule_{i}", "priority": rng.randint(1, 1000), "when": cond(), "agent": f"agent-{i % 5}"}
+            for i in range(agent_rules)
+        ],
+    }
+    return {"policy": policy, "aliases": {"version": 1, "aliases": aliases}, "agent_routing": agent_routing}
+
+
+def skewed_traffic(
+    policy: Dict[str, Any],
+    count: int,
+    distinct: int = 2000,
+    skew: float = 1.1,
+    omit: float = 0.3,
+    seed: int = 11
+) -> List[Dict[str, str]]:
+    """`count` label sets drawn from `distinct` ones with Zipf(`skew`) weights."""
+    rng = random.Random(seed)
+    vocab = policy.get("label_domains") or {k: [v] for k, v in policy.get("defaults", {}).items()}
+    pool = [{k: rng.choice(v) for k, v in vocab.items() if rng.random() >= omit} for _ in range(distinct)]
+    weights = list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, distinct + 1)))
+    return rng.choices(pool, cum_weights=weights, k=count)
+
+
+def write_files(docs: Dict[str, Dict[str, Any]], out_dir: Path) -> Dict[str, Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "policy": out_dir / "routing-policy.json",
+        "aliases": out_dir / "alias-map.json",
+        "agent_routing": out_dir / "openclaw-agent-routing.json",
+    }
+    for name, path in paths.items():
+        path.write_text(json.dumps(docs[name], indent=2, ensure_ascii=False) + "\n")
+    return paths
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Write a synthetic routing policy, alias map, agent routing and traffic file.")
+    p.add_argument("--out-dir", required=True)
+    p.add_argument("--rules", type=int, default=100)
+    p.add_argument("--slots", type=int, default=30)
+    p.add_argument("--models", type=int, default=40)
+    p.add_argument("--constraints", type=int, default=5)
+    p.add_argument("--alias-depth", type=int, default=1)
+    p.add_argument("--agent-rules", type=int, default=20)
+    p.add_argument("--traffic", type=int, default=10000, help="Label sets written to traffic.jsonl")
+    p.add_argument("--distinct", type=int, default=2000, help="Distinct label sets the traffic draws from")
+    p.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the traffic")
+    p.add_argument("--seed", type=int, default=7)
+    return p.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    docs = synthetic_policy(args.rules, args.slots, args.models, args.constraints, args.alias_depth, args.agent_rules, seed=args.seed)
+    paths = write_files(docs, Path(args.out_dir))
+    traffic = Path(args.out_dir) / "traffic.jsonl"
+    with open(traffic, "w", encoding="utf-8") as f:
+        for labels in skewed_traffic(docs["policy"], args.traffic, args.distinct, args.skew, seed=args.seed + 1):
+            f.write(json.dumps(labels, ensure_ascii=False) + "\n")
+    print(json.dumps({**{k: str(v) for k, v in paths.items()}, "traffic": str(traffic)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Precompute routes for the whole label space into a compact lookup table.
+
+Every label key's values are grouped into equivalence classes (see
+route_table.py), the cross product of classes is routed in parallel through
+the normal engine, and the result is written as a memory-mappable table that
+`route_table.RouteTable` serves in O(1) per lookup.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from router import DEFAULT_ALIASES, DEFAULT_POLICY, Router
+from route_table import RouteTable, build, label_classes
+
+
+def _parse_only(specs: List[str]) -> Dict[str, List[str]]:
+    only: Dict[str, List[str]] = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise SystemExit(f"--only expects key=value[,value...], got {spec!r}")
+        only.setdefault(key.strip(), []).extend(v.strip() for v in values.split(","))
+    return only
+
+
+def _parse_args() -> argparse.Namespace:
+    here = Path(__file__).resolve()
+    skill_root = here.parents[1]
+    p = argparse.ArgumentParser(description="Build a precomputed route table for the full label space.")
+    p.add_argument("--policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--aliases", default=str(DEFAULT_ALIASES))
+    p.add_argument("--output", default=str(skill_root / "assets" / "route-table.bin"))
+    p.add_argument("--only", action="append", default=[], metavar="KEY=V1,V2", help="Restrict a label key to a declared subset (repeatable).")
+    p.add_argument("--available-model", action="append", default=[])
+    p.add_argument("--deny-model-prefix", action="append", default=[])
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--dry-run", action="store_true", help="Print the label classes and table size without routing.")
+    p.add_argument("--verify", type=int, default=0, metavar="N", help="After building, compare N random lookups with the live router.")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    only = _parse_only(args.only)
+
+    if args.dry_run:
+        router = Router.from_files(args.policy, args.aliases)
+        classes = label_classes(router.policy)
+        total = 1
+        for key, groups in classes.items():
+            n = len(groups) if key not in only else len({v for v in only[key]})
+            total *= n
+            print(f"{key:22} {len(groups)} classes: " + " | ".join(",".join(g) if g[0] != "\x00other" else "<other>" for g in groups))
+        print(f"combinations (upper bound): {total}")
+        return
+
+    start = time.perf_counter()
+    header = build(
+        args.policy,
+        args.aliases,
+        args.output,
+        available_models=args.available_model,
+        deny_model_prefixes=args.deny_model_prefix,
+        only=only,
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - start
+    size = Path(args.output).stat().st_size
+    print(
+        f"[build_route_table] {header['count']} combinations -> {header['routes']} unique routes, "
+        f"{size} bytes, {elapsed:.1f}s -> {args.output}",
+        file=sys.stderr,
+    )
+
+    if args.verify:
+        table = RouteTable(args.output, args.policy, args.aliases)
+        router = Router.from_files(
+            args.policy, args.aliases,
+            available_models=args.available_model, deny_model_prefixes=args.deny_model_prefix,
+        )
+        rng = random.Random(0)
+        classes = header["classes"]
+        mismatches = 0
+        for _ in range(args.verify):
+            labels = {}
+            for key in header["keys"]:
+                group = classes[key][rng.choice(header["enumerated"][key])]
+                value = rng.choice(group)
+                labels[key] = value if value != "\x00other" else f"unlisted-{rng.randint(0, 9)}"
+            if table.route(labels) != router.route(labels):
+                mismatches += 1
+                print(f"MISMATCH: {json.dumps(labels, ensure_ascii=False)}", file=sys.stderr)
+        print(f"[build_route_table] verify: {args.verify - mismatches}/{args.verify} lookups match", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
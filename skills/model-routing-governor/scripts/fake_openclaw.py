@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Stand-in for the `openclaw` CLI when exercising --run paths locally.
+
+Accepts `openclaw agent ...` arguments, sleeps for the configured latency of
+the requested model, then answers with a small JSON document (or fails).
+
+Environment:
+  FAKE_OPENCLAW_LATENCY  model=seconds pairs, comma separated; `*` sets the default (0)
+  FAKE_OPENCLAW_FAIL     models that exit with status 2, comma separated
+  FAKE_OPENCLAW_LOG      append one JSON line per call (argv, pid, start time)
+  FAKE_OPENCLAW_STREAM   print N progress lines spread over the latency before the answer
+
+Example:
+  FAKE_OPENCLAW_LATENCY='*=0.2,openai-codex/gpt-5.3-codex=30' \\
+    route_openclaw_agent.py --latency-budget fast ... --run --openclaw-bin scripts/fake_openclaw.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+
+def _pairs(raw: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        model, _, seconds = item.rpartition("=")
+        out[model] = float(seconds)
+    return out
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] != "agent":
+        print("fake_openclaw: only `agent` is supported", file=sys.stderr)
+        return 64
+    p = argparse.ArgumentParser(prog="openclaw agent")
+    p.add_argument("--agent")
+    p.add_argument("--model")
+    p.add_argument("--message")
+    p.add_argument("--timeout")
+    p.add_argument("--thinking")
+    args, _ = p.parse_known_args(argv[1:])
+
+    started = time.time()
+    log = os.environ.get("FAKE_OPENCLAW_LOG")
+    if log:
+        with open(log, "a") as fh:
+            fh.write(json.dumps({"argv": argv, "pid": os.getpid(), "start": started}) + "\n")
+    latency = _pairs(os.environ.get("FAKE_OPENCLAW_LATENCY", ""))
+    delay = latency.get(args.model or "", latency.get("*", 0.0))
+    steps = int(os.environ.get("FAKE_OPENCLAW_STREAM", "0") or 0)
+    for step in range(steps):
+        time.sleep(delay / (steps + 1))
+        print(f"progress {step + 1}/{steps}", flush=True)
+    time.sleep(delay / (steps + 1))
+    if args.model in {m.strip() for m in os.environ.get("FAKE_OPENCLAW_FAIL", "").split(",")}:
+        print(f"fake_openclaw: {args.model} failed", file=sys.stderr)
+        return 2
+    print(json.dumps({"agent": args.agent, "model": args.model, "reply": f"echo: {args.message}",
+                      "elapsed_s": round(time.time() - started, 3)}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Suggest a cheaper rule evaluation order from recorded hit/miss counters.
+
+Both proposals keep every routing result identical:
+
+- Agent rules (first match wins): a rule may only move ahead of a
+  higher-priority rule when their `when` conditions can never match the same
+  labels; overlapping pairs keep their relative order. Among the rules free
+  to go next the most-hit one goes first, so rules that never interact with
+  the hot ones end up last. Priorities are reassigned in the new order.
+- Route rules and constraints (every match applies, so all candidates are
+  evaluated): keys inside `when` are reordered so the key most likely to fail
+  is compared first, and `when_any` clauses so the cheapest likely-passing
+  clause comes first. Costs are replayed over the recorded label sets through
+  the real condition index, and an entry keeps its order unless the replay
+  shows a saving.
+
+Counters come from `--rule-stats FILE` (or $OC_ROUTE_RULE_STATS) on
+select_model.py, route_openclaw_agent.py or router_daemon.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from router import DEFAULT_POLICY, RULE_STATS_ENV, _ConditionIndex, load_json, match_fields
+
+LabelSets = List[Tuple[Dict[str, str], int]]
+
+
+def _values(expected: Any) -> set:
+    return set(expected) if isinstance(expected, list) else {expected}
+
+
+def _overlaps(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """True when some label set satisfies both conditions (keys absent from one are free)."""
+    return all(_values(a[key]) & _values(b[key]) for key in a.keys() & b.keys())
+
+
+def order_agent_rules(agent_cfg: Dict[str, Any], stats: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Return (report, rules in proposed order with reassigned priorities)."""
+    rules = sorted(agent_cfg.get("rules", []), key=lambda r: int(r.get("priority", 1000)))
+    ids = [r.get("id", f"rules[{i}]") for i, r in enumerate(rules)]
+    counters = stats.get("agent_rules", {})
+    hits = [counters.get(rule_id, {}).get("hits", 0) for rule_id in ids]
+    total = stats.get("agent_routes", 0)
+
+    # before[i]: higher-priority rules that can match together with rule i.
+    before = [{j for j in range(i) if _overlaps(rules[j].get("when", {}), rules[i].get("when", {}))}
+              for i in range(len(rules))]
+    placed: List[int] = []
+    remaining = list(range(len(rules)))
+    while remaining:
+        ready = [i for i in remaining if before[i] <= set(placed)]
+        best = max(ready, key=lambda i: (hits[i], -i))
+        placed.append(best)
+        remaining.remove(best)
+
+    def expected(order: List[int]) -> float:
+        if not total:
+            return 0.0
+        # The winning rule never changes, so a request costs the winner's position.
+        cost = sum(hits[i] * (pos + 1) for pos, i in enumerate(order))
+        cost += (total - sum(hits)) * len(order)
+        return cost / total
+
+    current, proposed = expected(list(range(len(rules)))), expected(placed)
+    priorities = sorted(int(r.get("priority", 1000)) for r in rules)
+    reordered = []
+    for pos, i in enumerate(placed):
+        rule = dict(rules[i])
+        rule["priority"] = priorities[pos]
+        reordered.append(rule)
+    report = {
+        "current_order": ids,
+        "proposed_order": [ids[i] for i in placed],
+        "pinned_pairs": [[ids[j], ids[i]] for i in range(len(rules)) for j in sorted(before[i])],
+        "expected_evaluations": {
+            "current": round(current, 4),
+            "proposed": round(proposed, 4),
+            "saved_per_request": round(current - proposed, 4),
+            "saved_total": round((current - proposed) * total, 1),
+        },
+    }
+    return report, reordered
+
+
+def _pass_rate(label_sets: LabelSets, weight: int, cond: Dict[str, Any]) -> float:
+    passed = sum(n for labels, n in label_sets if match_fields(labels, cond))
+    return passed / weight if weight else 0.0
+
+
+def _fields_cost(labels: Dict[str, str], cond: Dict[str, Any]) -> Tuple[bool, int]:
+    """(matched, comparisons) for match_fields, which stops at the first failing key."""
+    checked = 0
+    for key, expected in cond.items():
+        checked += 1
+        actual = labels.get(key)
+        if (actual not in expected) if isinstance(expected, list) else (actual != expected):
+            return False, checked
+    return True, checked
+
+
+def _entry_cost(labels: Dict[str, str], entry: Dict[str, Any]) -> int:
+    """Key comparisons `_rule_matches` performs for one entry."""
+    cost = 0
+    if "when" in entry:
+        ok, cost = _fields_cost(labels, entry["when"])
+        if not ok:
+            return cost
+    for cond in entry.get("when_any", []):
+        ok, checked = _fields_cost(labels, cond)
+        cost += checked
+        if ok:
+            break
+    return cost
+
+
+def _reorder_cond(cond: Dict[str, Any], label_sets: LabelSets, weight: int) -> Dict[str, Any]:
+    """Most likely to fail first; stable for ties."""
+    keys = sorted(cond, key=lambda k: _pass_rate(label_sets, weight, {k: cond[k]}))
+    return {k: cond[k] for k in keys}
+
+
+def _reorder_entry(entry: Dict[str, Any], label_sets: LabelSets, weight: int) -> Dict[str, Any]:
+    new = dict(entry)
+    if entry.get("when"):
+        new["when"] = _reorder_cond(entry["when"], label_sets, weight)
+    if entry.get("when_any"):
+        clauses = [_reorder_cond(c, label_sets, weight) for c in entry["when_any"]]
+
+        def score(clause: Dict[str, Any]) -> float:
+            cost = sum(n * _fields_cost(labels, clause)[1] for labels, n in label_sets) / weight
+            return -_pass_rate(label_sets, weight, clause) / max(cost, 1e-9)
+
+        new["when_any"] = sorted(clauses, key=score)
+    return new
+
+
+def _replay(entries: List[Dict[str, Any]], label_sets: LabelSets) -> List[int]:
+    """Weighted comparisons per entry when routing the recorded label sets."""
+    index = _ConditionIndex(entries)
+    totals = [0] * len(entries)
+    for labels, n in label_sets:
+        for pos in index.candidates(labels):
+            totals[pos] += n * _entry_cost(labels, entries[pos])
+    return totals
+
+
+def order_conditions(entries: List[Dict[str, Any]], label_sets: LabelSets, id_prefix: str) -> Tuple[List[Dict[str, Any]], List[str], int, int]:
+    """Return (entries with cheaper condition order, changed ids, current cost, proposed cost)."""
+    weight = sum(n for _, n in label_sets)
+    if not weight:
+        return entries, [], 0, 0
+    candidates = [_reorder_entry(e, label_sets, weight) for e in entries]
+    before, after = _replay(entries, label_sets), _replay(candidates, label_sets)
+    out, changed = [], []
+    for i, entry in enumerate(entries):
+        if after[i] < before[i]:
+            out.append(candidates[i])
+            changed.append(entry.get("id", f"{id_prefix}[{i}]"))
+        else:
+            out.append(entry)
+    return out, changed, sum(before), sum(min(b, a) for b, a in zip(before, after))
+
+
+def _parse_args() -> argparse.Namespace:
+    skill_root = Path(__file__).resolve().parents[1]
+    p = argparse.ArgumentParser(description="Propose a semantics-preserving rule evaluation order from hit counters.")
+    p.add_argument("--stats", default=os.environ.get(RULE_STATS_ENV), help=f"Rule stats file (default: ${RULE_STATS_ENV})")
+    p.add_argument("--policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--agent-routing", default=str(skill_root / "assets" / "openclaw-agent-routing.json"))
+    p.add_argument("--write-policy", metavar="FILE", help="Write the policy with reordered conditions to FILE")
+    p.add_argument("--write-agent-routing", metavar="FILE", help="Write agent routing with reordered rules to FILE")
+    p.add_argument("--pretty", action="store_true")
+    return p.parse_args()
+
+
+def _write_json(path: str, doc: Dict[str, Any]) -> None:
+    Path(path).write_text(json.dumps(doc, indent=2, ensure_ascii=False) + "\n")
+
+
+def main() -> None:
+    args = _parse_args()
+    if not args.stats:
+        raise SystemExit(f"Pass --stats FILE or set {RULE_STATS_ENV}.")
+    stats = load_json(Path(args.stats))
+    if not stats.get("routes") and not stats.get("agent_routes"):
+        raise SystemExit(f"No routes recorded in {args.stats}; run the routers with --rule-stats first.")
+    policy = load_json(Path(args.policy))
+    agent_cfg = load_json(Path(args.agent_routing))
+    label_sets = [(item["labels"], item["count"]) for item in stats.get("label_sets", [])]
+
+    agent_report, agent_rules = order_agent_rules(agent_cfg, stats)
+    new_policy = copy.deepcopy(policy)
+    condition_report: Dict[str, Any] = {}
+    for key, prefix in (("route_rules", "route_rules"), ("constraints", "constraints")):
+        entries = sorted(policy.get(key, []), key=lambda r: int(r.get("priority", 1000))) if key == "route_rules" \
+            else list(policy.get(key, []))
+        reordered, changed, current, proposed = order_conditions(entries, label_sets, prefix)
+        by_id = {id(old): new for old, new in zip(entries, reordered)}
+        new_policy[key] = [by_id.get(id(e), e) for e in policy.get(key, [])]
+        weight = sum(n for _, n in label_sets) or 1
+        condition_report[key] = {
+            "changed": changed,
+            "comparisons_per_route": {
+                "current": round(current / weight, 4),
+                "proposed": round(proposed / weight, 4),
+                "saved_per_route": round((current - proposed) / weight, 4),
+                "saved_total": current - proposed,
+            },
+        }
+
+    report = {
+        "routes": stats.get("routes", 0),
+        "agent_routes": stats.get("agent_routes", 0),
+        "label_sets": len(label_sets),
+        "label_sets_dropped": stats.get("label_sets_dropped", 0),
+        "agent_rules": agent_report,
+        "conditions": condition_report,
+    }
+    if args.write_policy:
+        _write_json(args.write_policy, new_policy)
+    if args.write_agent_routing:
+        _write_json(args.write_agent_routing, {**agent_cfg, "rules": agent_rules})
+    print(json.dumps(report, indent=2 if args.pretty else None, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
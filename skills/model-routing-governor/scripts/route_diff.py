@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Replay a label corpus through two policy versions and report route changes.
+
+The corpus is JSONL: one label object per line, or {"labels": {...},
+"count": N} for pre-aggregated traffic (the `label_sets` of a rule stats
+file work as-is). Identical lines are counted before any JSON is parsed, and
+label sets are then collapsed into equivalence classes over the conditions of
+*both* policies (values no rule, constraint or scoring entry distinguishes
+route identically, see route_table.py), so each class is routed once per
+policy on a process pool however large the corpus is.
+
+Output is JSONL, streamed as classes finish: one record per class whose
+primary, fallbacks or blocked models differ (with its traffic count), then a
+`summary` record with traffic-weighted change totals and the most common
+primary transitions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from router import DEFAULT_ALIASES, DEFAULT_POLICY, Router, load_json
+from route_table import _conditions_by_key
+from smoke_index import git_show
+
+CHUNK_CLASSES = 256
+TOP_TRANSITIONS = 20
+
+_absent = object()
+_worker_routers: Tuple[Optional[Router], Optional[Router]] = (None, None)
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Compare the routes of two policy versions over a label corpus.")
+    p.add_argument("--corpus", required=True, metavar="FILE|-", help="JSONL label sets (optionally {\"labels\": ..., \"count\": N})")
+    p.add_argument("--old-policy", help="Old policy file (or use --old-ref)")
+    p.add_argument("--old-aliases", help="Old alias map (default: --new-aliases, or the file at --old-ref)")
+    p.add_argument("--old-ref", metavar="REF", help="Take the old policy/alias map from git REF of the new files")
+    p.add_argument("--new-policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--new-aliases", default=str(DEFAULT_ALIASES))
+    p.add_argument("--available-model", action="append", default=[])
+    p.add_argument("--deny-model-prefix", action="append", default=[])
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--output", default="-", metavar="FILE|-", help="Where to stream the JSONL report (default: stdout)")
+    return p.parse_args()
+
+
+def _load_old(args: argparse.Namespace) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    if args.old_ref:
+        docs = []
+        for path in (args.new_policy, args.new_aliases):
+            data = git_show(args.old_ref, Path(path))
+            if data is None:
+                raise SystemExit(f"Cannot read {path} at {args.old_ref}")
+            docs.append(json.loads(data))
+        policy, aliases = docs
+    elif args.old_policy:
+        policy, aliases = load_json(Path(args.old_policy)), load_json(Path(args.new_aliases))
+    else:
+        raise SystemExit("Pass --old-policy FILE or --old-ref REF.")
+    if args.old_aliases:
+        aliases = load_json(Path(args.old_aliases))
+    return policy, aliases
+
+
+def _count_lines(path: str) -> Counter:
+    """Identical corpus lines with counts; counting raw bytes keeps parsing to unique lines."""
+    with ExitStack() as stack:
+        f = sys.stdin.buffer if path == "-" else stack.enter_context(open(path, "rb"))
+        return Counter(f)
+
+
+def _label_sets(lines: Counter) -> Tuple[Counter, int]:
+    """(label tuple -> traffic, invalid line count)."""
+    tuples: Counter = Counter()
+    invalid = 0
+    for raw, n in lines.items():
+        if not raw.strip():
+            continue
+        try:
+            doc = json.loads(raw)
+        except ValueError:
+            invalid += n
+            continue
+        if not isinstance(doc, dict):
+            invalid += n
+            continue
+        if isinstance(doc.get("labels"), dict):
+            n *= int(doc.get("count", 1))
+            doc = doc["labels"]
+        tuples[tuple(sorted((str(k), v if isinstance(v, str) else str(v)) for k, v in doc.items()))] += n
+    return tuples, invalid
+
+
+class _Classifier:
+    """Maps a label tuple to its routing equivalence class under both policies."""
+
+    def __init__(self, old_policy: Dict[str, Any], new_policy: Dict[str, Any]) -> None:
+        conds: Dict[str, List[List[Any]]] = {}
+        for policy in (old_policy, new_policy):
+            for key, values in _conditions_by_key(policy).items():
+                conds.setdefault(key, []).extend(values)
+        self.keys = sorted(conds)
+        self._conds = [[set(map(str, values)) for values in conds[key]] for key in self.keys]
+        self._seen: Dict[Tuple[int, str], Tuple[bool, ...]] = {}
+
+    def signature(self, labels: Dict[str, str]) -> Tuple[Any, ...]:
+        sig = []
+        for pos, key in enumerate(self.keys):
+            value = labels.get(key, _absent)
+            if value is _absent:
+                sig.append(None)
+                continue
+            cached = self._seen.get((pos, value))
+            if cached is None:
+                cached = self._seen[(pos, value)] = tuple(value in accepted for accepted in self._conds[pos])
+            sig.append(cached)
+        return tuple(sig)
+
+
+def _init_worker(old: Tuple[Dict[str, Any], Dict[str, Any]], new: Tuple[Dict[str, Any], Dict[str, Any]], available: List[str], deny: List[str]) -> None:
+    global _worker_routers
+    _worker_routers = tuple(  # type: ignore[assignment]
+        Router(policy, aliases.get("aliases", {}), available_models=available, deny_model_prefixes=deny, cache_size=0)
+        for policy, aliases in (old, new)
+    )
+
+
+def _summary(out: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "primary": out["primary"],
+        "fallbacks": out["fallbacks"],
+        "blocked": sorted({b["model"] for b in out.get("blocked_models", [])}),
+    }
+
+
+def _diff_chunk(chunk: List[Tuple[Dict[str, str], int, int]]) -> Tuple[int, List[Dict[str, Any]]]:
+    """Route each class under both policies; returns (classes routed, changed records)."""
+    old_router, new_router = _worker_routers
+    assert old_router is not None and new_router is not None
+    changed = []
+    for labels, traffic, variants in chunk:
+        before, after = _summary(old_router.route(labels)), _summary(new_router.route(labels))
+        fields = [field for field in ("primary", "fallbacks", "blocked") if before[field] != after[field]]
+        if fields:
+            changed.append({"labels": labels, "count": traffic, "label_sets": variants, "changed": fields, "old": before, "new": after})
+    return len(chunk), changed
+
+
+def _chunks(classes: List[Tuple[Dict[str, str], int, int]]) -> Iterator[List[Tuple[Dict[str, str], int, int]]]:
+    for start in range(0, len(classes), CHUNK_CLASSES):
+        yield classes[start:start + CHUNK_CLASSES]
+
+
+def main() -> None:
+    args = _parse_args()
+    started = time.perf_counter()
+    old = _load_old(args)
+    new = (load_json(Path(args.new_policy)), load_json(Path(args.new_aliases)))
+
+    lines = _count_lines(args.corpus)
+    tuples, invalid = _label_sets(lines)
+    classifier = _Classifier(old[0], new[0])
+    classes: Dict[Tuple[Any, ...], List[Any]] = {}
+    for items, traffic in tuples.items():
+        labels = dict(items)
+        entry = classes.setdefault(classifier.signature(labels), [labels, 0, 0])
+        entry[1] += traffic
+        entry[2] += 1
+    work = sorted((tuple(e) for e in classes.values()), key=lambda e: -e[1])  # type: ignore[misc]
+    prepared = time.perf_counter()
+
+    total = sum(tuples.values())
+    weights = Counter()
+    transitions: Counter = Counter()
+    changed_classes = 0
+    init_args = (old, new, args.available_model, args.deny_model_prefix)
+    with ExitStack() as stack:
+        out = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w", encoding="utf-8"))
+
+        def emit(part: Tuple[int, List[Dict[str, Any]]]) -> None:
+            nonlocal changed_classes
+            for record in part[1]:
+                changed_classes += 1
+                weights["any"] += record["count"]
+                for field in record["changed"]:
+                    weights[field] += record["count"]
+                if "primary" in record["changed"]:
+                    transitions[(record["old"]["primary"], record["new"]["primary"])] += record["count"]
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if args.workers > 1 and len(work) > CHUNK_CLASSES:
+            from multiprocessing import Pool
+
+            with Pool(args.workers, initializer=_init_worker, initargs=init_args) as pool:
+                for part in pool.imap_unordered(_diff_chunk, _chunks(work)):
+                    emit(part)
+        else:
+            _init_worker(*init_args)
+            for chunk in _chunks(work):
+                emit(_diff_chunk(chunk))
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "summary": True,
+            "lines": sum(lines.values()),
+            "invalid": invalid,
+            "unique_lines": len(lines),
+            "label_sets": len(tuples),
+            "classes": len(work),
+            "traffic": total,
+            "changed_classes": changed_classes,
+            "changed_traffic": {field: weights[field] for field in ("any", "primary", "fallbacks", "blocked")},
+            "changed_share": {field: round(weights[field] / total, 6) if total else 0.0 for field in ("any", "primary", "fallbacks", "blocked")},
+            "primary_transitions": [
+                {"old": old_primary, "new": new_primary, "count": n}
+                for (old_primary, new_primary), n in transitions.most_common(TOP_TRANSITIONS)
+            ],
+            "timings_s": {"prepare": round(prepared - started, 3), "total": round(elapsed, 3)},
+        }
+        out.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
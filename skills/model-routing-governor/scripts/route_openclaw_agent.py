@@ -2,82 +2,108 @@
 """Select a route and optionally execute `openclaw agent` with the chosen agent.
 
 This is a practical pre-router wrapper:
-- uses select_model.py for model route reasoning
+- routes models in-process via router.py (or router_daemon.py when running)
 - chooses an OpenClaw agent via agent-routing rules
 - prints a dry-run plan by default
 - can execute `openclaw agent` with --run
+- with --run --fallback, walks primary + fallbacks under one deadline
+- with --run --hedge, races a slow primary against the first fallback
+- with --run --stream raw|ndjson, forwards openclaw output as it arrives
+- records every executed attempt in the local telemetry store (telemetry.py)
 """
 
 from __future__ import annotations
 
 import argparse
+import codecs
 import json
+import math
+import os
+import queue
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from router import (
+    DEFAULT_ALIASES,
+    DEFAULT_POLICY,
+    RULE_STATS_ENV,
+    TRACE_ENV,
+    Router,
+    RuleStats,
+    add_label_arguments,
+    labels_from_args,
+    load_json,
+    match_fields,
+    profile_to,
+    trace_enabled,
+)
+from router_daemon import request_route
 
-def _load_json(path: Path) -> Dict[str, Any]:
-    try:
-        return json.loads(path.read_text())
-    except FileNotFoundError:
-        raise SystemExit(f"File not found: {path}")
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"Invalid JSON in {path}: {exc}")
-
-
-def _match_fields(labels: Dict[str, str], cond: Dict[str, Any]) -> bool:
-    for k, v in cond.items():
-        actual = labels.get(k)
-        if isinstance(v, list):
-            if actual not in v:
-                return False
-        else:
-            if actual != v:
-                return False
-    return True
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore[assignment]
 
+# Per-attempt timeout: seconds for the latency_budget label, scaled by the
+# model's latency_tier. Attempts never outlive the overall --deadline.
+ATTEMPT_SECONDS = {"fast": 60, "balanced": 180, "quality": 600}
+TIER_FACTORS = {"fast": 0.5, "mid": 1.0, "slow": 2.0}
+MIN_ATTEMPT_SECONDS = 5
+TIMEOUT_RETURNCODE = 124
+# Hedge delay by the primary's latency_tier when telemetry has no percentile for it yet.
+HEDGE_DELAY_SECONDS = {"fast": 4.0, "mid": 8.0, "slow": 20.0}
+HEDGE_CAP_PER_PROVIDER = 2
 
-def _labels_from_args(args: argparse.Namespace, defaults: Dict[str, str]) -> Dict[str, str]:
-    labels = dict(defaults)
-    if args.labels_json:
-        try:
-            labels.update(json.loads(args.labels_json))
-        except json.JSONDecodeError as exc:
-            raise SystemExit(f"--labels-json invalid JSON: {exc}")
-    for key in [
-        "scene",
-        "sensitivity",
-        "task_type",
-        "modality",
-        "complexity",
-        "value",
-        "context_size",
-        "language",
-        "latency_budget",
-        "cost_budget",
-        "privacy_requirement",
-        "provider_preference",
-    ]:
-        val = getattr(args, key, None)
-        if val is not None:
-            labels[key] = val
-    return {k: str(v) for k, v in labels.items()}
-
-
-def _route_models(select_model: Path, labels: Dict[str, str]) -> Dict[str, Any]:
-    cmd = [sys.executable, str(select_model), "--labels-json", json.dumps(labels)]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode not in (0, 2):
-        raise SystemExit(f"select_model failed rc={proc.returncode}: {proc.stderr.strip() or proc.stdout.strip()}")
-    try:
-        return json.loads(proc.stdout)
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"select_model output is not JSON: {exc}")
+
+def _route_models(
+    args: argparse.Namespace,
+    labels: Dict[str, str],
+    trace: Optional[Dict[str, Any]] = None,
+    rule_stats: Optional[RuleStats] = None
+) -> Dict[str, Any]:
+    """Route explicit label overrides; the result carries the merged labels.
+
+    A running router daemon answers without this process loading the policy.
+    With a `trace` dict, the router's own timings land in trace["router"].
+    Rule hits are only recorded here for in-process routes; a daemon keeps
+    its own counters.
+    """
+    if not args.no_daemon:
+        request: Dict[str, Any] = {"labels": labels, "policy": args.policy, "aliases": args.aliases, "adaptive": args.adaptive}
+        if args.adaptive:
+            # Only a `serve --adaptive` daemon reading the same telemetry store answers this.
+            from telemetry import default_path
+            request["telemetry"] = str(Path(args.telemetry or default_path()).resolve())
+        if trace is not None:
+            request["trace"] = True
+        routed = request_route(request, args.router_socket)
+        if routed is not None:
+            if "error" in routed:
+                raise SystemExit(f"router daemon failed: {routed['error']}")
+            if trace is not None:
+                trace["route_source"] = "daemon"
+                trace["router"] = routed.get("timings", {})
+            return routed
+    adaptive = None
+    if args.adaptive:
+        from telemetry import load_adaptive_scores
+        adaptive = load_adaptive_scores(args.telemetry)
+    router_trace: Optional[Dict[str, Any]] = {} if trace is not None else None
+    router = Router.from_files(args.policy, args.aliases, snapshot=True, rule_stats=rule_stats, adaptive=adaptive)
+    routed = router.route(labels, trace=router_trace)
+    if trace is not None:
+        trace["route_source"] = "in_process"
+        trace["router"] = router_trace
+    return routed
 
 
-def _pick_agent(agent_cfg: Dict[str, Any], labels: Dict[str, str]) -> Dict[str, Any]:
+def _pick_agent(agent_cfg: Dict[str, Any], labels: Dict[str, str], trace: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     defaults = agent_cfg.get("defaults", {})
     chosen = {
         "agent": defaults.get("agent", "annie"),
@@ -85,12 +111,16 @@ def _pick_agent(agent_cfg: Dict[str, Any], labels: Dict[str, str]) -> Dict[str,
         "notes": []
     }
     rules = sorted(agent_cfg.get("rules", []), key=lambda r: int(r.get("priority", 1000)))
+    evaluated = 0
     for rule in rules:
-        if _match_fields(labels, rule.get("when", {})):
+        evaluated += 1
+        if match_fields(labels, rule.get("when", {})):
             chosen["agent"] = rule["agent"]
             chosen["matched_rule"] = rule.get("id")
             chosen["notes"] = list(rule.get("notes", []))
             break
+    if trace is not None:
+        trace["agent_rules_evaluated"] = evaluated
     return chosen
 
 
@@ -109,10 +139,16 @@ def _pick_thinking(agent_cfg: Dict[str, Any], labels: Dict[str, str], override:
     return None
 
 
-def _build_openclaw_cmd(args: argparse.Namespace, agent_id: str, thinking: str | None) -> List[str]:
+def _build_openclaw_cmd(
+    args: argparse.Namespace,
+    agent_id: str,
+    thinking: str | None,
+    model: str | None = None,
+    timeout: int | None = None
+) -> List[str]:
     if not args.message and not args.stdin_message:
         raise SystemExit("Provide --message or --stdin-message when using this wrapper.")
-    cmd = ["openclaw", "agent", "--agent", agent_id]
+    cmd = [args.openclaw_bin, "agent", "--agent", agent_id]
     if args.message:
         cmd.extend(["--message", args.message])
     if args.to:
@@ -127,31 +163,421 @@ def _build_openclaw_cmd(args: argparse.Namespace, agent_id: str, thinking: str |
         cmd.append("--json")
     if thinking:
         cmd.extend(["--thinking", thinking])
-    if args.timeout is not None:
-        cmd.extend(["--timeout", str(args.timeout)])
+    if model:
+        cmd.extend([args.model_flag, model])
+    if timeout is None:
+        timeout = args.timeout
+    if timeout is not None:
+        cmd.extend(["--timeout", str(timeout)])
     return cmd
 
 
-def _parse_args() -> argparse.Namespace:
+def _attempt_plan(args: argparse.Namespace, model_route: Dict[str, Any], labels: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Models to try in order with their unclamped timeouts."""
+    models = load_json(Path(args.policy)).get("models", {})
+    base = ATTEMPT_SECONDS.get(labels.get("latency_budget", ""), ATTEMPT_SECONDS["balanced"])
+    plan = []
+    for model in [model_route.get("primary")] + list(model_route.get("fallbacks", [])):
+        if not model or any(step["model"] == model for step in plan):
+            continue
+        meta = models.get(model, {})
+        tier = meta.get("latency_tier", "mid")
+        plan.append({
+            "model": model,
+            "provider": meta.get("provider", model.split("/", 1)[0]),
+            "latency_tier": tier,
+            "timeout_s": base * TIER_FACTORS.get(tier, 1.0),
+        })
+    return plan
+
+
+def _deadline_seconds(args: argparse.Namespace, labels: Dict[str, str]) -> float:
+    if args.deadline is not None:
+        return args.deadline
+    if args.timeout is not None:
+        return args.timeout
+    return 2 * ATTEMPT_SECONDS.get(labels.get("latency_budget", ""), ATTEMPT_SECONDS["balanced"])
+
+
+def _attempt_timeout(step: Dict[str, Any], remaining: float, more: bool) -> float:
+    """Clamp a step's timeout to the deadline, leaving the next model one minimal attempt."""
+    timeout = min(step["timeout_s"], remaining - (MIN_ATTEMPT_SECONDS if more else 0))
+    if timeout < MIN_ATTEMPT_SECONDS:
+        timeout = min(MIN_ATTEMPT_SECONDS, remaining)
+    return timeout
+
+
+def _text(data: bytes | str | None) -> str:
+    if data is None:
+        return ""
+    return data if isinstance(data, str) else data.decode("utf-8", "replace")
+
+
+def _kill_group(proc: subprocess.Popen, sig: int) -> None:
+    """Signal the child's process group (children started with start_new_session)."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, sig)
+        else:
+            proc.send_signal(sig)
+    except ProcessLookupError:
+        pass
+
+
+def _run_captured(cmd: List[str], timeout: Optional[float], step: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run one attempt to completion, buffering its output."""
+    try:
+        proc = subprocess.run(cmd, text=True, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired as exc:
+        return {"returncode": TIMEOUT_RETURNCODE, "status": "timeout", "stdout": _text(exc.stdout), "stderr": _text(exc.stderr)}
+    status = "ok" if proc.returncode == 0 else "failed"
+    return {
+        "returncode": proc.returncode,
+        "status": status,
+        "output_bytes": len(proc.stdout.encode("utf-8")),
+        "stdout": proc.stdout,
+        "stderr": proc.stderr,
+    }
+
+
+def _record_attempts(args: argparse.Namespace, agent_id: str, attempts: List[Dict[str, Any]], providers: Dict[str, str]) -> None:
+    """Append finished attempts to the telemetry store; cancelled/skipped ones say nothing about the model."""
+    finished = [a for a in attempts if a.get("status") in ("ok", "failed", "timeout") and a.get("model")]
+    if args.no_telemetry or not finished:
+        return
+    import sqlite3
+    from telemetry import Telemetry
+    try:
+        store = Telemetry(args.telemetry)
+        try:
+            for a in finished:
+                size = a.get("output_bytes", a.get("bytes", {}).get("stdout", 0))
+                store.record(a["model"], providers.get(a["model"], a["model"].split("/", 1)[0]), agent_id,
+                             a.get("elapsed_ms", 0.0), a.get("returncode", 0), size, a["status"])
+        finally:
+            store.close()
+    except (OSError, sqlite3.Error) as exc:
+        print(f"[route_openclaw_agent] telemetry not recorded: {exc}", file=sys.stderr)
+
+
+Runner = Callable[[List[str], Optional[float], Optional[Dict[str, Any]]], Dict[str, Any]]
+
+
+def _run_fallback_chain(
+    args: argparse.Namespace,
+    agent_id: str,
+    thinking: str | None,
+    plan: List[Dict[str, Any]],
+    deadline_s: float,
+    runner: Runner = _run_captured
+) -> Dict[str, Any]:
+    """Run one attempt per model until one exits 0 or the deadline is spent."""
+    started = time.monotonic()
+    attempts: List[Dict[str, Any]] = []
+    final: Dict[str, Any] = {"returncode": TIMEOUT_RETURNCODE, "stdout": "", "stderr": ""}
+    for pos, step in enumerate(plan):
+        remaining = deadline_s - (time.monotonic() - started)
+        if remaining < 1:
+            attempts.append({"model": step["model"], "status": "skipped_deadline"})
+            continue
+        timeout = _attempt_timeout(step, remaining, pos + 1 < len(plan))
+        cmd = _build_openclaw_cmd(args, agent_id, thinking, step["model"], math.ceil(timeout))
+        attempt: Dict[str, Any] = {"model": step["model"], "cmd": cmd, "timeout_s": round(timeout, 3)}
+        attempt_start = time.monotonic()
+        outcome = runner(cmd, timeout, step)
+        final = {key: outcome[key] for key in ("returncode", "stdout", "stderr") if key in outcome}
+        attempt.update((key, value) for key, value in outcome.items() if key not in ("stdout", "stderr"))
+        attempt["elapsed_ms"] = round((time.monotonic() - attempt_start) * 1000, 1)
+        attempts.append(attempt)
+        if attempt["status"] == "ok":
+            final["model_used"] = step["model"]
+            break
+    final["attempts"] = attempts
+    final["deadline_s"] = deadline_s
+    final["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return final
+
+
+def _command_ran(outcome: Dict[str, Any]) -> Optional[List[str]]:
+    """argv of the attempt whose output `outcome` reports."""
+    ran = [a for a in outcome.get("attempts", []) if "cmd" in a]
+    used = [a for a in ran if a["model"] == outcome.get("model_used")]
+    return (used or ran or [{}])[-1].get("cmd")
+
+
+def _hedge_slot(provider: str, cap: int) -> Tuple[Optional[Any], bool]:
+    """Take one of `cap` per-provider hedge slots shared by all local processes.
+
+    Returns (handle to close when done, acquired). Without fcntl the cap is
+    not enforced.
+    """
+    if fcntl is None:
+        return None, True
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    lock_dir = Path(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()) / f"oc-hedge-{uid}"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in provider)
+    for slot in range(cap):
+        handle = open(lock_dir / f"{safe}.{slot}.lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return handle, True
+        except OSError:
+            handle.close()
+    return None, False
+
+
+class _Attempt:
+    """One running `openclaw agent` call; a thread collects its output."""
+
+    def __init__(self, cmd: List[str], step: Dict[str, Any], timeout: float, done: "queue.Queue[_Attempt]", origin: float) -> None:
+        self.cmd = cmd
+        self.step = step
+        self.timeout = timeout
+        self.origin = origin
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None
+        self.status = "running"
+        self.stdout = self.stderr = ""
+        # Own process group so a cancelled attempt takes its children with it.
+        self.proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            start_new_session=hasattr(os, "killpg")
+        )
+        self._thread = threading.Thread(target=self._collect, args=(done,), daemon=True)
+        self._thread.start()
+
+    def _collect(self, done: "queue.Queue[_Attempt]") -> None:
+        self.stdout, self.stderr = self.proc.communicate()
+        self.ended = time.monotonic()
+        done.put(self)
+
+    def expires_at(self) -> float:
+        return self.started + self.timeout
+
+    def stop(self, status: str) -> None:
+        self.status = status
+        _kill_group(self.proc, signal.SIGTERM)
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            _kill_group(self.proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+        self._thread.join(timeout=2)
+        if self.ended is None:
+            self.ended = time.monotonic()
+
+    def record(self) -> Dict[str, Any]:
+        returncode = self.proc.returncode
+        if self.status == "timeout":
+            returncode = TIMEOUT_RETURNCODE
+        return {
+            "model": self.step["model"],
+            "cmd": self.cmd,
+            "timeout_s": round(self.timeout, 3),
+            "status": self.status,
+            "returncode": returncode,
+            "started_ms": round((self.started - self.origin) * 1000, 1),
+            "elapsed_ms": round(((self.ended or time.monotonic()) - self.started) * 1000, 1),
+            "output_bytes": len(self.stdout.encode("utf-8")),
+        }
+
+
+def _hedge_delay(args: argparse.Namespace, primary: Dict[str, Any]) -> Tuple[float, str]:
+    """(seconds, source): --hedge-delay, else the primary's telemetry --hedge-percentile, else its latency_tier default."""
+    if args.hedge_delay is not None:
+        return args.hedge_delay, "flag"
+    from telemetry import load_hedge_delay_ms
+    delay_ms = load_hedge_delay_ms(primary["model"], args.telemetry, args.hedge_percentile)
+    if delay_ms is not None:
+        return delay_ms / 1000, f"telemetry_p{args.hedge_percentile}"
+    return HEDGE_DELAY_SECONDS.get(primary["latency_tier"], HEDGE_DELAY_SECONDS["mid"]), "latency_tier"
+
+
+def _run_hedged(
+    args: argparse.Namespace,
+    agent_id: str,
+    thinking: str | None,
+    plan: List[Dict[str, Any]],
+    deadline_s: float,
+    delay_s: float
+) -> Dict[str, Any]:
+    """Run the primary; if it has not answered after `delay_s`, race the first fallback.
+
+    The first attempt to exit 0 wins and the other is cancelled. A primary
+    that fails before the delay starts the fallback at once.
+    """
+    origin = time.monotonic()
+    done: "queue.Queue[_Attempt]" = queue.Queue()
+    runs: List[_Attempt] = []
+    hedge: Dict[str, Any] = {"delay_s": delay_s, "cap_per_provider": args.hedge_cap, "started": False}
+    slot_handle = None
+
+    def launch(step: Dict[str, Any], more: bool) -> None:
+        remaining = deadline_s - (time.monotonic() - origin)
+        timeout = _attempt_timeout(step, remaining, more)
+        cmd = _build_openclaw_cmd(args, agent_id, thinking, step["model"], math.ceil(timeout))
+        runs.append(_Attempt(cmd, step, timeout, done, origin))
+
+    def start_hedge(trigger: str) -> None:
+        nonlocal slot_handle
+        hedge["started"] = True
+        hedge["trigger"] = trigger
+        slot_handle, acquired = _hedge_slot(plan[1]["provider"], args.hedge_cap)
+        if not acquired:
+            hedge["skipped"] = "provider_cap"
+            return
+        hedge["started_ms"] = round((time.monotonic() - origin) * 1000, 1)
+        launch(plan[1], len(plan) > 2)
+
+    launch(plan[0], True)
+    winner: Optional[_Attempt] = None
+    try:
+        while winner is None:
+            running = [run for run in runs if run.status == "running"]
+            hedge_at = None if hedge["started"] else runs[0].started + delay_s
+            if not running and hedge_at is None:
+                break
+            if not running:
+                start_hedge("primary_timeout")
+                continue
+            wake = min([run.expires_at() for run in running] + ([hedge_at] if hedge_at else []))
+            try:
+                run = done.get(timeout=max(0.0, wake - time.monotonic()))
+            except queue.Empty:
+                now = time.monotonic()
+                for expired in (r for r in running if r.expires_at() <= now):
+                    expired.stop("timeout")
+                if hedge_at is not None and hedge_at <= now and runs[0].status == "running":
+                    start_hedge("delay")
+                continue
+            if run.status != "running":
+                continue  # stopped on timeout; already recorded
+            run.status = "ok" if run.proc.returncode == 0 else "failed"
+            if run.status == "ok":
+                winner = run
+            elif run is runs[0] and not hedge["started"]:
+                start_hedge("primary_failed")
+    finally:
+        for run in runs:
+            if run.status == "running":
+                run.stop("cancelled")
+        if slot_handle is not None:
+            slot_handle.close()
+
+    attempts = [run.record() for run in runs]
+    final_run = winner or runs[-1]
+    final: Dict[str, Any] = {
+        "returncode": TIMEOUT_RETURNCODE if final_run.status == "timeout" else final_run.proc.returncode,
+        "stdout": final_run.stdout,
+        "stderr": final_run.stderr,
+    }
+    if winner is not None:
+        final["model_used"] = winner.step["model"]
+        hedge["winner"] = "primary" if winner is runs[0] else "hedge"
+        if winner is runs[0] or hedge["trigger"] != "delay":
+            hedge["latency_saved_ms"] = 0.0
+        elif runs[0].status in ("failed", "timeout"):
+            # Sequentially, the fallback would have started when the primary failed or timed out.
+            hedge["latency_saved_ms"] = round((runs[0].ended - winner.started) * 1000, 1)
+        else:
+            # The primary was cancelled, so when it would have finished is unknown;
+            # waiting out its timeout is the most the hedge can have saved.
+            hedge["latency_saved_max_ms"] = round((runs[0].expires_at() - winner.started) * 1000, 1)
+    final["attempts"] = attempts
+    final["hedge"] = hedge
+    final["deadline_s"] = deadline_s
+    final["elapsed_ms"] = round((time.monotonic() - origin) * 1000, 1)
+    return final
+
+
+class _StreamWriter:
+    """Forward child output as it arrives.
+
+    raw: child stdout/stderr bytes pass through unchanged; the route and
+    summary records go to stderr as JSON lines.
+    ndjson: every record goes to stdout as one JSON line; output chunks are
+    {"type": "stdout"|"stderr", "attempt": n, "t_ms": ..., "data": "..."}.
+    """
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self.origin = time.monotonic()
+        self.attempt = 0
+
+    def record(self, doc: Dict[str, Any]) -> None:
+        out = sys.stdout if self.mode == "ndjson" else sys.stderr
+        out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        out.flush()
+
+    def _ms(self) -> float:
+        return round((time.monotonic() - self.origin) * 1000, 1)
+
+    def run(self, cmd: List[str], timeout: Optional[float], step: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Runner for `_run_fallback_chain`: one attempt, streamed."""
+        self.attempt += 1
+        if step is not None and self.mode == "ndjson":
+            self.record({"type": "attempt", "attempt": self.attempt, "model": step["model"], "t_ms": self._ms()})
+        started = time.monotonic()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=hasattr(os, "killpg"))
+        events: "queue.Queue[Tuple[str, bytes]]" = queue.Queue()
+
+        def pump(name: str, pipe: Any) -> None:
+            while True:
+                data = os.read(pipe.fileno(), 65536)
+                events.put((name, data))
+                if not data:
+                    return
+
+        for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+            threading.Thread(target=pump, args=(name, pipe), daemon=True).start()
+        decoders = {name: codecs.getincrementaldecoder("utf-8")("replace") for name in ("stdout", "stderr")}
+        sizes = {"stdout": 0, "stderr": 0}
+        first: Optional[float] = None
+        status: Optional[str] = None
+        open_streams = 2
+        while open_streams:
+            wait = None if timeout is None or status else max(0.0, started + timeout - time.monotonic())
+            try:
+                name, data = events.get(timeout=wait)
+            except queue.Empty:
+                status = "timeout"
+                _kill_group(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+                continue
+            if not data:
+                open_streams -= 1
+            else:
+                first = first or time.monotonic()
+                sizes[name] += len(data)
+            if self.mode == "raw":
+                target = sys.stdout.buffer if name == "stdout" else sys.stderr.buffer
+                target.write(data)
+                target.flush()
+                continue
+            text = decoders[name].decode(data, final=not data)
+            if text:
+                self.record({"type": name, "attempt": self.attempt, "t_ms": self._ms(), "data": text})
+        proc.wait()
+        for pipe in (proc.stdout, proc.stderr):
+            pipe.close()
+        returncode = TIMEOUT_RETURNCODE if status == "timeout" else proc.returncode
+        return {
+            "returncode": returncode,
+            "status": status or ("ok" if returncode == 0 else "failed"),
+            "first_output_ms": None if first is None else round((first - started) * 1000, 1),
+            "bytes": sizes,
+        }
+
+
+def _parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     here = Path(__file__).resolve()
     skill_root = here.parents[1]
     p = argparse.ArgumentParser(description="Route labels to OpenClaw agent and optionally run.")
-    p.add_argument("--select-model", default=str(skill_root / "scripts" / "select_model.py"))
     p.add_argument("--agent-routing", default=str(skill_root / "assets" / "openclaw-agent-routing.json"))
-    p.add_argument("--policy", default=str(skill_root / "assets" / "routing-policy.json"))
-    p.add_argument("--labels-json")
-    p.add_argument("--scene")
-    p.add_argument("--sensitivity")
-    p.add_argument("--task-type", dest="task_type")
-    p.add_argument("--modality")
-    p.add_argument("--complexity")
-    p.add_argument("--value")
-    p.add_argument("--context-size", dest="context_size")
-    p.add_argument("--language")
-    p.add_argument("--latency-budget", dest="latency_budget")
-    p.add_argument("--cost-budget", dest="cost_budget")
-    p.add_argument("--privacy-requirement", dest="privacy_requirement")
-    p.add_argument("--provider-preference", dest="provider_preference")
+    p.add_argument("--policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--aliases", default=str(DEFAULT_ALIASES))
+    p.add_argument("--router-socket", help="Router daemon socket (default: $OC_ROUTER_SOCKET or per-user runtime path)")
+    p.add_argument("--no-daemon", action="store_true", help="Always route in-process, never via the router daemon.")
+    add_label_arguments(p)
     p.add_argument("--message")
     p.add_argument("--stdin-message", action="store_true", help="Read message body from stdin.")
     p.add_argument("--to")
@@ -162,23 +588,75 @@ def _parse_args() -> argparse.Namespace:
     p.add_argument("--thinking", choices=["off", "minimal", "low", "medium", "high"])
     p.add_argument("--json-output", action="store_true", help="Pass --json to openclaw agent")
     p.add_argument("--run", action="store_true", help="Execute openclaw agent. Default is dry-run.")
+    p.add_argument("--fallback", action="store_true", help="With --run, try primary then fallbacks, one openclaw call per model, until one succeeds.")
+    p.add_argument("--deadline", type=float, metavar="SECONDS", help="Overall --fallback budget (default: --timeout, else twice the latency_budget attempt time).")
+    p.add_argument("--model-flag", metavar="FLAG", help="openclaw agent option that pins the model (e.g. --model-flag=--model). Without it openclaw uses the agent's configured model and nothing is pinned; --fallback and hedging need it.")
+    p.add_argument("--hedge", action="store_true", help="With --run, start the first fallback when the primary has not answered after --hedge-delay and keep whichever exits 0 first. Needs --model-flag; refused with --deliver, --to or --session-id.")
+    p.add_argument("--hedge-delay", type=float, metavar="SECONDS", help="--hedge: seconds to wait for the primary (default: its telemetry --hedge-percentile latency, else by latency_tier).")
+    p.add_argument("--hedge-percentile", type=int, choices=[50, 90, 99], default=90, help="--hedge: telemetry latency percentile used as the default delay (default: 90).")
+    p.add_argument("--hedge-cap", type=int, default=HEDGE_CAP_PER_PROVIDER, help=f"Concurrent hedges allowed per fallback provider on this host (default: {HEDGE_CAP_PER_PROVIDER}).")
+    p.add_argument("--stream", choices=["raw", "ndjson"], help="With --run, forward openclaw output as it arrives (raw bytes, or NDJSON chunk events) instead of one JSON document at the end.")
+    p.add_argument("--telemetry", metavar="FILE", help="Telemetry database for executed attempts (default: $OC_ROUTE_TELEMETRY or the XDG state dir).")
+    p.add_argument("--no-telemetry", action="store_true", help="Do not record executed attempts.")
+    p.add_argument("--adaptive", action="store_true", help="Reorder candidates within each stage by observed latency/failures from telemetry (uses the daemon only if it runs serve --adaptive).")
+    p.add_argument("--openclaw-bin", default="openclaw", help="openclaw executable (e.g. scripts/fake_openclaw.py for local testing).")
     p.add_argument("--pretty", action="store_true")
-    return p.parse_args()
+    p.add_argument("--trace", action="store_true", help=f"Add a per-phase 'timings' block to the output (also env {TRACE_ENV}=1).")
+    p.add_argument("--profile", metavar="FILE", help="Write cProfile stats for the whole run to FILE.")
+    p.add_argument("--rule-stats", metavar="FILE", help=f"Accumulate rule/agent-rule hit-miss counters in FILE (also env {RULE_STATS_ENV}).")
+    args = p.parse_args(argv)
+    if args.fallback and not args.model_flag:
+        p.error("--fallback needs --model-flag: without a pinned model every attempt would run the agent's configured model")
+    if args.hedge:
+        if not args.model_flag:
+            p.error("--hedge needs --model-flag: both racers would otherwise run the agent's configured model")
+        if args.stream:
+            p.error("--hedge cannot be combined with --stream")
+        # Both racers run to the point of replying; the loser is only killed afterwards.
+        side_effects = [flag for flag, on in (("--deliver", args.deliver), ("--to", args.to), ("--session-id", args.session_id)) if on]
+        if side_effects:
+            p.error(f"--hedge would deliver or write the session twice; drop {', '.join(side_effects)}")
+    return args
+
+
+def _elapsed(trace: Optional[Dict[str, Any]], key: str, started: int) -> int:
+    """Record ns since `started` under `key` (when tracing); returns the current clock."""
+    now = time.perf_counter_ns()
+    if trace is not None:
+        trace[key] = now - started
+    return now
+
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = _parse_args(argv)
+    with profile_to(args.profile):
+        code = _main(args)
+    sys.exit(code)
 
-def main() -> None:
-    args = _parse_args()
-    policy = _load_json(Path(args.policy))
-    labels = _labels_from_args(args, policy.get("defaults", {}))
+
+def _main(args: argparse.Namespace) -> int:
+    trace: Optional[Dict[str, Any]] = {} if trace_enabled(args.trace) else None
+    rule_stats = RuleStats.from_env(args.rule_stats)
+    started = clock = time.perf_counter_ns()
+    model_route = _route_models(args, labels_from_args({}, args), trace, rule_stats)
+    clock = _elapsed(trace, "route_models_ns", clock)
+    labels = model_route["labels"]
 
     if args.stdin_message:
         args.message = sys.stdin.read().strip()
+        clock = time.perf_counter_ns()
 
-    model_route = _route_models(Path(args.select_model), labels)
-    agent_cfg = _load_json(Path(args.agent_routing))
-    agent_pick = _pick_agent(agent_cfg, labels)
+    agent_cfg = load_json(Path(args.agent_routing))
+    clock = _elapsed(trace, "load_agent_routing_ns", clock)
+    agent_pick = _pick_agent(agent_cfg, labels, trace)
+    clock = _elapsed(trace, "pick_agent_ns", clock)
+    if rule_stats is not None:
+        rule_stats.track("agent_rules", (r["id"] for r in agent_cfg.get("rules", []) if "id" in r))
+        rule_stats.record_agent(agent_pick["matched_rule"])
+        rule_stats.flush()
     thinking = _pick_thinking(agent_cfg, labels, args.thinking)
-    cmd = _build_openclaw_cmd(args, agent_pick["agent"], thinking)
+    # Pin the routed primary only when the caller named openclaw's model option.
+    cmd = _build_openclaw_cmd(args, agent_pick["agent"], thinking, model_route.get("primary") if args.model_flag else None)
 
     result: Dict[str, Any] = {
         "labels": labels,
@@ -197,23 +675,111 @@ def main() -> None:
         "openclaw_command": cmd,
         "executed": False
     }
+    hedged = args.run and args.hedge
+    plan: List[Dict[str, Any]] = []
+    result_attempt: Dict[str, Any] = {}
+    if args.fallback or args.hedge:
+        plan = _attempt_plan(args, model_route, labels)
+        hedged = hedged and len(plan) > 1
+        result["fallback_plan"] = {"deadline_s": _deadline_seconds(args, labels), "attempts": plan}
+        if plan:
+            # What the first attempt runs: pinned to the primary with its clamped timeout.
+            first = _attempt_timeout(plan[0], result["fallback_plan"]["deadline_s"], len(plan) > 1)
+            result["openclaw_command"] = _build_openclaw_cmd(args, agent_pick["agent"], thinking, plan[0]["model"], math.ceil(first))
 
-    if args.run:
+    returncode = 0
+    if args.run and args.stream:
+        return _main_streamed(args, result, agent_pick["agent"], thinking, plan if args.fallback else None, trace, started,
+                              plan or _attempt_plan(args, model_route, labels))
+    if hedged:
+        clock = time.perf_counter_ns()
+        deadline_s = result["fallback_plan"]["deadline_s"]
+        delay_s, delay_source = _hedge_delay(args, plan[0])
+        outcome = _run_hedged(args, agent_pick["agent"], thinking, plan, deadline_s, delay_s)
+        outcome["hedge"]["delay_source"] = delay_source
+        rest = plan[len(outcome["attempts"]):] if args.fallback and "model_used" not in outcome else []
+        remaining = deadline_s - outcome["elapsed_ms"] / 1000
+        if rest and remaining >= 1:
+            chained = _run_fallback_chain(args, agent_pick["agent"], thinking, rest, remaining)
+            chained["attempts"] = outcome["attempts"] + chained["attempts"]
+            chained["elapsed_ms"] = round(outcome["elapsed_ms"] + chained["elapsed_ms"], 1)
+            chained["deadline_s"] = deadline_s
+            outcome = {**chained, "hedge": outcome["hedge"]}
+        _elapsed(trace, "subprocess_ns", clock)
+        result["executed"] = True
+        result.update(outcome)
+        result["openclaw_command"] = _command_ran(outcome) or cmd
+        returncode = outcome["returncode"]
+    elif args.run and args.fallback:
+        clock = time.perf_counter_ns()
+        outcome = _run_fallback_chain(args, agent_pick["agent"], thinking, plan, result["fallback_plan"]["deadline_s"])
+        _elapsed(trace, "subprocess_ns", clock)
+        result["executed"] = True
+        result.update(outcome)
+        result["openclaw_command"] = _command_ran(outcome) or cmd
+        returncode = outcome["returncode"]
+    elif args.run:
+        clock = time.perf_counter_ns()
         proc = subprocess.run(cmd, text=True, capture_output=True)
+        _elapsed(trace, "subprocess_ns", clock)
         result["executed"] = True
         result["returncode"] = proc.returncode
         result["stdout"] = proc.stdout
         result["stderr"] = proc.stderr
-        if args.pretty:
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-        else:
-            print(json.dumps(result, ensure_ascii=False))
-        sys.exit(proc.returncode)
+        returncode = proc.returncode
+        # Unpinned runs are attributed to the routed primary.
+        result_attempt = {
+            "model": model_route.get("primary"),
+            "cmd": cmd,
+            "status": "ok" if proc.returncode == 0 else "failed",
+            "returncode": proc.returncode,
+            "elapsed_ms": round((time.perf_counter_ns() - clock) / 1e6, 1),
+            "output_bytes": len(proc.stdout.encode("utf-8")),
+        }
+    if args.run:
+        providers = {step["model"]: step["provider"] for step in plan or _attempt_plan(args, model_route, labels)}
+        _record_attempts(args, agent_pick["agent"], result.get("attempts") or [result_attempt], providers)
+    if trace is not None:
+        _elapsed(trace, "total_ns", started)
+        result["timings"] = trace
+    if args.pretty:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
     else:
-        if args.pretty:
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-        else:
-            print(json.dumps(result, ensure_ascii=False))
+        print(json.dumps(result, ensure_ascii=False))
+    return returncode
+
+
+def _main_streamed(
+    args: argparse.Namespace,
+    result: Dict[str, Any],
+    agent_id: str,
+    thinking: str | None,
+    plan: Optional[List[Dict[str, Any]]],
+    trace: Optional[Dict[str, Any]],
+    started: int,
+    route_plan: List[Dict[str, Any]]
+) -> int:
+    """Route record first, then output as it arrives, then a summary record."""
+    writer = _StreamWriter(args.stream)
+    writer.record({"type": "route", **{k: v for k, v in result.items() if k != "executed"}})
+    clock = time.perf_counter_ns()
+    if plan is not None:
+        outcome = _run_fallback_chain(args, agent_id, thinking, plan, result["fallback_plan"]["deadline_s"], writer.run)
+        outcome.pop("stdout", None)
+        outcome.pop("stderr", None)
+        outcome["openclaw_command"] = _command_ran(outcome)
+    else:
+        outcome = writer.run(result["openclaw_command"], None)
+        outcome["elapsed_ms"] = round((time.perf_counter_ns() - clock) / 1e6, 1)
+    _elapsed(trace, "subprocess_ns", clock)
+    attempts = outcome.get("attempts") or [{**outcome, "model": result["model_route"]["primary"], "cmd": result["openclaw_command"]}]
+    _record_attempts(args, agent_id, attempts, {step["model"]: step["provider"] for step in route_plan})
+    summary: Dict[str, Any] = {"type": "summary", "executed": True, **outcome}
+    if trace is not None:
+        _elapsed(trace, "total_ns", started)
+        summary["timings"] = trace
+    writer.record(summary)
+    return outcome["returncode"]
 
 
 if __name__ == "__main__":
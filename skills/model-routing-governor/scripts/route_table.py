@@ -0,0 +1,270 @@
+"""Precomputed route table: every reachable label combination resolved ahead of time.
+
+Routing only compares label values against rule/constraint conditions, so the
+values of each key fall into equivalence classes (values accepted by exactly
+the same conditions behave identically, and any value no condition mentions
+joins the "other" class). The table enumerates the cross product of classes,
+stores one route id per combination in a flat mixed-radix array, and keeps the
+deduplicated route documents alongside it.
+
+File layout (little-endian, memory-mappable):
+  8 bytes   magic b"OCRTBL01"
+  4 bytes   header length H
+  H bytes   header JSON (keys, classes, strides, fingerprint, defaults, ...)
+  N*W bytes route ids (W = 2 or 4 bytes), index = sum(class_i * stride_i)
+  rest      JSON array of route documents (without "labels")
+
+`RouteTable.route(labels)` returns the same document as `Router.route`, or
+None when a label falls outside a declared subset the table was built for.
+The header records the policy/alias paths and their content fingerprint; if
+the files no longer match on open, the table warns and routes through
+`Router` instead of serving stale routes.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from router import DEFAULT_ALIASES, DEFAULT_POLICY, Router, _read_source, _route, merge_labels
+
+MAGIC = b"OCRTBL01"
+OTHER = "\x00other"
+
+_worker_router: Optional[Router] = None
+_worker_layout: Dict[str, Any] = {}
+
+
+def _conditions_by_key(policy: Dict[str, Any]) -> Dict[str, List[List[Any]]]:
+    """Collect, per label key, the accepted-value list of every condition on it."""
+    by_key: Dict[str, List[List[Any]]] = {}
+    scoring = policy.get("scoring") or {}
+    entries = list(policy.get("route_rules", [])) + list(policy.get("constraints", [])) + ([scoring] if scoring else [])
+    for entry in entries:
+        conds = [entry.get("when") or {}] + list(entry.get("when_any", []))
+        for cond in conds:
+            for key, expected in cond.items():
+                values = expected if isinstance(expected, list) else [expected]
+                by_key.setdefault(key, []).append(values)
+    # Scoring reads budget weights and capability hints per label value.
+    for section in ("budget_weights", "capability_labels"):
+        for key, by_value in scoring.get(section, {}).items():
+            for value in by_value:
+                by_key.setdefault(key, []).append([value])
+    return by_key
+
+
+def label_classes(policy: Dict[str, Any]) -> Dict[str, List[List[str]]]:
+    """Group each routed key's known values into equivalence classes.
+
+    The last class of every key is the "other" class; it holds values that no
+    condition accepts (including OTHER itself, used as its representative).
+    """
+    classes: Dict[str, List[List[str]]] = {}
+    for key, conds in sorted(_conditions_by_key(policy).items()):
+        known = sorted({v for values in conds for v in values if isinstance(v, str)})
+        groups: Dict[Tuple[bool, ...], List[str]] = {}
+        for value in known:
+            signature = tuple(value in values for values in conds)
+            if any(signature):
+                groups.setdefault(signature, []).append(value)
+        classes[key] = list(groups.values()) + [[OTHER]]
+    return classes
+
+
+def _layout(policy: Dict[str, Any], only: Optional[Mapping[str, Sequence[str]]]) -> Dict[str, Any]:
+    classes = label_classes(policy)
+    enumerated: Dict[str, List[int]] = {}
+    for key, groups in classes.items():
+        ids = list(range(len(groups)))
+        if only and key in only:
+            # Declared values outside every known class land in the "other" class.
+            class_of = {value: i for i, group in enumerate(groups) for value in group}
+            ids = sorted({class_of.get(value, len(groups) - 1) for value in only[key]})
+        enumerated[key] = ids
+    keys = sorted(classes)
+    strides: List[int] = []
+    size = 1
+    for key in reversed(keys):
+        strides.append(size)
+        size *= len(enumerated[key])
+    strides.reverse()
+    return {"keys": keys, "classes": classes, "enumerated": enumerated, "strides": strides, "count": size}
+
+
+def _labels_for(index: int, layout: Dict[str, Any]) -> Dict[str, str]:
+    labels = {}
+    for key, stride in zip(layout["keys"], layout["strides"]):
+        ids = layout["enumerated"][key]
+        class_id = ids[(index // stride) % len(ids)]
+        labels[key] = layout["classes"][key][class_id][0]
+    return labels
+
+
+def _init_worker(policy_path: str, aliases_path: str, available: List[str], deny: List[str], layout: Dict[str, Any]) -> None:
+    global _worker_router, _worker_layout
+    _worker_router = Router.from_files(policy_path, aliases_path, available_models=available, deny_model_prefixes=deny, cache_size=0)
+    _worker_layout = layout
+
+
+def _route_range(bounds: Tuple[int, int]) -> Tuple[List[str], array]:
+    """Route one slice of the index space; returns (unique route JSON, local ids)."""
+    assert _worker_router is not None
+    router, layout = _worker_router, _worker_layout
+    unique: Dict[str, int] = {}
+    ids = array("I")
+    for index in range(*bounds):
+        labels = merge_labels(router.defaults, _labels_for(index, layout))
+        out = _route(router.compiled, router.aliases, labels, router.available_models, router.deny_model_prefixes)
+        out.pop("labels")
+        doc = json.dumps(out, ensure_ascii=False)
+        ids.append(unique.setdefault(doc, len(unique)))
+    return list(unique), ids
+
+
+def build(
+    policy_path: Path | str,
+    aliases_path: Path | str,
+    output: Path | str,
+    available_models: Iterable[str] = (),
+    deny_model_prefixes: Iterable[str] = (),
+    only: Optional[Mapping[str, Sequence[str]]] = None,
+    workers: int = 1
+) -> Dict[str, Any]:
+    """Resolve every label-class combination and write the table; returns the header."""
+    available, deny = list(available_models), list(deny_model_prefixes)
+    router = Router.from_files(policy_path, aliases_path, available_models=available, deny_model_prefixes=deny)
+    layout = _layout(router.policy, only)
+    count = layout["count"]
+    step = max(1, min(50000, count // max(1, workers * 8)))
+    ranges = [(start, min(count, start + step)) for start in range(0, count, step)]
+    init_args = (str(policy_path), str(aliases_path), available, deny, layout)
+
+    routes: Dict[str, int] = {}
+    ids = array("I")
+
+    def merge(part: Tuple[List[str], array]) -> None:
+        local_docs, local_ids = part
+        mapping = [routes.setdefault(doc, len(routes)) for doc in local_docs]
+        ids.extend(mapping[i] for i in local_ids)
+
+    if workers > 1:
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            for part in pool.imap(_route_range, ranges):
+                merge(part)
+    else:
+        _init_worker(*init_args)
+        for bounds in ranges:
+            merge(_route_range(bounds))
+
+    width = 2 if len(routes) <= 0xFFFF else 4
+    packed = array("H" if width == 2 else "I", ids)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    header = {
+        "version": 1,
+        "fingerprint": router.fingerprint,
+        "policy": str(Path(policy_path).resolve()),
+        "aliases": str(Path(aliases_path).resolve()),
+        "defaults": router.defaults,
+        "keys": layout["keys"],
+        "classes": layout["classes"],
+        "enumerated": layout["enumerated"],
+        "strides": layout["strides"],
+        "count": count,
+        "width": width,
+        "routes": len(routes),
+        "available_models": available,
+        "deny_model_prefixes": deny,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    routes_bytes = ("[" + ",".join(routes) + "]").encode("utf-8")
+    with open(output, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(packed.tobytes())
+        f.write(routes_bytes)
+    return header
+
+
+class RouteTable:
+    """Lookup-only router over a file written by `build`.
+
+    policy_path / aliases_path default to the paths recorded at build time.
+    When their current fingerprint differs from the table's, lookups fall
+    back to a `Router` over those files (`self.stale` is True).
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        policy_path: Path | str | None = None,
+        aliases_path: Path | str | None = None
+    ) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise SystemExit(f"Not a route table: {self.path}")
+        (header_len,) = struct.unpack_from("<I", self._mm, 8)
+        self.header = json.loads(self._mm[12:12 + header_len].decode("utf-8"))
+        self._ids_offset = 12 + header_len
+        self._fmt = "<H" if self.header["width"] == 2 else "<I"
+        routes_offset = self._ids_offset + self.header["count"] * self.header["width"]
+        self._routes: List[Dict[str, Any]] = json.loads(self._mm[routes_offset:].decode("utf-8"))
+        self.defaults: Dict[str, Any] = self.header["defaults"]
+        # key -> (value -> position within the enumerated classes, position of "other" or None)
+        self._lookup: List[Tuple[str, int, Dict[str, int], Optional[int]]] = []
+        for key, stride in zip(self.header["keys"], self.header["strides"]):
+            groups = self.header["classes"][key]
+            enumerated = self.header["enumerated"][key]
+            value_pos = {value: pos for pos, cid in enumerate(enumerated) for value in groups[cid]}
+            other_pos = value_pos.get(OTHER)
+            self._lookup.append((key, stride, value_pos, other_pos))
+        self._router: Optional[Router] = None
+        policy_path = Path(policy_path or self.header.get("policy") or DEFAULT_POLICY)
+        aliases_path = Path(aliases_path or self.header.get("aliases") or DEFAULT_ALIASES)
+        current = _read_source(policy_path)[1] + _read_source(aliases_path)[1]
+        if current != self.fingerprint:
+            print(
+                f"[route_table] {self.path} is stale: built for fingerprint {self.fingerprint[:12]}, "
+                f"{policy_path.name} + {aliases_path.name} are now {current[:12]}; routing through Router "
+                f"until the table is rebuilt",
+                file=sys.stderr,
+            )
+            self._router = Router.from_files(
+                policy_path, aliases_path,
+                available_models=self.header["available_models"],
+                deny_model_prefixes=self.header["deny_model_prefixes"],
+            )
+
+    @property
+    def stale(self) -> bool:
+        return self._router is not None
+
+    @property
+    def fingerprint(self) -> str:
+        return self.header["fingerprint"]
+
+    def route(self, labels: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if self._router is not None:
+            return self._router.route(labels)
+        merged = merge_labels(self.defaults, labels)
+        index = 0
+        for key, stride, value_pos, other_pos in self._lookup:
+            pos = value_pos.get(merged.get(key), other_pos)  # type: ignore[arg-type]
+            if pos is None:
+                return None
+            index += pos * stride
+        (route_id,) = struct.unpack_from(self._fmt, self._mm, self._ids_offset + index * self.header["width"])
+        return {"labels": merged, **self._routes[route_id]}
+
+    def close(self) -> None:
+        self._mm.close()
@@ -0,0 +1,1117 @@
+"""Shared in-process routing engine for the model-routing-governor scripts.
+
+select_model.py, route_openclaw_agent.py, smoke_test_routes.py and the
+repo-root oc-route.py import this module instead of calling each other via
+subprocess. The main entry point is `Router`:
+
+    router = Router.from_files()
+    out = router.route({"task_type": "coding", "complexity": "high"})
+    for out in router.route_many(label_sets): ...
+
+Each result is the same JSON document select_model.py prints.
+This module intentionally uses only the Python standard library.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats files are merged without a lock.
+    fcntl = None  # type: ignore[assignment]
+
+SKILL_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_POLICY = SKILL_ROOT / "assets" / "routing-policy.json"
+DEFAULT_ALIASES = SKILL_ROOT / "assets" / "alias-map.json"
+
+LABEL_KEYS = [
+    "scene",
+    "sensitivity",
+    "task_type",
+    "modality",
+    "complexity",
+    "value",
+    "context_size",
+    "language",
+    "latency_budget",
+    "cost_budget",
+    "privacy_requirement",
+    "provider_preference",
+]
+
+DEFAULT_CACHE_SIZE = 1024
+
+# Bump when CompiledPolicy.snapshot_state changes shape; snapshots are also
+# keyed by this file's mtime/size, so editing it invalidates them.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ENV = "OC_ROUTE_SNAPSHOT_DIR"
+SNAPSHOT_KEEP = 16
+
+TRACE_ENV = "OC_ROUTE_TRACE"
+RULE_STATS_ENV = "OC_ROUTE_RULE_STATS"
+RULE_STATS_MAX_LABEL_SETS = 10000
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        raise SystemExit(f"File not found: {path}")
+    except json.JSONDecodeError as exc:
+        raise SystemExit(f"Invalid JSON in {path}: {exc}")
+
+
+def _stat_signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_source(path: Path) -> Tuple[bytes, str, Tuple[int, int]]:
+    """Read a source file and return (bytes, sha256 of bytes, stat signature)."""
+    try:
+        signature = _stat_signature(path)
+        data = path.read_bytes()
+    except FileNotFoundError:
+        raise SystemExit(f"File not found: {path}")
+    return data, hashlib.sha256(data).hexdigest(), signature
+
+
+def _parse_source(path: Path, data: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise SystemExit(f"Invalid JSON in {path}: {exc}")
+
+
+def _load_source(path: Path) -> Tuple[Dict[str, Any], str, Tuple[int, int]]:
+    """Load a JSON file and return (document, sha256 of bytes, stat signature)."""
+    data, digest, signature = _read_source(path)
+    return _parse_source(path, data), digest, signature
+
+
+def snapshot_dir() -> Path:
+    """Where compiled policy snapshots live (env OC_ROUTE_SNAPSHOT_DIR, else the XDG cache dir)."""
+    if os.environ.get(SNAPSHOT_ENV):
+        return Path(os.environ[SNAPSHOT_ENV])
+    cache_home = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(cache_home) / "openclaw-dev" / "model-routing-governor"
+
+
+_code_version: Optional[str] = None
+
+
+def _snapshot_path(fingerprint: str) -> Path:
+    global _code_version
+    if _code_version is None:
+        _code_version = "%d-%d-%d.%d" % (_stat_signature(Path(__file__)) + sys.version_info[:2])
+    key = hashlib.sha256(f"{SNAPSHOT_VERSION}:{_code_version}:{fingerprint}".encode("utf-8")).hexdigest()
+    return snapshot_dir() / f"policy-{key[:32]}.marshal"
+
+
+def load_snapshot(fingerprint: str) -> Optional[Tuple["CompiledPolicy", Dict[str, Any]]]:
+    """Return (compiled policy, alias document) for a content fingerprint, or None."""
+    try:
+        state, alias_doc = marshal.loads(_snapshot_path(fingerprint).read_bytes())
+        return CompiledPolicy.from_snapshot_state(state), alias_doc
+    except Exception:
+        # Missing, truncated or written by incompatible code: rebuild from source.
+        return None
+
+
+def save_snapshot(fingerprint: str, compiled: "CompiledPolicy", alias_doc: Dict[str, Any]) -> None:
+    """Write a snapshot atomically; best effort, an unwritable cache dir is ignored."""
+    path = _snapshot_path(fingerprint)
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump((compiled.snapshot_state(), alias_doc), f)
+        os.replace(tmp, path)
+        stale = sorted(path.parent.glob("policy-*.marshal"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in stale[SNAPSHOT_KEEP:]:
+            old.unlink()
+    except OSError:
+        pass
+
+
+def _canonicalize(model_id: str, alias_map: Dict[str, str]) -> str:
+    seen = set()
+    cur = model_id
+    while cur in alias_map and cur not in seen:
+        seen.add(cur)
+        cur = alias_map[cur]
+    return cur
+
+
+def match_fields(labels: Dict[str, str], cond: Dict[str, Any]) -> bool:
+    for key, expected in cond.items():
+        actual = labels.get(key)
+        if isinstance(expected, list):
+            if actual not in expected:
+                return False
+        else:
+            if actual != expected:
+                return False
+    return True
+
+
+def _rule_matches(labels: Dict[str, str], rule: Dict[str, Any]) -> bool:
+    if "when" in rule and not match_fields(labels, rule["when"]):
+        return False
+    if "when_any" in rule:
+        any_ok = False
+        for cond in rule["when_any"]:
+            if match_fields(labels, cond):
+                any_ok = True
+                break
+        if not any_ok:
+            return False
+    return True
+
+
+def _stage_key(stage: Dict[str, Any]) -> Tuple[str, str]:
+    return (stage.get("name", "primary"), stage["slot"])
+
+
+def _apply_stage_augmentation(stages: List[Dict[str, Any]], aug: Dict[str, Any]) -> List[Dict[str, Any]]:
+    position = aug.get("position", "append")
+    new_stage = {k: v for k, v in aug.items() if k != "position"}
+    if position == "prepend":
+        return [new_stage] + stages
+    return stages + [new_stage]
+
+
+def _dedupe_stage_list(stages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen = set()
+    out = []
+    for stage in stages:
+        key = _stage_key(stage)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(stage)
+    return out
+
+
+def _provider_of(model_id: str, policy_models: Dict[str, Any]) -> str:
+    return str(policy_models.get(model_id, {}).get("provider", model_id.split("/", 1)[0]))
+
+
+def _blocked_model(model_id: str, provider: str, constraint_ctx: Dict[str, Any]) -> Tuple[bool, str]:
+    for banned_provider in constraint_ctx["ban_providers"]:
+        if provider == banned_provider:
+            return True, f"provider:{banned_provider}"
+    for prefix in constraint_ctx["ban_model_prefixes"]:
+        if model_id.startswith(prefix):
+            return True, f"prefix:{prefix}"
+    return False, ""
+
+
+class _ConditionIndex:
+    """Maps `(label key, label value)` to the positions of entries that may match.
+
+    Each entry contributes one anchor key per condition block (the key with the
+    fewest accepted values). Entries without a usable anchor are kept in
+    `always` and are evaluated for every label set.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]) -> None:
+        self.always: List[int] = []
+        self.by_key: Dict[str, Dict[Any, List[int]]] = {}
+        for pos, entry in enumerate(entries):
+            anchors = _entry_anchors(entry)
+            if anchors is None:
+                self.always.append(pos)
+                continue
+            for key, values in anchors:
+                bucket = self.by_key.setdefault(key, {})
+                for value in values:
+                    positions = bucket.setdefault(value, [])
+                    if not positions or positions[-1] != pos:
+                        positions.append(pos)
+
+    def candidates(self, labels: Dict[str, str]) -> List[int]:
+        hits = set(self.always)
+        for key, bucket in self.by_key.items():
+            positions = bucket.get(labels.get(key))
+            if positions:
+                hits.update(positions)
+        return sorted(hits)
+
+
+def _cond_anchor(cond: Dict[str, Any]) -> Tuple[str, List[Any]] | None:
+    best: Tuple[str, List[Any]] | None = None
+    for key, expected in cond.items():
+        values = expected if isinstance(expected, list) else [expected]
+        try:
+            for value in values:
+                hash(value)
+        except TypeError:
+            continue
+        if best is None or len(values) < len(best[1]):
+            best = (key, values)
+    return best
+
+
+def _entry_anchors(entry: Dict[str, Any]) -> List[Tuple[str, List[Any]]] | None:
+    """Return anchor conditions for an entry, or None if it must always be checked.
+
+    An empty list means the entry can never match (for example `when_any: []`).
+    """
+    when = entry.get("when")
+    if when:
+        anchor = _cond_anchor(when)
+        if anchor is not None:
+            return [anchor]
+    if "when_any" in entry:
+        anchors = []
+        for cond in entry["when_any"]:
+            anchor = _cond_anchor(cond) if cond else None
+            if anchor is None:
+                return None
+            anchors.append(anchor)
+        return anchors
+    return None
+
+
+class _CandidateTable:
+    """Slot candidates canonicalized once, with one bit per distinct model.
+
+    Provider bans, prefix denials and the available-model set become integer
+    masks, so filtering a stage costs a few bitwise operations. Block reasons
+    are only worked out for the models a mask actually removes.
+    `expand` returns exactly what `_expand_candidates` returns.
+    """
+
+    def __init__(self, policy: Dict[str, Any], aliases: Dict[str, str]) -> None:
+        self.aliases = aliases
+        models_cfg = policy.get("models", {})
+        self.models: List[str] = []
+        self.providers: List[str] = []
+        self.bits: Dict[str, int] = {}
+        self.provider_masks: Dict[str, int] = {}
+        # slot id -> ([(model id, bit)], OR of the bits); empty slots are left out like missing ones.
+        self.slots: Dict[str, Tuple[List[Tuple[str, int]], int]] = {}
+        for slot_id, slot in policy.get("slots", {}).items():
+            if not slot:
+                continue
+            entries: List[Tuple[str, int]] = []
+            slot_mask = 0
+            for raw_model in slot.get("candidates", []):
+                model_id = _canonicalize(raw_model, aliases)
+                bit = self.bits.get(model_id)
+                if bit is None:
+                    bit = self.bits[model_id] = 1 << len(self.models)
+                    provider = _provider_of(model_id, models_cfg)
+                    self.models.append(model_id)
+                    self.providers.append(provider)
+                    self.provider_masks[provider] = self.provider_masks.get(provider, 0) | bit
+                entries.append((model_id, bit))
+                slot_mask |= bit
+            self.slots[slot_id] = (entries, slot_mask)
+        self._prefix_masks: Dict[str, int] = {}
+
+    def prefix_mask(self, prefix: str) -> int:
+        mask = self._prefix_masks.get(prefix)
+        if mask is None:
+            mask = 0
+            for model_id in self.models:
+                if model_id.startswith(prefix):
+                    mask |= self.bits[model_id]
+            self._prefix_masks[prefix] = mask
+        return mask
+
+    def _mask_of(self, items: Iterable[str], lookup: Any) -> int:
+        mask = 0
+        for item in items:
+            mask |= lookup(item)
+        return mask
+
+    def expand(
+        self,
+        stages: List[Dict[str, Any]],
+        constraint_ctx: Dict[str, Any],
+        available: Iterable[str],
+        extra_deny_prefixes: List[str],
+        adaptive: Optional[Mapping[str, Tuple[bool, float]]] = None,
+        scoring: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        ban_prefixes = constraint_ctx["ban_model_prefixes"]
+        preferred = constraint_ctx.get("prefer_providers", [])
+        provider_ban = self._mask_of(constraint_ctx["ban_providers"], lambda p: self.provider_masks.get(p, 0))
+        prefix_ban = self._mask_of(ban_prefixes, self.prefix_mask)
+        cli_ban = self._mask_of(extra_deny_prefixes, self.prefix_mask)
+        prefer_mask = self._mask_of(preferred, lambda p: self.provider_masks.get(p, 0))
+        allowed = ~(provider_ban | prefix_ban | cli_ban)
+        available_set = set(available)
+        if available_set:
+            allowed &= self._mask_of(available_set, lambda m: self.bits.get(m, 0))
+
+        def reason(model_id: str, bit: int) -> str:
+            if bit & provider_ban:
+                return f"provider:{self.providers[bit.bit_length() - 1]}"
+            if bit & prefix_ban:
+                return "prefix:" + next(p for p in ban_prefixes if model_id.startswith(p))
+            if bit & cli_ban:
+                return "cli_prefix:" + next(p for p in extra_deny_prefixes if model_id.startswith(p))
+            return "not_in_available_set"
+
+        stage_plan = []
+        flattened: List[str] = []
+        blocked: List[Dict[str, str]] = []
+        for stage in stages:
+            name = stage.get("name", "primary")
+            slot = self.slots.get(stage["slot"])
+            if slot is None:
+                stage_plan.append({"stage": name, "slot": stage["slot"], "candidates": [], "warning": "missing_slot"})
+                continue
+            entries, slot_mask = slot
+            if not slot_mask & ~allowed:
+                kept = [model_id for model_id, _ in entries]
+            else:
+                kept = []
+                for model_id, bit in entries:
+                    if bit & allowed:
+                        kept.append(model_id)
+                    else:
+                        blocked.append({"model": model_id, "reason": reason(model_id, bit), "stage": name})
+            scores = None
+            if scoring:
+                kept, scores = _score_stage(kept, scoring)
+            if adaptive:
+                kept = _adaptive_order(kept, adaptive)
+            if preferred:
+                # Same order as a stable sort keyed on (not preferred, first index in kept).
+                first: Dict[str, int] = {}
+                for i, model_id in enumerate(kept):
+                    first.setdefault(model_id, i)
+                kept = sorted(kept, key=lambda m: (0 if self.bits[m] & prefer_mask else 1, first[m]))
+            entry = {"stage": name, "slot": stage["slot"], "candidates": kept}
+            if scores is not None:
+                entry["scores"] = [scores[m] for m in kept]
+            stage_plan.append(entry)
+            flattened.extend(kept)
+
+        deduped_flat = list(dict.fromkeys(flattened))
+        return {
+            "stage_plan": stage_plan,
+            "primary": deduped_flat[0] if deduped_flat else None,
+            "fallbacks": deduped_flat[1:],
+            "blocked": blocked
+        }
+
+
+class CompiledPolicy:
+    """Routing policy with rules pre-sorted and conditions indexed once.
+
+    `matching_rules` / `matching_constraints` only evaluate entries whose anchor
+    condition can hold for the given labels, then confirm with `_rule_matches`,
+    so results are identical to a linear scan in priority order. When built
+    with an alias map, slot candidates are also precompiled (`candidates`).
+    """
+
+    def __init__(self, policy: Dict[str, Any], indexed: bool = True, aliases: Optional[Dict[str, str]] = None) -> None:
+        self.policy = policy
+        self.rules = sorted(policy["route_rules"], key=lambda r: int(r.get("priority", 1000)))
+        self.constraints = list(policy.get("constraints", []))
+        self._rule_index = _ConditionIndex(self.rules) if indexed else None
+        self._constraint_index = _ConditionIndex(self.constraints) if indexed else None
+        self.candidates = _CandidateTable(policy, aliases) if aliases is not None else None
+
+    def snapshot_state(self) -> Tuple[Any, ...]:
+        """Plain-data form of the compiled policy (marshal-able); see `from_snapshot_state`."""
+        return (
+            self.policy,
+            self.rules,
+            self.constraints,
+            vars(self._rule_index) if self._rule_index else None,
+            vars(self._constraint_index) if self._constraint_index else None,
+            vars(self.candidates) if self.candidates else None,
+        )
+
+    @classmethod
+    def from_snapshot_state(cls, state: Tuple[Any, ...]) -> "CompiledPolicy":
+        def restore(kind: Any, attrs: Optional[Dict[str, Any]]) -> Any:
+            if attrs is None:
+                return None
+            obj = kind.__new__(kind)
+            obj.__dict__.update(attrs)
+            return obj
+
+        compiled = cls.__new__(cls)
+        compiled.policy, compiled.rules, compiled.constraints = state[0], state[1], state[2]
+        compiled._rule_index = restore(_ConditionIndex, state[3])
+        compiled._constraint_index = restore(_ConditionIndex, state[4])
+        compiled.candidates = restore(_CandidateTable, state[5])
+        return compiled
+
+    @staticmethod
+    def _matching(
+        entries: List[Dict[str, Any]],
+        index: _ConditionIndex | None,
+        labels: Dict[str, str],
+        stats: Optional[Dict[str, Any]] = None,
+        counter: str = ""
+    ) -> List[Dict[str, Any]]:
+        if index is None:
+            if stats is not None:
+                stats[counter] = stats.get(counter, 0) + len(entries)
+            return [e for e in entries if _rule_matches(labels, e)]
+        positions = index.candidates(labels)
+        if stats is not None:
+            stats[counter] = stats.get(counter, 0) + len(positions)
+        return [entries[pos] for pos in positions if _rule_matches(labels, entries[pos])]
+
+    def matching_rules(self, labels: Dict[str, str], stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._matching(self.rules, self._rule_index, labels, stats, "rules_evaluated")
+
+    def matching_constraints(self, labels: Dict[str, str], stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._matching(self.constraints, self._constraint_index, labels, stats, "constraints_evaluated")
+
+
+def _resolve_route(
+    policy: Dict[str, Any] | CompiledPolicy,
+    labels: Dict[str, str],
+    stats: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], List[str], List[str], Dict[str, Any]]:
+    # A raw policy dict is resolved with a plain linear scan (sorted per call).
+    compiled = policy if isinstance(policy, CompiledPolicy) else CompiledPolicy(policy, indexed=False)
+
+    stages: List[Dict[str, Any]] = []
+    matched_rules: List[str] = []
+    notes: List[str] = []
+
+    constraint_ctx = {
+        "ban_providers": [],
+        "ban_model_prefixes": [],
+        "prefer_providers": []
+    }
+    matched_constraints: List[str] = []
+
+    for c in compiled.matching_constraints(labels, stats):
+        matched_constraints.append(c.get("id", "unnamed_constraint"))
+        constraint_ctx["ban_providers"].extend(c.get("ban_providers", []))
+        constraint_ctx["ban_model_prefixes"].extend(c.get("ban_model_prefixes", []))
+        constraint_ctx["prefer_providers"].extend(c.get("prefer_providers", []))
+        if c.get("reason"):
+            notes.append(c["reason"])
+
+    for rule in compiled.matching_rules(labels, stats):
+        matched_rules.append(rule.get("id", "unnamed_rule"))
+        if "stages" in rule:
+            stages = [dict(s) for s in rule["stages"]]
+        for aug in rule.get("augment_stages", []):
+            stages = _apply_stage_augmentation(stages, aug)
+        notes.extend(rule.get("notes", []))
+
+    stages = _dedupe_stage_list(stages)
+    return stages, matched_rules, matched_constraints, constraint_ctx
+
+
+DEFAULT_TIER_POINTS = {"low": 0, "fast": 0, "mid": 1, "high": 2, "slow": 2}
+
+
+def _scoring_context(policy: Dict[str, Any], labels: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Per-route inputs for `_score_stage`, or None when the policy's `scoring` section does not apply.
+
+    `scoring` holds `when`/`when_any` (which traffic is scored), `weights`
+    (cost / latency / capability / position), `budget_weights` (how much the
+    cost_budget / latency_budget label values care about each tier),
+    `capability_labels` (label value -> wanted model capability) and
+    optional `tier_points`.
+    """
+    scoring = policy.get("scoring")
+    if not scoring or not _rule_matches(labels, scoring):
+        return None
+    budget = scoring.get("budget_weights", {})
+    required = set()
+    for key, by_value in scoring.get("capability_labels", {}).items():
+        wanted = by_value.get(labels.get(key), [])
+        required.update([wanted] if isinstance(wanted, str) else wanted)
+    return {
+        "models": policy.get("models", {}),
+        "weights": scoring.get("weights", {}),
+        "tiers": scoring.get("tier_points", DEFAULT_TIER_POINTS),
+        "cost": budget.get("cost_budget", {}).get(labels.get("cost_budget"), 0.0),
+        "latency": budget.get("latency_budget", {}).get(labels.get("latency_budget"), 0.0),
+        "required": sorted(required),
+    }
+
+
+def _score_stage(candidates: List[str], ctx: Dict[str, Any]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """Rank one stage by weighted cost, latency, capability match and slot position (lower is better).
+
+    Returns the ranked candidates and each model's score breakdown.
+    """
+    weights, tiers = ctx["weights"], ctx["tiers"]
+    ranked = []
+    for pos, model_id in enumerate(candidates):
+        meta = ctx["models"].get(model_id, {})
+        caps = set(meta.get("capabilities", []))
+        parts = {
+            "cost": weights.get("cost", 1.0) * ctx["cost"] * tiers.get(meta.get("cost_tier"), 1),
+            "latency": weights.get("latency", 1.0) * ctx["latency"] * tiers.get(meta.get("latency_tier"), 1),
+            "capability": -weights.get("capability", 1.0) * sum(cap in caps for cap in ctx["required"]),
+            "position": weights.get("position", 0.25) * pos,
+        }
+        total = sum(parts.values())
+        ranked.append((total, pos, model_id, parts))
+    ranked.sort(key=lambda item: (item[0], item[1]))
+    breakdown = {
+        model_id: {"model": model_id, **{k: round(v, 3) for k, v in parts.items()}, "total": round(total, 3)}
+        for total, _, model_id, parts in ranked
+    }
+    return [item[2] for item in ranked], breakdown
+
+
+def _adaptive_order(candidates: List[str], scores: Mapping[str, Tuple[bool, float]]) -> List[str]:
+    """Reorder one stage by observed behaviour (see telemetry.py).
+
+    Models with a score swap among the positions they already hold, lowest
+    score first; models without telemetry keep their place. Demoted models
+    move to the end of the stage. Provider preference is applied afterwards,
+    so it still wins.
+    """
+    if not any(m in scores for m in candidates):
+        return candidates
+    picks = iter(sorted((m for m in candidates if m in scores and not scores[m][0]), key=lambda m: scores[m][1]))
+    kept = [next(picks) if m in scores else m for m in candidates if not scores.get(m, (False,))[0]]
+    return kept + [m for m in candidates if scores.get(m, (False,))[0]]
+
+
+def _expand_candidates(
+    policy: Dict[str, Any],
+    alias_map: Dict[str, str],
+    stages: List[Dict[str, Any]],
+    constraint_ctx: Dict[str, Any],
+    available: Iterable[str],
+    extra_deny_prefixes: List[str],
+    adaptive: Optional[Mapping[str, Tuple[bool, float]]] = None,
+    scoring: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    slots = policy["slots"]
+    models = policy.get("models", {})
+    available_set = set(available)
+    enforce_available = bool(available_set)
+    extra_deny_prefixes = list(extra_deny_prefixes)
+
+    stage_plan = []
+    flattened: List[str] = []
+    blocked: List[Dict[str, str]] = []
+
+    for stage in stages:
+        slot_id = stage["slot"]
+        slot = slots.get(slot_id)
+        if not slot:
+            stage_plan.append({
+                "stage": stage.get("name", "primary"),
+                "slot": slot_id,
+                "candidates": [],
+                "warning": "missing_slot"
+            })
+            continue
+
+        kept_candidates: List[str] = []
+        for raw_model in slot.get("candidates", []):
+            model_id = _canonicalize(raw_model, alias_map)
+            provider = _provider_of(model_id, models)
+            is_blocked, why = _blocked_model(model_id, provider, constraint_ctx)
+            if not is_blocked:
+                for prefix in extra_deny_prefixes:
+                    if model_id.startswith(prefix):
+                        is_blocked = True
+                        why = f"cli_prefix:{prefix}"
+                        break
+            if is_blocked:
+                blocked.append({"model": model_id, "reason": why, "stage": stage.get("name", "primary")})
+                continue
+            if enforce_available and model_id not in available_set:
+                blocked.append({"model": model_id, "reason": "not_in_available_set", "stage": stage.get("name", "primary")})
+                continue
+            kept_candidates.append(model_id)
+
+        scores = None
+        if scoring:
+            kept_candidates, scores = _score_stage(kept_candidates, scoring)
+
+        if adaptive:
+            kept_candidates = _adaptive_order(kept_candidates, adaptive)
+
+        # Soft reordering for preferred providers.
+        preferred = constraint_ctx.get("prefer_providers", [])
+        if preferred:
+            preferred_set = set(preferred)
+            kept_candidates = sorted(
+                kept_candidates,
+                key=lambda m: (0 if _provider_of(m, models) in preferred_set else 1, kept_candidates.index(m))
+            )
+
+        entry = {
+            "stage": stage.get("name", "primary"),
+            "slot": slot_id,
+            "candidates": kept_candidates
+        }
+        if scores is not None:
+            entry["scores"] = [scores[m] for m in kept_candidates]
+        stage_plan.append(entry)
+        flattened.extend(kept_candidates)
+
+    deduped_flat: List[str] = []
+    seen = set()
+    for m in flattened:
+        if m in seen:
+            continue
+        seen.add(m)
+        deduped_flat.append(m)
+
+    primary = deduped_flat[0] if deduped_flat else None
+    fallbacks = deduped_flat[1:] if len(deduped_flat) > 1 else []
+    return {
+        "stage_plan": stage_plan,
+        "primary": primary,
+        "fallbacks": fallbacks,
+        "blocked": blocked
+    }
+
+
+def _route(
+    compiled: CompiledPolicy,
+    aliases: Dict[str, str],
+    labels: Dict[str, str],
+    available_models: Iterable[str] = (),
+    deny_model_prefixes: Iterable[str] = (),
+    trace: Optional[Dict[str, Any]] = None,
+    adaptive: Optional[Mapping[str, Tuple[bool, float]]] = None
+) -> Dict[str, Any]:
+    """Resolve merged labels into the JSON document this CLI prints.
+
+    A `trace` dict receives phase timings (ns) and rule/candidate counters.
+    With `adaptive` scores, candidates are reordered within each stage and
+    the result lists demoted models under "adaptive".
+    """
+    deny_model_prefixes = list(deny_model_prefixes)
+    started = time.perf_counter_ns() if trace is not None else 0
+    stages, matched_rules, matched_constraints, constraint_ctx = _resolve_route(compiled, labels, trace)
+    if trace is not None:
+        resolved = time.perf_counter_ns()
+        trace["resolve_ns"] = resolved - started
+    available = [_canonicalize(x, aliases) for x in available_models]
+    scoring = _scoring_context(compiled.policy, labels)
+    table = compiled.candidates
+    if table is not None and table.aliases is aliases:
+        result = table.expand(stages, constraint_ctx, available, deny_model_prefixes, adaptive, scoring)
+    else:
+        result = _expand_candidates(
+            policy=compiled.policy,
+            alias_map=aliases,
+            stages=stages,
+            constraint_ctx=constraint_ctx,
+            available=available,
+            extra_deny_prefixes=deny_model_prefixes,
+            adaptive=adaptive,
+            scoring=scoring
+        )
+    if trace is not None:
+        trace["expand_ns"] = time.perf_counter_ns() - resolved
+        trace["candidates_filtered"] = len(result["blocked"])
+        trace["candidates_considered"] = trace["candidates_filtered"] + sum(
+            len(stage["candidates"]) for stage in result["stage_plan"])
+    out = {
+        "labels": labels,
+        "matched_rules": matched_rules,
+        "matched_constraints": matched_constraints,
+        "blocked_providers": sorted(set(constraint_ctx["ban_providers"])),
+        "blocked_model_prefixes": sorted(set(constraint_ctx["ban_model_prefixes"] + deny_model_prefixes)),
+        "primary": result["primary"],
+        "fallbacks": result["fallbacks"],
+        "stage_plan": result["stage_plan"],
+        "blocked_models": result["blocked"]
+    }
+    if adaptive is not None:
+        chain = [result["primary"]] + result["fallbacks"] if result["primary"] else []
+        out["adaptive"] = {"demoted": [m for m in chain if adaptive.get(m, (False,))[0]]}
+    return out
+
+
+def add_label_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add `--labels-json` and one flag per routing label (e.g. `--task-type`)."""
+    parser.add_argument("--labels-json", help="JSON object with routing labels")
+    for key in LABEL_KEYS:
+        parser.add_argument("--" + key.replace("_", "-"), dest=key)
+
+
+def merge_labels(defaults: Mapping[str, Any], *layers: Optional[Mapping[str, Any]]) -> Dict[str, str]:
+    """Overlay label layers on policy defaults; later layers win. Values become strings."""
+    labels = dict(defaults)
+    for layer in layers:
+        if layer:
+            labels.update(layer)
+    return {k: str(v) for k, v in labels.items()}
+
+
+def labels_from_args(defaults: Mapping[str, Any], args: argparse.Namespace) -> Dict[str, str]:
+    """Merge defaults, `--labels-json`, then individual label flags."""
+    from_json = None
+    if getattr(args, "labels_json", None):
+        try:
+            from_json = json.loads(args.labels_json)
+        except json.JSONDecodeError as exc:
+            raise SystemExit(f"--labels-json is not valid JSON: {exc}")
+        if not isinstance(from_json, dict):
+            raise SystemExit("--labels-json must be a JSON object")
+    flags = {k: getattr(args, k) for k in LABEL_KEYS if getattr(args, k, None) is not None}
+    return merge_labels(defaults, from_json, flags)
+
+
+def load_policy_files(
+    policy_path: Path | str = DEFAULT_POLICY,
+    aliases_path: Path | str = DEFAULT_ALIASES,
+    snapshot: bool = False
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[CompiledPolicy], Dict[str, Any]]:
+    """Read the policy and alias files; returns (policy, alias doc, compiled or None, info).
+
+    With `snapshot=True` a matching snapshot supplies all three documents and
+    no JSON is parsed. `info` holds the content fingerprint, the
+    (path, stat signature, sha256) source list and the snapshot status
+    ("hit", "miss" or "off").
+    """
+    policy_path, aliases_path = Path(policy_path), Path(aliases_path)
+    policy_data, policy_hash, policy_sig = _read_source(policy_path)
+    alias_data, alias_hash, alias_sig = _read_source(aliases_path)
+    info: Dict[str, Any] = {
+        "fingerprint": policy_hash + alias_hash,
+        "sources": [(policy_path, policy_sig, policy_hash), (aliases_path, alias_sig, alias_hash)],
+        "snapshot": "off",
+    }
+    if snapshot:
+        cached = load_snapshot(info["fingerprint"])
+        info["snapshot"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            compiled, alias_doc = cached
+            return compiled.policy, alias_doc, compiled, info
+    return _parse_source(policy_path, policy_data), _parse_source(aliases_path, alias_data), None, info
+
+
+def trace_enabled(flag: bool = False) -> bool:
+    """True when tracing was requested by flag or by the OC_ROUTE_TRACE env var."""
+    return flag or os.environ.get(TRACE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def profile_to(path: Optional[str]) -> Iterator[None]:
+    """Run the block under cProfile and dump stats to `path`; no-op when path is None."""
+    if not path:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def _entry_id(entry: Dict[str, Any], fallback: str) -> str:
+    return entry.get("id", fallback)
+
+
+class RuleStats:
+    """Hit/miss counters for route rules, constraints and agent rules.
+
+    Counts accumulate in memory; `flush` merges them into a JSON file under an
+    exclusive lock, so CLIs, batch workers and the daemon can share one file.
+    A miss is a routed request the rule did not match. Distinct merged label
+    sets are counted too (up to RULE_STATS_MAX_LABEL_SETS) so
+    optimize_rule_order.py can replay real traffic.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self._tracked: Dict[str, set] = {"rules": set(), "constraints": set(), "agent_rules": set()}
+        self._reset()
+
+    @classmethod
+    def from_env(cls, path: Optional[str] = None) -> Optional["RuleStats"]:
+        """Stats for an explicit path or $OC_ROUTE_RULE_STATS; None when neither is set."""
+        path = path or os.environ.get(RULE_STATS_ENV)
+        return cls(path) if path else None
+
+    def _reset(self) -> None:
+        self.routes = 0
+        self.agent_routes = 0
+        self.hits: Dict[str, Counter] = {kind: Counter() for kind in self._tracked}
+        self.label_sets: Counter = Counter()
+
+    def track(self, kind: str, ids: Iterable[str]) -> None:
+        """Declare the current ids of a kind so entries that never match still get misses."""
+        self._tracked[kind] = set(ids)
+
+    def track_policy(self, compiled: "CompiledPolicy") -> None:
+        self.track("rules", (_entry_id(r, "unnamed_rule") for r in compiled.rules))
+        self.track("constraints", (_entry_id(c, "unnamed_constraint") for c in compiled.constraints))
+
+    def record_route(self, out: Dict[str, Any]) -> None:
+        self.routes += 1
+        self.hits["rules"].update(out["matched_rules"])
+        self.hits["constraints"].update(out["matched_constraints"])
+        key = tuple(sorted(out["labels"].items()))
+        if key in self.label_sets or len(self.label_sets) < RULE_STATS_MAX_LABEL_SETS:
+            self.label_sets[key] += 1
+
+    def record_agent(self, rule_id: Optional[str]) -> None:
+        self.agent_routes += 1
+        if rule_id:
+            self.hits["agent_rules"][rule_id] += 1
+
+    def flush(self) -> None:
+        """Merge pending counts into the stats file and reset them."""
+        if not self.routes and not self.agent_routes:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                doc = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                doc = {}
+            self._merge_into(doc)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(doc, ensure_ascii=False, sort_keys=True))
+            os.replace(tmp, self.path)
+        self._reset()
+
+    def _merge_into(self, doc: Dict[str, Any]) -> None:
+        doc["version"] = 1
+        for kind, total_key, total in (("rules", "routes", self.routes),
+                                       ("constraints", "routes", self.routes),
+                                       ("agent_rules", "agent_routes", self.agent_routes)):
+            counters = doc.setdefault(kind, {})
+            for entry_id in self._tracked[kind] | set(self.hits[kind]):
+                hits = self.hits[kind][entry_id]
+                c = counters.setdefault(entry_id, {"hits": 0, "misses": 0})
+                c["hits"] += hits
+                c["misses"] += total - hits
+        doc["routes"] = doc.get("routes", 0) + self.routes
+        doc["agent_routes"] = doc.get("agent_routes", 0) + self.agent_routes
+        merged = Counter({tuple(sorted(item["labels"].items())): item["count"] for item in doc.get("label_sets", [])})
+        dropped = doc.get("label_sets_dropped", 0)
+        for key, count in self.label_sets.items():
+            if key in merged or len(merged) < RULE_STATS_MAX_LABEL_SETS:
+                merged[key] += count
+            else:
+                dropped += count
+        doc["label_sets"] = [{"labels": dict(key), "count": n} for key, n in merged.most_common()]
+        doc["label_sets_dropped"] = dropped
+
+
+class RouteCache:
+    """Bounded LRU of route results with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+class Router:
+    """Routing policy + alias map loaded and compiled once, routed many times.
+
+    Results are memoized in an LRU keyed on the merged labels, the available
+    model set, the denied prefixes and the policy/alias content hash. Routers
+    built with `from_files` re-check the source files' mtime/size on each call
+    and drop the cache when their content hash changes. Cached results are
+    shared between calls; treat them as read-only.
+    """
+
+    def __init__(
+        self,
+        policy: Dict[str, Any],
+        aliases: Dict[str, str],
+        available_models: Iterable[str] = (),
+        deny_model_prefixes: Iterable[str] = (),
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        fingerprint: Optional[str] = None,
+        compiled: Optional[CompiledPolicy] = None,
+        rule_stats: Optional[RuleStats] = None,
+        adaptive: Optional[Mapping[str, Tuple[bool, float]]] = None
+    ) -> None:
+        self.aliases = aliases
+        self.compiled = compiled or CompiledPolicy(policy, aliases=aliases)
+        self.rule_stats = rule_stats
+        if rule_stats is not None:
+            rule_stats.track_policy(self.compiled)
+        self.available_models = list(available_models)
+        self.deny_model_prefixes = list(deny_model_prefixes)
+        # model -> (demoted, score) from telemetry.load_adaptive_scores(); None disables.
+        self.adaptive = adaptive
+        self.cache = RouteCache(cache_size)
+        self.fingerprint = fingerprint or hashlib.sha256(
+            json.dumps([policy, aliases], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        # (path, stat signature, sha256) per source file; empty for in-memory policies.
+        self._sources: List[Tuple[Path, Tuple[int, int], str]] = []
+        # "hit" / "miss" when built from a snapshot-enabled from_files, else "off".
+        self.snapshot_status = "off"
+
+    @classmethod
+    def from_files(
+        cls,
+        policy_path: Path | str = DEFAULT_POLICY,
+        aliases_path: Path | str = DEFAULT_ALIASES,
+        snapshot: bool = False,
+        **kwargs: Any
+    ) -> "Router":
+        """Load and compile the policy files.
+
+        With `snapshot=True` the compiled policy is loaded from (or saved to)
+        a marshal file in `snapshot_dir()` keyed by the files' content hash, which
+        skips JSON parsing and compilation on later runs.
+        """
+        policy, alias_doc, compiled, info = load_policy_files(policy_path, aliases_path, snapshot)
+        if compiled is None:
+            compiled = CompiledPolicy(policy, aliases=alias_doc.get("aliases", {}))
+            if snapshot:
+                save_snapshot(info["fingerprint"], compiled, alias_doc)
+        assert compiled.candidates is not None
+        router = cls(policy, compiled.candidates.aliases, fingerprint=info["fingerprint"], compiled=compiled, **kwargs)
+        router._sources = info["sources"]
+        router.snapshot_status = info["snapshot"]
+        return router
+
+    @property
+    def policy(self) -> Dict[str, Any]:
+        return self.compiled.policy
+
+    @property
+    def defaults(self) -> Dict[str, Any]:
+        return self.compiled.policy.get("defaults", {})
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read source files if they changed; returns True when the policy was rebuilt."""
+        changed: Dict[int, Dict[str, Any]] = {}
+        for i, (path, signature, digest) in enumerate(self._sources):
+            try:
+                current = _stat_signature(path)
+            except OSError:
+                continue
+            if current == signature and not force:
+                continue
+            doc, new_digest, current = _load_source(path)
+            self._sources[i] = (path, current, new_digest)
+            if new_digest != digest or force:
+                changed[i] = doc
+        if not changed:
+            return False
+        if 1 in changed:
+            self.aliases = changed[1].get("aliases", {})
+        self.compiled = CompiledPolicy(changed.get(0, self.compiled.policy), aliases=self.aliases)
+        if self.rule_stats is not None:
+            self.rule_stats.track_policy(self.compiled)
+        self.fingerprint = "".join(digest for _, _, digest in self._sources)
+        self.cache.clear()
+        return True
+
+    def cache_info(self) -> Dict[str, int]:
+        return self.cache.info()
+
+    def set_adaptive(self, scores: Optional[Mapping[str, Tuple[bool, float]]]) -> None:
+        """Swap in fresh telemetry scores; cached routes are dropped when they change."""
+        if scores != self.adaptive:
+            self.adaptive = scores
+            self.cache.clear()
+
+    def route(
+        self,
+        labels: Optional[Mapping[str, Any]] = None,
+        available_models: Optional[Iterable[str]] = None,
+        deny_model_prefixes: Optional[Iterable[str]] = None,
+        trace: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Route one label set; missing labels take the policy defaults.
+
+        `available_models` / `deny_model_prefixes` override the router-wide
+        settings for this call only. A `trace` dict is filled with per-phase
+        timings (see `_route`); it is never stored in the cached result.
+        """
+        started = time.perf_counter_ns() if trace is not None else 0
+        self.reload()
+        merged = merge_labels(self.defaults, labels)
+        if trace is not None:
+            merged_at = time.perf_counter_ns()
+            trace["merge_ns"] = merged_at - started
+        available = tuple(self.available_models if available_models is None else available_models)
+        deny = tuple(self.deny_model_prefixes if deny_model_prefixes is None else deny_model_prefixes)
+        key = (self.fingerprint, tuple(sorted(merged.items())), tuple(sorted(set(available))), deny)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if self.rule_stats is not None:
+                self.rule_stats.record_route(cached)
+            if trace is not None:
+                trace["cache"] = "hit"
+                trace["route_ns"] = time.perf_counter_ns() - started
+            return cached
+        out = _route(self.compiled, self.aliases, merged, available, deny, trace, self.adaptive)
+        self.cache.put(key, out)
+        if self.rule_stats is not None:
+            self.rule_stats.record_route(out)
+        if trace is not None:
+            trace["cache"] = "miss" if self.cache.maxsize > 0 else "off"
+            trace["route_ns"] = time.perf_counter_ns() - started
+        return out
+
+    def route_many(self, labels_iter: Iterable[Optional[Mapping[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Lazily route each label set from an iterable."""
+        for labels in labels_iter:
+            yield self.route(labels)
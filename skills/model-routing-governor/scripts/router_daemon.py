@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Long-lived local router that keeps the routing policy and alias map in memory.
+
+Serves newline-delimited JSON over a Unix socket so callers such as
+route_openclaw_agent.py skip loading and compiling the policy per request.
+
+Request (one JSON object per line):
+  {"labels": {...}, "available_models": [...], "deny_model_prefixes": [...],
+   "policy": "/abs/path", "aliases": "/abs/path", "trace": false,
+   "adaptive": false, "telemetry": "/abs/path"}
+  {"op": "ping"} | {"op": "stats"} | {"op": "reload"} | {"op": "shutdown"}
+
+Response (one JSON object per line):
+  the same document select_model.py prints (plus "timings" when "trace" is
+  set), or {"error": "..."} on failure. A request naming a policy or alias
+  map other than the one this daemon serves gets {"error": "policy_mismatch"}
+  or {"error": "aliases_mismatch"}; `request_route` then returns None so the
+  caller routes in-process.
+
+Policy and alias files are re-read automatically when they change, and
+repeated label sets are served from the router's LRU cache (see `stats`).
+A `serve --adaptive` daemon orders candidates from telemetry (refreshed every
+ADAPTIVE_REFRESH_SECONDS) and only answers requests with "adaptive": true
+for the same telemetry store; a plain daemon only answers requests without
+it. Any other combination gets {"error": "adaptive_mismatch"} or
+{"error": "telemetry_mismatch"}, and the caller routes in-process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from router import DEFAULT_ALIASES, DEFAULT_POLICY, RULE_STATS_ENV, Router, RuleStats
+
+SOCKET_ENV = "OC_ROUTER_SOCKET"
+RULE_STATS_FLUSH_EVERY = 1000
+ADAPTIVE_REFRESH_SECONDS = 30.0
+MISMATCH_ERRORS = ("policy_mismatch", "aliases_mismatch", "adaptive_mismatch", "telemetry_mismatch")
+
+
+def default_socket_path() -> str:
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / "oc-router.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return f"/tmp/oc-router-{uid}.sock"
+
+
+def request_route(payload: Dict[str, Any], socket_path: Optional[str] = None, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+    """Send one request to a running daemon.
+
+    Returns None when no daemon is reachable (or it serves a different policy),
+    so callers can fall back to routing in-process.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path or default_socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+    try:
+        response = json.loads(b"".join(chunks).decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if response.get("error") in MISMATCH_ERRORS:
+        return None
+    return response
+
+
+class _PolicyState:
+    """In-memory router; it re-checks the source files itself on every route."""
+
+    def __init__(
+        self,
+        policy_path: Path,
+        aliases_path: Path,
+        rule_stats: Optional[RuleStats] = None,
+        telemetry: Optional[str] = None,
+        adaptive: bool = False
+    ) -> None:
+        self.policy_path = policy_path.resolve()
+        self.aliases_path = aliases_path.resolve()
+        self._lock = threading.Lock()
+        self.router = Router.from_files(self.policy_path, self.aliases_path, rule_stats=rule_stats)
+        self.telemetry = telemetry
+        self.adaptive = adaptive
+        self.telemetry_path: Optional[Path] = None
+        if adaptive:
+            from telemetry import default_path
+            self.telemetry_path = Path(telemetry or default_path()).resolve()
+        self._adaptive_loaded = 0.0
+
+    def _refresh_adaptive(self) -> None:
+        if not self.adaptive or time.monotonic() - self._adaptive_loaded < ADAPTIVE_REFRESH_SECONDS:
+            return
+        from telemetry import load_adaptive_scores
+        self.router.set_adaptive(load_adaptive_scores(self.telemetry))
+        self._adaptive_loaded = time.monotonic()
+
+    def flush_stats(self) -> None:
+        if self.router.rule_stats is not None:
+            with self._lock:
+                self.router.rule_stats.flush()
+
+    def reload(self) -> None:
+        with self._lock:
+            self.router.reload(force=True)
+
+    def route(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        requested_policy = request.get("policy")
+        if requested_policy and Path(requested_policy).resolve() != self.policy_path:
+            return {"error": "policy_mismatch"}
+        requested_aliases = request.get("aliases")
+        if requested_aliases and Path(requested_aliases).resolve() != self.aliases_path:
+            return {"error": "aliases_mismatch"}
+        if bool(request.get("adaptive")) != self.adaptive:
+            return {"error": "adaptive_mismatch"}
+        requested_telemetry = request.get("telemetry")
+        if self.adaptive and requested_telemetry and Path(requested_telemetry).resolve() != self.telemetry_path:
+            return {"error": "telemetry_mismatch"}
+        trace: Optional[Dict[str, Any]] = {} if request.get("trace") else None
+        with self._lock:
+            self._refresh_adaptive()
+            out = self.router.route(
+                request.get("labels"),
+                request.get("available_models") or [],
+                request.get("deny_model_prefixes") or [],
+                trace=trace
+            )
+            stats = self.router.rule_stats
+            if stats is not None and stats.routes >= RULE_STATS_FLUSH_EVERY:
+                stats.flush()
+        return out if trace is None else {**out, "timings": trace}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            response = self.server.dispatch(raw)  # type: ignore[attr-defined]
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if self.server.shutdown_requested:  # type: ignore[attr-defined]
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class RouterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, state: _PolicyState) -> None:
+        self.state = state
+        self.shutdown_requested = False
+        super().__init__(socket_path, _Handler)
+
+    def dispatch(self, raw: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            return {"error": f"invalid request JSON: {exc}"}
+        if not isinstance(request, dict):
+            return {"error": "request must be a JSON object"}
+        op = request.get("op", "route")
+        try:
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid(), "policy": str(self.state.policy_path)}
+            if op == "reload":
+                self.state.reload()
+                return {"ok": True}
+            if op == "stats":
+                self.state.flush_stats()
+                return {"ok": True, "cache": self.state.router.cache_info()}
+            if op == "shutdown":
+                self.shutdown_requested = True
+                return {"ok": True}
+            if op == "route":
+                return self.state.route(request)
+            return {"error": f"unknown op: {op}"}
+        except SystemExit as exc:
+            # router helpers report bad input files via SystemExit.
+            return {"error": str(exc)}
+
+
+def _serve(args: argparse.Namespace) -> None:
+    if not hasattr(socket, "AF_UNIX"):
+        raise SystemExit("Unix sockets are not available on this platform.")
+    path = args.socket
+    if os.path.exists(path):
+        if request_route({"op": "ping"}, path) is not None:
+            raise SystemExit(f"Router daemon already running on {path}")
+        os.unlink(path)
+    state = _PolicyState(Path(args.policy), Path(args.aliases), RuleStats.from_env(args.rule_stats), args.telemetry, args.adaptive)
+    # Bind under a 0o177 umask so the socket is created 0o600 (no window where others can connect).
+    previous_umask = os.umask(0o177)
+    try:
+        server = RouterServer(path, state)
+    finally:
+        os.umask(previous_umask)
+    print(f"[router-daemon] pid={os.getpid()} socket={path} policy={state.policy_path}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state.flush_stats()
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Run or control the local routing daemon.")
+    p.add_argument("command", nargs="?", default="serve", choices=["serve", "status", "stats", "stop", "reload"])
+    p.add_argument("--socket", default=default_socket_path(), help=f"Unix socket path (env {SOCKET_ENV})")
+    p.add_argument("--policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--aliases", default=str(DEFAULT_ALIASES))
+    p.add_argument("--adaptive", action="store_true", help="serve: order candidates by observed latency/failures from telemetry (answers only --adaptive callers)")
+    p.add_argument("--telemetry", metavar="FILE", help="serve --adaptive: telemetry database (default: $OC_ROUTE_TELEMETRY or the XDG state dir)")
+    p.add_argument("--rule-stats", metavar="FILE", help=f"serve: accumulate rule hit-miss counters in FILE (also env {RULE_STATS_ENV})")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.command == "serve":
+        _serve(args)
+        return
+    op = {"status": "ping", "stats": "stats", "stop": "shutdown", "reload": "reload"}[args.command]
+    response = request_route({"op": op}, args.socket)
+    if response is None:
+        print(f"No router daemon on {args.socket}")
+        sys.exit(1)
+    print(json.dumps(response, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
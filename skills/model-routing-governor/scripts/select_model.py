@@ -3,310 +3,228 @@
 
 This script intentionally uses only the Python standard library.
 Policy and alias config are JSON for zero-dependency portability.
+The routing engine lives in router.py so other scripts can route in-process.
 """
 
 from __future__ import annotations
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import argparse
 import json
 import sys
-from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
-
-
-def _load_json(path: Path) -> Dict[str, Any]:
-    try:
-        return json.loads(path.read_text())
-    except FileNotFoundError:
-        raise SystemExit(f"File not found: {path}")
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"Invalid JSON in {path}: {exc}")
-
-
-def _canonicalize(model_id: str, alias_map: Dict[str, str]) -> str:
-    seen = set()
-    cur = model_id
-    while cur in alias_map and cur not in seen:
-        seen.add(cur)
-        cur = alias_map[cur]
-    return cur
-
-
-def _match_fields(labels: Dict[str, str], cond: Dict[str, Any]) -> bool:
-    for key, expected in cond.items():
-        actual = labels.get(key)
-        if isinstance(expected, list):
-            if actual not in expected:
-                return False
-        else:
-            if actual != expected:
-                return False
-    return True
-
-
-def _rule_matches(labels: Dict[str, str], rule: Dict[str, Any]) -> bool:
-    if "when" in rule and not _match_fields(labels, rule["when"]):
-        return False
-    if "when_any" in rule:
-        any_ok = False
-        for cond in rule["when_any"]:
-            if _match_fields(labels, cond):
-                any_ok = True
-                break
-        if not any_ok:
-            return False
-    return True
-
-
-def _stage_key(stage: Dict[str, Any]) -> Tuple[str, str]:
-    return (stage.get("name", "primary"), stage["slot"])
-
-
-def _apply_stage_augmentation(stages: List[Dict[str, Any]], aug: Dict[str, Any]) -> List[Dict[str, Any]]:
-    position = aug.get("position", "append")
-    new_stage = {k: v for k, v in aug.items() if k != "position"}
-    if position == "prepend":
-        return [new_stage] + stages
-    return stages + [new_stage]
-
-
-def _dedupe_stage_list(stages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen = set()
-    out = []
-    for stage in stages:
-        key = _stage_key(stage)
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(stage)
-    return out
-
-
-def _provider_of(model_id: str, policy_models: Dict[str, Any]) -> str:
-    return str(policy_models.get(model_id, {}).get("provider", model_id.split("/", 1)[0]))
-
-
-def _blocked_model(model_id: str, provider: str, constraint_ctx: Dict[str, Any]) -> Tuple[bool, str]:
-    for banned_provider in constraint_ctx["ban_providers"]:
-        if provider == banned_provider:
-            return True, f"provider:{banned_provider}"
-    for prefix in constraint_ctx["ban_model_prefixes"]:
-        if model_id.startswith(prefix):
-            return True, f"prefix:{prefix}"
-    return False, ""
+import threading
+from contextlib import ExitStack
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from router import (
+    DEFAULT_ALIASES,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_POLICY,
+    RULE_STATS_ENV,
+    TRACE_ENV,
+    Router,
+    RuleStats,
+    add_label_arguments,
+    labels_from_args,
+    profile_to,
+    trace_enabled,
+)
+
+BATCH_CHUNK_LINES = 512
+
+_worker_router: Optional[Router] = None
+_worker_base: Dict[str, Any] = {}
+_worker_trace = False
 
 
 def _parse_args() -> argparse.Namespace:
-    here = Path(__file__).resolve()
-    skill_root = here.parents[1]
     parser = argparse.ArgumentParser(description="Resolve model route from labels.")
-    parser.add_argument("--policy", default=str(skill_root / "assets" / "routing-policy.json"))
-    parser.add_argument("--aliases", default=str(skill_root / "assets" / "alias-map.json"))
-    parser.add_argument("--labels-json", help="JSON object with routing labels")
-    parser.add_argument("--scene")
-    parser.add_argument("--sensitivity")
-    parser.add_argument("--task-type", dest="task_type")
-    parser.add_argument("--modality")
-    parser.add_argument("--complexity")
-    parser.add_argument("--value")
-    parser.add_argument("--context-size", dest="context_size")
-    parser.add_argument("--language")
-    parser.add_argument("--latency-budget", dest="latency_budget")
-    parser.add_argument("--cost-budget", dest="cost_budget")
-    parser.add_argument("--privacy-requirement", dest="privacy_requirement")
-    parser.add_argument("--provider-preference", dest="provider_preference")
+    parser.add_argument("--policy", default=str(DEFAULT_POLICY))
+    parser.add_argument("--aliases", default=str(DEFAULT_ALIASES))
+    add_label_arguments(parser)
     parser.add_argument("--available-model", action="append", default=[], help="Repeatable. Only these canonical models are allowed if provided.")
     parser.add_argument("--deny-model-prefix", action="append", default=[], help="Extra banned model prefixes.")
     parser.add_argument("--pretty", action="store_true")
+    parser.add_argument("--batch-input", metavar="FILE|-", help="Route one JSON label object per line (JSONL). Label flags (and --labels-json) are defaults for every record; a label set in the record takes precedence.")
+    parser.add_argument("--batch-output", metavar="FILE|-", default="-", help="Where to stream one route result per line (default: stdout).")
+    parser.add_argument("--workers", type=int, default=1, help="Batch mode: spread records over N worker processes.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="LRU route cache entries per process (0 disables).")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false", help="Always parse and compile the policy files instead of using the compiled snapshot cache.")
+    parser.add_argument("--startup-profile", action="store_true", help="Report time spent importing, loading and routing on stderr.")
+    parser.add_argument("--trace", action="store_true", help=f"Add a per-phase 'timings' block to each result (also env {TRACE_ENV}=1).")
+    parser.add_argument("--profile", metavar="FILE", help="Write cProfile stats for the whole run to FILE (read with python -m pstats).")
+    parser.add_argument("--adaptive", action="store_true", help="Reorder candidates within each stage by observed latency/failures (see telemetry.py).")
+    parser.add_argument("--telemetry", metavar="FILE", help="Telemetry database for --adaptive (default: $OC_ROUTE_TELEMETRY or the XDG state dir).")
+    parser.add_argument("--rule-stats", metavar="FILE", help=f"Accumulate rule/constraint hit-miss counters in FILE (also env {RULE_STATS_ENV}); see optimize_rule_order.py.")
     return parser.parse_args()
 
 
-def _merge_labels(defaults: Dict[str, str], args: argparse.Namespace) -> Dict[str, str]:
-    labels = dict(defaults)
-    if args.labels_json:
-        try:
-            labels.update(json.loads(args.labels_json))
-        except json.JSONDecodeError as exc:
-            raise SystemExit(f"--labels-json is not valid JSON: {exc}")
-    for key in [
-        "scene",
-        "sensitivity",
-        "task_type",
-        "modality",
-        "complexity",
-        "value",
-        "context_size",
-        "language",
-        "latency_budget",
-        "cost_budget",
-        "privacy_requirement",
-        "provider_preference",
-    ]:
-        value = getattr(args, key, None)
-        if value is not None:
-            labels[key] = value
-    return {k: str(v) for k, v in labels.items()}
-
-
-def _resolve_route(policy: Dict[str, Any], labels: Dict[str, str]) -> Tuple[List[Dict[str, Any]], List[str], List[str], Dict[str, Any]]:
-    rules = sorted(policy["route_rules"], key=lambda r: int(r.get("priority", 1000)))
-    constraints = policy.get("constraints", [])
-
-    stages: List[Dict[str, Any]] = []
-    matched_rules: List[str] = []
-    notes: List[str] = []
-
-    constraint_ctx = {
-        "ban_providers": [],
-        "ban_model_prefixes": [],
-        "prefer_providers": []
-    }
-    matched_constraints: List[str] = []
-
-    for c in constraints:
-        if _rule_matches(labels, c):
-            matched_constraints.append(c.get("id", "unnamed_constraint"))
-            constraint_ctx["ban_providers"].extend(c.get("ban_providers", []))
-            constraint_ctx["ban_model_prefixes"].extend(c.get("ban_model_prefixes", []))
-            constraint_ctx["prefer_providers"].extend(c.get("prefer_providers", []))
-            if c.get("reason"):
-                notes.append(c["reason"])
-
-    for rule in rules:
-        if not _rule_matches(labels, rule):
-            continue
-        matched_rules.append(rule.get("id", "unnamed_rule"))
-        if "stages" in rule:
-            stages = [dict(s) for s in rule["stages"]]
-        for aug in rule.get("augment_stages", []):
-            stages = _apply_stage_augmentation(stages, aug)
-        notes.extend(rule.get("notes", []))
-
-    stages = _dedupe_stage_list(stages)
-    return stages, matched_rules, matched_constraints, constraint_ctx
-
-
-def _expand_candidates(
-    policy: Dict[str, Any],
-    alias_map: Dict[str, str],
-    stages: List[Dict[str, Any]],
-    constraint_ctx: Dict[str, Any],
-    available: Iterable[str],
-    extra_deny_prefixes: List[str]
-) -> Dict[str, Any]:
-    slots = policy["slots"]
-    models = policy.get("models", {})
-    available_set = set(available)
-    enforce_available = bool(available_set)
-    extra_deny_prefixes = list(extra_deny_prefixes)
-
-    stage_plan = []
-    flattened: List[str] = []
-    blocked: List[Dict[str, str]] = []
-
-    for stage in stages:
-        slot_id = stage["slot"]
-        slot = slots.get(slot_id)
-        if not slot:
-            stage_plan.append({
-                "stage": stage.get("name", "primary"),
-                "slot": slot_id,
-                "candidates": [],
-                "warning": "missing_slot"
-            })
-            continue
-
-        kept_candidates: List[str] = []
-        for raw_model in slot.get("candidates", []):
-            model_id = _canonicalize(raw_model, alias_map)
-            provider = _provider_of(model_id, models)
-            is_blocked, why = _blocked_model(model_id, provider, constraint_ctx)
-            if not is_blocked:
-                for prefix in extra_deny_prefixes:
-                    if model_id.startswith(prefix):
-                        is_blocked = True
-                        why = f"cli_prefix:{prefix}"
-                        break
-            if is_blocked:
-                blocked.append({"model": model_id, "reason": why, "stage": stage.get("name", "primary")})
-                continue
-            if enforce_available and model_id not in available_set:
-                blocked.append({"model": model_id, "reason": "not_in_available_set", "stage": stage.get("name", "primary")})
-                continue
-            kept_candidates.append(model_id)
-
-        # Soft reordering for preferred providers.
-        preferred = constraint_ctx.get("prefer_providers", [])
-        if preferred:
-            preferred_set = set(preferred)
-            kept_candidates = sorted(
-                kept_candidates,
-                key=lambda m: (0 if _provider_of(m, models) in preferred_set else 1, kept_candidates.index(m))
-            )
-
-        stage_plan.append({
-            "stage": stage.get("name", "primary"),
-            "slot": slot_id,
-            "candidates": kept_candidates
-        })
-        flattened.extend(kept_candidates)
-
-    deduped_flat: List[str] = []
-    seen = set()
-    for m in flattened:
-        if m in seen:
-            continue
-        seen.add(m)
-        deduped_flat.append(m)
-
-    primary = deduped_flat[0] if deduped_flat else None
-    fallbacks = deduped_flat[1:] if len(deduped_flat) > 1 else []
-    return {
-        "stage_plan": stage_plan,
-        "primary": primary,
-        "fallbacks": fallbacks,
-        "blocked": blocked
-    }
+def _dumps(output: Dict[str, Any], trace: Optional[Dict[str, Any]], indent: Optional[int] = None) -> str:
+    """Serialize a route result; with a trace, time serialization and attach the timings.
+
+    The result is serialized once and the timings block is spliced in before
+    its closing brace, so `serialize_ns` measures the text that is printed.
+    """
+    started = time.perf_counter_ns()
+    text = json.dumps(output, indent=indent, ensure_ascii=False)
+    if trace is None:
+        return text
+    trace["serialize_ns"] = time.perf_counter_ns() - started
+    timings = json.dumps(trace, indent=indent, ensure_ascii=False)
+    if indent is None:
+        return f'{text[:-1]}, "timings": {timings}}}'
+    pad = " " * indent
+    timings = timings.replace("\n", "\n" + pad)
+    return f'{text[:-2]},\n{pad}"timings": {timings}\n}}'
+
+
+def _route_line(router: Router, base: Dict[str, Any], lineno: int, raw: str, trace: bool = False) -> Tuple[bool, str]:
+    """Route one JSONL record; returns (ok, serialized result or error record)."""
+    try:
+        record = json.loads(raw)
+        if not isinstance(record, dict):
+            raise ValueError("label record must be a JSON object")
+        timings: Optional[Dict[str, Any]] = {} if trace else None
+        return True, _dumps(router.route({**base, **record}, trace=timings), timings)
+    except ValueError as exc:
+        return False, json.dumps({"line": lineno, "error": str(exc)}, ensure_ascii=False)
+
+
+def _init_worker(
+    policy: str, aliases: str, available: List[str], deny: List[str], cache_size: int, snapshot: bool,
+    base: Dict[str, Any], trace: bool, rule_stats: Optional[str], adaptive: Optional[Dict[str, Tuple[bool, float]]]
+) -> None:
+    global _worker_router, _worker_base, _worker_trace
+    _worker_router = Router.from_files(
+        policy, aliases, snapshot=snapshot, available_models=available, deny_model_prefixes=deny, cache_size=cache_size,
+        rule_stats=RuleStats(rule_stats) if rule_stats else None, adaptive=adaptive
+    )
+    _worker_base = base
+    _worker_trace = trace
+
+
+def _route_chunk(chunk: List[Tuple[int, str]]) -> List[Tuple[bool, str]]:
+    assert _worker_router is not None
+    results = [_route_line(_worker_router, _worker_base, lineno, raw, _worker_trace) for lineno, raw in chunk]
+    if _worker_router.rule_stats is not None:
+        # Pool workers are terminated without cleanup, so counters are merged per chunk.
+        _worker_router.rule_stats.flush()
+    return results
+
+
+def _read_chunks(src: TextIO, size: int) -> Iterator[List[Tuple[int, str]]]:
+    numbered = ((n, line) for n, line in enumerate(src, 1) if line.strip())
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _run_batch(args: argparse.Namespace, router: Router, trace: bool = False) -> int:
+    """Stream JSONL label records to JSONL route results; returns the error count."""
+    base = labels_from_args({}, args)
+    errors = 0
+    total = 0
+    with ExitStack() as stack:
+        src = sys.stdin if args.batch_input == "-" else stack.enter_context(open(args.batch_input, encoding="utf-8"))
+        dst = sys.stdout if args.batch_output == "-" else stack.enter_context(open(args.batch_output, "w", encoding="utf-8"))
+
+        def emit(results: List[Tuple[bool, str]]) -> None:
+            nonlocal errors, total
+            for ok, line in results:
+                total += 1
+                errors += not ok
+                dst.write(line + "\n")
+
+        if args.workers <= 1:
+            for chunk in _read_chunks(src, BATCH_CHUNK_LINES):
+                emit([_route_line(router, base, lineno, raw, trace) for lineno, raw in chunk])
+            return _report_batch(total, errors, router.cache_info())
+
+        # Bound in-flight chunks so memory stays flat: the pool's feeder thread
+        # blocks on the semaphore until results are written out.
+        in_flight = threading.BoundedSemaphore(args.workers * 4)
+
+        def throttled() -> Iterator[List[Tuple[int, str]]]:
+            for chunk in _read_chunks(src, BATCH_CHUNK_LINES):
+                in_flight.acquire()
+                yield chunk
+
+        # Imported here: multiprocessing is a noticeable share of single-route startup.
+        from multiprocessing import Pool
+
+        init_args = (args.policy, args.aliases, args.available_model, args.deny_model_prefix, args.cache_size, args.snapshot, base, trace,
+                     str(router.rule_stats.path) if router.rule_stats else None, router.adaptive)
+        with Pool(args.workers, initializer=_init_worker, initargs=init_args) as pool:
+            for results in pool.imap(_route_chunk, throttled()):
+                emit(results)
+                in_flight.release()
+    return _report_batch(total, errors)
+
+
+def _report_batch(total: int, errors: int, cache: Optional[Dict[str, int]] = None) -> int:
+    summary = f"[select_model] batch: {total} record(s), {errors} error(s)"
+    if cache:
+        summary += f", cache hits={cache['hits']} misses={cache['misses']} evictions={cache['evictions']}"
+    print(summary, file=sys.stderr)
+    return errors
+
+
+def _report_startup(router: Router, marks: List[Tuple[str, float]]) -> None:
+    parts = [f"{name}={(end - start) * 1000:.2f}ms" for (name, start), (_, end) in zip(marks, marks[1:])]
+    parts.append(f"snapshot={router.snapshot_status}")
+    print("[select_model] startup: " + " ".join(parts), file=sys.stderr)
 
 
 def main() -> None:
+    marks = [("import", _IMPORT_START), ("args", time.perf_counter())]
     args = _parse_args()
-    policy_path = Path(args.policy)
-    aliases_path = Path(args.aliases)
-
-    policy = _load_json(policy_path)
-    aliases = _load_json(aliases_path).get("aliases", {})
-
-    labels = _merge_labels(policy.get("defaults", {}), args)
-    stages, matched_rules, matched_constraints, constraint_ctx = _resolve_route(policy, labels)
-    result = _expand_candidates(
-        policy=policy,
-        alias_map=aliases,
-        stages=stages,
-        constraint_ctx=constraint_ctx,
-        available=[_canonicalize(x, aliases) for x in args.available_model],
-        extra_deny_prefixes=args.deny_model_prefix
+    with profile_to(args.profile):
+        code = _main(args, marks)
+    sys.exit(code)
+
+
+def _main(args: argparse.Namespace, marks: List[Tuple[str, float]]) -> int:
+    trace = trace_enabled(args.trace)
+    marks.append(("load", time.perf_counter()))
+    adaptive = None
+    if args.adaptive:
+        # Imported here: sqlite3 is only needed for adaptive routing.
+        from telemetry import load_adaptive_scores
+        adaptive = load_adaptive_scores(args.telemetry)
+    router = Router.from_files(
+        args.policy,
+        args.aliases,
+        snapshot=args.snapshot,
+        available_models=args.available_model,
+        deny_model_prefixes=args.deny_model_prefix,
+        cache_size=args.cache_size,
+        rule_stats=RuleStats.from_env(args.rule_stats),
+        adaptive=adaptive
     )
-
-    output = {
-        "labels": labels,
-        "matched_rules": matched_rules,
-        "matched_constraints": matched_constraints,
-        "blocked_providers": sorted(set(constraint_ctx["ban_providers"])),
-        "blocked_model_prefixes": sorted(set(constraint_ctx["ban_model_prefixes"] + args.deny_model_prefix)),
-        "primary": result["primary"],
-        "fallbacks": result["fallbacks"],
-        "stage_plan": result["stage_plan"],
-        "blocked_models": result["blocked"]
-    }
-
-    if args.pretty:
-        print(json.dumps(output, indent=2, ensure_ascii=False))
-    else:
-        print(json.dumps(output, ensure_ascii=False))
-
-    if not result["primary"]:
-        sys.exit(2)
+    marks.append(("route", time.perf_counter()))
+    if args.batch_input:
+        errors = _run_batch(args, router, trace)
+        if router.rule_stats is not None:
+            router.rule_stats.flush()
+        if args.startup_profile:
+            _report_startup(router, marks + [("", time.perf_counter())])
+        return 1 if errors else 0
+
+    timings: Optional[Dict[str, Any]] = {} if trace else None
+    output = router.route(labels_from_args(router.defaults, args), trace=timings)
+    if router.rule_stats is not None:
+        router.rule_stats.flush()
+    if args.startup_profile:
+        _report_startup(router, marks + [("", time.perf_counter())])
+
+    print(_dumps(output, timings, indent=2 if args.pretty else None))
+    return 0 if output["primary"] else 2
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""Smoke-case dependency index for change-impact test selection.
+
+A full `smoke_test_routes.py` run records, per case, what its route
+depended on: matched route rules and constraints, stage slots, and every
+model name those slots resolve through (raw candidates, alias hops and
+canonical ids). `--changed-since REF` then diffs the policy and alias map
+against REF and re-runs only the cases whose dependencies changed, plus
+cases a changed rule or constraint would newly match.
+
+The index holds up to MAX_GENERATIONS generations, each keyed to the exact
+policy/alias content it was recorded from (all for one engine). A partial
+run adds a generation for the content it ran against: skipped cases carry
+over from the REF generation, which is sound because the change did not
+affect them. So after committing what the pre-commit hook checked, REF
+still finds a matching generation. When no generation matches REF's files
+(or anything outside rules, constraints, slots, models and aliases
+changed), the caller runs the whole suite. Only passing cases are
+recorded, so a failing case is re-run until it passes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from router import _rule_matches, snapshot_dir
+
+INDEX_VERSION = 2
+MAX_GENERATIONS = 4
+SECTIONS = ("route_rules", "constraints", "slots", "models")
+
+Changes = Dict[str, Set[str]]
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def engine_hash() -> str:
+    """Content hash of the routing code; a change invalidates every recorded dependency."""
+    here = Path(__file__).resolve().parent
+    return sha256(b"".join((here / name).read_bytes() for name in ("router.py", "smoke_index.py")))
+
+
+def case_hash(case: Dict[str, Any]) -> str:
+    return sha256(json.dumps(case, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def default_index_path(cases_path: Path | str) -> Path:
+    key = sha256(str(Path(cases_path).resolve()).encode("utf-8"))[:16]
+    return snapshot_dir() / f"smoke-index-{key}.json"
+
+
+def _alias_chain(name: str, aliases: Dict[str, str]) -> List[str]:
+    chain = [name]
+    while chain[-1] in aliases and aliases[chain[-1]] not in chain:
+        chain.append(aliases[chain[-1]])
+    return chain
+
+
+def case_deps(policy: Dict[str, Any], aliases: Dict[str, str], out: Dict[str, Any]) -> Dict[str, Any]:
+    """What one routed case depends on (see module docstring)."""
+    slots = sorted({s["slot"] for s in out.get("stage_plan", []) if s.get("slot")})
+    models: Set[str] = set()
+    for slot_id in slots:
+        for name in policy.get("slots", {}).get(slot_id, {}).get("candidates", []):
+            models.update(_alias_chain(name, aliases))
+    return {
+        "labels": out.get("labels", {}),
+        "route_rules": sorted(set(out.get("matched_rules", []))),
+        "constraints": sorted(set(out.get("matched_constraints", []))),
+        "slots": slots,
+        "models": sorted(models),
+    }
+
+
+def _keyed(entries: List[Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Entries by id, or None when ids are missing or repeated (no per-entry diff possible)."""
+    keyed = {e.get("id"): e for e in entries}
+    if None in keyed or len(keyed) != len(entries):
+        return None
+    return keyed
+
+
+def _changed(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    return {k for k in old.keys() | new.keys() if old.get(k) != new.get(k)}
+
+
+def diff_sources(
+    old_policy: Dict[str, Any],
+    old_aliases: Dict[str, Any],
+    new_policy: Dict[str, Any],
+    new_aliases: Dict[str, Any]
+) -> Tuple[Optional[Changes], str]:
+    """(changed ids per section, summary), or (None, reason) when only a full run is safe."""
+    other = _changed({k: v for k, v in old_policy.items() if k not in SECTIONS},
+                     {k: v for k, v in new_policy.items() if k not in SECTIONS})
+    if other:
+        return None, f"policy {', '.join(sorted(other))} changed"
+    if _changed({k: v for k, v in old_aliases.items() if k != "aliases"},
+                {k: v for k, v in new_aliases.items() if k != "aliases"}):
+        return None, "alias map layout changed"
+
+    changes: Changes = {}
+    for section in ("route_rules", "constraints"):
+        old_entries, new_entries = old_policy.get(section, []), new_policy.get(section, [])
+        old_keyed, new_keyed = _keyed(old_entries), _keyed(new_entries)
+        if old_keyed is None or new_keyed is None:
+            if old_entries != new_entries:
+                return None, f"{section} without unique ids changed"
+            old_keyed = new_keyed = {}
+        common = [i for i in old_keyed if i in new_keyed]
+        if common != [i for i in new_keyed if i in old_keyed]:
+            # Ties in priority resolve by list position.
+            return None, f"{section} reordered"
+        changes[section] = _changed(old_keyed, new_keyed)
+    changes["slots"] = _changed(old_policy.get("slots", {}), new_policy.get("slots", {}))
+    changes["models"] = _changed(old_policy.get("models", {}), new_policy.get("models", {}))
+    changes["models"] |= _changed(old_aliases.get("aliases", {}), new_aliases.get("aliases", {}))
+    summary = "; ".join(f"{k}: {', '.join(sorted(v))}" for k, v in changes.items() if v) or "no routing changes"
+    return changes, summary
+
+
+def affected(deps: Dict[str, Any], changes: Changes, new_policy: Dict[str, Any]) -> bool:
+    """True when a case recorded under the old sources may route differently now."""
+    for section in ("slots", "models"):
+        if changes[section] & set(deps[section]):
+            return True
+    for section in ("route_rules", "constraints"):
+        if changes[section] & set(deps[section]):
+            return True
+        # A changed or added entry may now match a case it used to miss.
+        for entry in new_policy.get(section, []):
+            if entry.get("id") in changes[section] and _rule_matches(deps["labels"], entry):
+                return True
+    return False
+
+
+def load_index(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        doc = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return doc if isinstance(doc, dict) and doc.get("version") == INDEX_VERSION else None
+
+
+def save_index(path: Path, doc: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(doc, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def generation_for(index: Dict[str, Any], sources: Dict[str, Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """The generation recorded from exactly these {"policy"|"aliases": {"path", "sha256"}} sources."""
+    for gen in index.get("generations", []):
+        if all(gen.get(name) == sources[name] for name in ("policy", "aliases")):
+            return gen
+    return None
+
+
+def add_generation(index: Optional[Dict[str, Any]], engine: str, gen: Dict[str, Any]) -> Dict[str, Any]:
+    """Index with `gen` as the newest generation (replacing one for the same sources)."""
+    kept = []
+    if index is not None and index.get("engine") == engine:
+        kept = [g for g in index.get("generations", []) if any(g.get(n) != gen[n] for n in ("policy", "aliases"))]
+    return {"version": INDEX_VERSION, "engine": engine, "generations": [gen] + kept[:MAX_GENERATIONS - 1]}
+
+
+def git_show(ref: str, path: Path) -> Optional[bytes]:
+    """Contents of `path` at `ref` in its repository, or None (no repo, no such ref or file).
+
+    An empty `ref` reads the staged copy from the git index.
+    """
+    path = path.resolve()
+    try:
+        top = subprocess.run(["git", "-C", str(path.parent), "rev-parse", "--show-toplevel"],
+                             capture_output=True, check=True, text=True).stdout.strip()
+        rel = path.relative_to(Path(top).resolve()).as_posix()
+        return subprocess.run(["git", "-C", top, "show", f"{ref}:{rel}"], capture_output=True, check=True).stdout
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
@@ -1,23 +1,48 @@
 #!/usr/bin/env python3
-"""Run standard smoke tests against the routing policy."""
+"""Run standard smoke tests against the routing policy.
+
+Every case is routed in-process against one loaded policy; `--jobs N`
+spreads large case files over N worker processes, each loading the policy
+once. Per-case and whole-suite times are reported, and `--junit FILE`
+writes a JUnit XML report for CI.
+
+Every run over the whole case file also records a dependency index (see
+smoke_index.py); `--changed-since REF` uses it to re-run only the cases a
+policy/alias change since REF can affect, falling back to a full run when
+the index does not match REF. `--staged` reads the policy, alias map and
+case file from the git index instead of the working tree (the routing code
+itself always comes from the working tree), so a pre-commit hook checks
+what is being committed.
+"""
 
 from __future__ import annotations
 
 import argparse
 import json
-import subprocess
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+from router import DEFAULT_ALIASES, DEFAULT_POLICY, CompiledPolicy, Router
+from smoke_index import (
+    add_generation,
+    affected,
+    case_deps,
+    case_hash,
+    default_index_path,
+    diff_sources,
+    engine_hash,
+    generation_for,
+    git_show,
+    load_index,
+    save_index,
+    sha256,
+)
 
-def _load_json(path: Path) -> Dict[str, Any]:
-    try:
-        return json.loads(path.read_text())
-    except FileNotFoundError:
-        raise SystemExit(f"File not found: {path}")
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"Invalid JSON in {path}: {exc}")
+CASE_CHUNK = 256
+
+_worker_router: Optional[Router] = None
 
 
 def _parse_args() -> argparse.Namespace:
@@ -25,23 +50,18 @@ def _parse_args() -> argparse.Namespace:
     skill_root = here.parents[1]
     p = argparse.ArgumentParser(description="Run routing smoke tests.")
     p.add_argument("--cases", default=str(skill_root / "assets" / "smoke-routes.json"))
-    p.add_argument("--router", default=str(skill_root / "scripts" / "select_model.py"))
+    p.add_argument("--policy", default=str(DEFAULT_POLICY))
+    p.add_argument("--aliases", default=str(DEFAULT_ALIASES))
     p.add_argument("--case-id", action="append", default=[], help="Run only specific case id(s)")
     p.add_argument("--pretty", action="store_true", help="Pretty-print failures/results")
+    p.add_argument("--jobs", type=int, default=1, help="Route cases on N worker processes (for large case files)")
+    p.add_argument("--junit", metavar="FILE", help="Also write a JUnit XML report to FILE")
+    p.add_argument("--changed-since", metavar="REF", help="Run only cases affected by policy/alias changes since git REF (full run when the index is stale)")
+    p.add_argument("--index", metavar="FILE", help="Dependency index (default: per case file in the snapshot cache dir)")
+    p.add_argument("--staged", action="store_true", help="Test the staged (git index) policy, alias map and cases instead of the working tree")
     return p.parse_args()
 
 
-def _run_router(router: Path, labels: Dict[str, Any]) -> Dict[str, Any]:
-    cmd = [sys.executable, str(router), "--labels-json", json.dumps(labels)]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode not in (0, 2):
-        raise RuntimeError(f"router failed rc={proc.returncode}: {proc.stderr.strip() or proc.stdout.strip()}")
-    try:
-        return json.loads(proc.stdout)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"router output is not JSON: {exc}: {proc.stdout[:500]}")
-
-
 def _flatten_models(out: Dict[str, Any]) -> List[str]:
     models = []
     if out.get("primary"):
@@ -95,10 +115,153 @@ def _assert_case(case: Dict[str, Any], out: Dict[str, Any]) -> List[str]:
     return errs
 
 
+def _run_case(router: Router, case: Dict[str, Any]) -> Dict[str, Any]:
+    """Route and check one case; only the fields the reports need are kept."""
+    started = time.perf_counter()
+    try:
+        out = router.route(case.get("labels", {}))
+        errs = _assert_case(case, out)
+    except Exception as exc:
+        errs = [str(exc)]
+        out = None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return {
+        "hash": case_hash(case),
+        "deps": case_deps(router.policy, router.aliases, out) if out is not None else None,
+        "id": case.get("id", "unknown"),
+        "ok": not errs,
+        "errors": errs,
+        "primary": (out or {}).get("primary"),
+        "matched_rules": (out or {}).get("matched_rules", []),
+        "stage_slots": _stage_slots(out or {}),
+        "ms": round(elapsed_ms, 3),
+    }
+
+
+def _router(policy: Dict[str, Any], alias_doc: Dict[str, Any]) -> Router:
+    compiled = CompiledPolicy(policy, aliases=alias_doc.get("aliases", {}))
+    assert compiled.candidates is not None
+    return Router(policy, compiled.candidates.aliases, compiled=compiled)
+
+
+def _init_worker(policy: Dict[str, Any], alias_doc: Dict[str, Any]) -> None:
+    global _worker_router
+    _worker_router = _router(policy, alias_doc)
+
+
+def _run_chunk(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    assert _worker_router is not None
+    return [_run_case(_worker_router, case) for case in cases]
+
+
+def _run_cases(cases: List[Dict[str, Any]], sources: Dict[str, Any], jobs: int) -> List[Dict[str, Any]]:
+    docs = (sources["policy"]["doc"], sources["aliases"]["doc"])
+    if jobs <= 1 or len(cases) <= CASE_CHUNK:
+        router = _router(*docs)
+        return [_run_case(router, case) for case in cases]
+    from multiprocessing import Pool
+
+    chunks = [cases[i:i + CASE_CHUNK] for i in range(0, len(cases), CASE_CHUNK)]
+    results: List[Dict[str, Any]] = []
+    with Pool(jobs, initializer=_init_worker, initargs=docs) as pool:
+        for part in pool.imap(_run_chunk, chunks):
+            results.extend(part)
+    return results
+
+
+def _write_junit(path: str, results: List[Dict[str, Any]], elapsed_s: float, suite: str) -> None:
+    import xml.etree.ElementTree as ET
+
+    failures = sum(1 for r in results if not r["ok"])
+    root = ET.Element("testsuite", name=suite, tests=str(len(results)), failures=str(failures), errors="0", time=f"{elapsed_s:.3f}")
+    for r in results:
+        case = ET.SubElement(root, "testcase", classname=suite, name=str(r["id"]), time=f"{r['ms'] / 1000:.6f}")
+        if not r["ok"]:
+            failure = ET.SubElement(case, "failure", message=r["errors"][0])
+            failure.text = "\n".join(r["errors"])
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def _select_changed(
+    cases: List[Dict[str, Any]],
+    index: Optional[Dict[str, Any]],
+    sources: Dict[str, Any],
+    ref: str
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]], str]:
+    """(cases to run, index generation they were selected against, note); None means run everything."""
+    if index is None:
+        return None, None, "no dependency index"
+    old_data = {name: git_show(ref, Path(sources[name]["path"])) for name in ("policy", "aliases")}
+    if any(data is None for data in old_data.values()):
+        return None, None, f"cannot read sources at {ref}"
+    gen = None
+    if index.get("engine") == sources["engine"]:
+        gen = generation_for(index, {name: {"path": sources[name]["path"], "sha256": sha256(old_data[name] or b"")}
+                                     for name in ("policy", "aliases")})
+    if gen is None:
+        return None, None, f"dependency index does not match {ref}"
+    try:
+        old_policy, old_aliases = (json.loads(old_data[name] or b"") for name in ("policy", "aliases"))
+    except ValueError:
+        return None, None, f"sources at {ref} are not valid JSON"
+    changes, summary = diff_sources(old_policy, old_aliases, sources["policy"]["doc"], sources["aliases"]["doc"])
+    if changes is None:
+        return None, None, summary
+    recorded = gen.get("cases", {})
+    selected = []
+    for case in cases:
+        entry = recorded.get(case.get("id"))
+        if entry is None or entry["hash"] != case_hash(case) or affected(entry["deps"], changes, sources["policy"]["doc"]):
+            selected.append(case)
+    return selected, gen, f"{len(selected)}/{len(cases)} case(s) affected since {ref} ({summary})"
+
+
+def _update_index(
+    path: Path,
+    index: Optional[Dict[str, Any]],
+    base: Optional[Dict[str, Any]],
+    sources: Dict[str, Any],
+    results: List[Dict[str, Any]],
+    case_ids: List[str]
+) -> None:
+    """Record a generation for `sources`: `base`'s entries (cases skipped as unaffected) plus this run's."""
+    entries = dict(base.get("cases", {})) if base else {}
+    for r in results:
+        if r["deps"] is None or not r["ok"]:
+            entries.pop(r["id"], None)  # failed: always re-run
+        else:
+            entries[r["id"]] = {"hash": r["hash"], "deps": r["deps"]}
+    gen = {
+        "policy": {k: v for k, v in sources["policy"].items() if k != "doc"},
+        "aliases": {k: v for k, v in sources["aliases"].items() if k != "doc"},
+        "cases": {cid: entries[cid] for cid in case_ids if cid in entries},
+    }
+    try:
+        save_index(path, add_generation(index, sources["engine"], gen))
+    except OSError as exc:
+        print(f"[smoke_test_routes] cannot write dependency index {path}: {exc}", file=sys.stderr)
+
+
+def _read(path: str, staged: bool) -> bytes:
+    if not staged:
+        return Path(path).read_bytes()
+    data = git_show("", Path(path))
+    if data is None:
+        raise SystemExit(f"--staged: {path} is not in a git index")
+    return data
+
+
+def _sources(policy: str, aliases: str, staged: bool = False) -> Dict[str, Any]:
+    sources: Dict[str, Any] = {"engine": engine_hash()}
+    for name, path in (("policy", policy), ("aliases", aliases)):
+        data = _read(path, staged)
+        sources[name] = {"path": str(Path(path).resolve()), "sha256": sha256(data), "doc": json.loads(data)}
+    return sources
+
+
 def main() -> None:
     args = _parse_args()
-    cases_doc = _load_json(Path(args.cases))
-    router = Path(args.router)
+    cases_doc = json.loads(_read(args.cases, args.staged))
     selected = set(args.case_id)
 
     cases = cases_doc.get("cases", [])
@@ -109,45 +272,50 @@ def main() -> None:
             print(f"ERROR: Unknown case id(s): {', '.join(missing)}")
             sys.exit(2)
 
-    failures = 0
-    results = []
-    for case in cases:
-        cid = case.get("id", "unknown")
-        try:
-            out = _run_router(router, case.get("labels", {}))
-            errs = _assert_case(case, out)
-        except Exception as exc:
-            errs = [str(exc)]
-            out = None
-        results.append((cid, errs, out))
-        if errs:
-            failures += 1
+    index_path = Path(args.index) if args.index else default_index_path(args.cases)
+    index = load_index(index_path)
+    sources = _sources(args.policy, args.aliases, args.staged)
+    all_ids = [c.get("id", "unknown") for c in cases]
+    skipped = 0
+    base = None
+    if args.changed_since and not selected:
+        changed, base, note = _select_changed(cases, index, sources, args.changed_since)
+        if changed is None:
+            note = f"full run: {note}"
+        else:
+            skipped = len(cases) - len(changed)
+            cases = changed
+        print(f"[smoke_test_routes] {note}", file=sys.stderr)
+
+    started = time.perf_counter()
+    results = _run_cases(cases, sources, args.jobs)
+    elapsed_s = time.perf_counter() - started
+    failures = sum(1 for r in results if not r["ok"])
+    if not selected:
+        # Skipped cases route exactly as recorded in `base`, so they carry over.
+        _update_index(index_path, index, base, sources, results, all_ids)
+
+    if args.junit:
+        _write_junit(args.junit, results, elapsed_s, Path(args.cases).stem)
 
     if args.pretty:
-        for cid, errs, out in results:
-            status = "PASS" if not errs else "FAIL"
-            print(f"[{status}] {cid}")
-            if errs:
-                for e in errs:
-                    print(f"  - {e}")
-            if out is not None:
-                print(f"  primary: {out.get('primary')}")
-                print(f"  matched_rules: {', '.join(out.get('matched_rules', []))}")
-                print(f"  stage_slots: {', '.join(_stage_slots(out))}")
+        for r in results:
+            status = "PASS" if r["ok"] else "FAIL"
+            print(f"[{status}] {r['id']} ({r['ms']:.2f}ms)")
+            for e in r["errors"]:
+                print(f"  - {e}")
+            if r["primary"] is not None or r["stage_slots"]:
+                print(f"  primary: {r['primary']}")
+                print(f"  matched_rules: {', '.join(r['matched_rules'])}")
+                print(f"  stage_slots: {', '.join(r['stage_slots'])}")
+        print(f"{len(results)} case(s), {failures} failure(s), {skipped} skipped in {elapsed_s * 1000:.1f}ms (jobs={max(1, args.jobs)})")
     else:
         summary = {
             "total": len(results),
             "failures": failures,
-            "results": [
-                {
-                    "id": cid,
-                    "ok": not errs,
-                    "errors": errs,
-                    "primary": (out or {}).get("primary"),
-                    "stage_slots": _stage_slots(out or {})
-                }
-                for cid, errs, out in results
-            ]
+            "skipped": skipped,
+            "elapsed_ms": round(elapsed_s * 1000, 3),
+            "results": [{k: v for k, v in r.items() if k not in ("matched_rules", "hash", "deps")} for r in results]
         }
         print(json.dumps(summary, ensure_ascii=False))
 
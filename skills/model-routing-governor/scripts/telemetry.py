@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Local latency/outcome telemetry for executed routes (SQLite, stdlib only).
+
+Every `route_openclaw_agent.py --run` attempt appends one row (model,
+provider, agent, duration, exit code, output size) and updates a per-model
+summary: EWMA latency and failure rate, consecutive failures, and p50/p90/p99
+over the last WINDOW successful runs. Only the last WINDOW rows per model are
+kept.
+
+`adaptive_scores()` turns the summaries into the per-model (demoted, score)
+map that `Router(adaptive=...)` uses to reorder candidates within a stage.
+The score is the expected time to a successful answer,
+ewma_ms / (1 - ewma_fail); models failing DEMOTE_AFTER times in a row are
+demoted to the end of their stage until they succeed again.
+
+`load_hedge_delay_ms()` gives route_openclaw_agent.py --hedge the primary's
+p50/p90/p99 latency (p90 by default) as its hedge delay.
+
+Run directly to print the summaries as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+TELEMETRY_ENV = "OC_ROUTE_TELEMETRY"
+EWMA_ALPHA = 0.2
+WINDOW = 200
+MIN_SAMPLES = 5
+DEMOTE_AFTER = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    model TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    agent TEXT,
+    duration_ms REAL NOT NULL,
+    returncode INTEGER NOT NULL,
+    output_bytes INTEGER NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, id);
+CREATE TABLE IF NOT EXISTS summary (
+    model TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    ewma_ms REAL,
+    ewma_fail REAL NOT NULL,
+    consecutive_failures INTEGER NOT NULL,
+    p50_ms REAL,
+    p90_ms REAL,
+    p99_ms REAL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def default_path() -> Path:
+    """Telemetry database (env OC_ROUTE_TELEMETRY, else the XDG state dir)."""
+    if os.environ.get(TELEMETRY_ENV):
+        return Path(os.environ[TELEMETRY_ENV])
+    state_home = os.environ.get("XDG_STATE_HOME") or str(Path.home() / ".local" / "state")
+    return Path(state_home) / "openclaw-dev" / "model-routing-governor" / "telemetry.sqlite3"
+
+
+def _percentile(ordered: list, q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 1)
+
+
+class Telemetry:
+    """One connection shared by the threads of a process; SQLite serializes processes."""
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path) if path else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def record(
+        self,
+        model: str,
+        provider: str,
+        agent: Optional[str],
+        duration_ms: float,
+        returncode: int,
+        output_bytes: int,
+        status: str
+    ) -> None:
+        """Append one attempt and refresh the model's summary in the same transaction."""
+        failed = status != "ok"
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "INSERT INTO runs (ts, model, provider, agent, duration_ms, returncode, output_bytes, status)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), model, provider, agent, duration_ms, returncode, output_bytes, status),
+                )
+                db.execute(
+                    "DELETE FROM runs WHERE model = ? AND id <= ("
+                    " SELECT id FROM runs WHERE model = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (model, model, WINDOW),
+                )
+                row = db.execute(
+                    "SELECT runs, failures, ewma_ms, ewma_fail, consecutive_failures FROM summary WHERE model = ?",
+                    (model,),
+                ).fetchone()
+                runs, failures, ewma_ms, ewma_fail, streak = row or (0, 0, None, 0.0, 0)
+                if not failed:
+                    # Latency is only learned from successes; failures feed the failure rate.
+                    ewma_ms = duration_ms if ewma_ms is None else ewma_ms + EWMA_ALPHA * (duration_ms - ewma_ms)
+                ewma_fail = (1.0 if failed else 0.0) if not runs else ewma_fail + EWMA_ALPHA * (failed - ewma_fail)
+                durations = sorted(d for (d,) in db.execute(
+                    "SELECT duration_ms FROM runs WHERE model = ? AND status = 'ok'", (model,)))
+                db.execute(
+                    "INSERT OR REPLACE INTO summary VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (model, provider, runs + 1, failures + failed, ewma_ms, ewma_fail,
+                     streak + 1 if failed else 0, _percentile(durations, 0.50), _percentile(durations, 0.90),
+                     _percentile(durations, 0.99), time.time()),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def summaries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM summary ORDER BY model")
+            names = [col[0] for col in cursor.description]
+            return {row[0]: dict(zip(names[1:], row[1:])) for row in cursor}
+
+    def adaptive_scores(self) -> Dict[str, Tuple[bool, float]]:
+        """model -> (demoted, expected ms to a successful answer) for models with enough runs."""
+        scores: Dict[str, Tuple[bool, float]] = {}
+        for model, s in self.summaries().items():
+            if s["runs"] < MIN_SAMPLES:
+                continue
+            demoted = s["consecutive_failures"] >= DEMOTE_AFTER
+            if s["ewma_ms"] is None:
+                scores[model] = (demoted, float("inf"))
+                continue
+            scores[model] = (demoted, s["ewma_ms"] / max(0.05, 1.0 - s["ewma_fail"]))
+        return scores
+
+
+def load_adaptive_scores(path: Path | str | None = None) -> Dict[str, Tuple[bool, float]]:
+    """Scores for `Router(adaptive=...)`; empty (no reordering) when there is no telemetry yet."""
+    target = Path(path) if path else default_path()
+    if not target.exists():
+        return {}
+    try:
+        store = Telemetry(target)
+    except sqlite3.Error as exc:
+        print(f"[telemetry] unreadable {target}: {exc}", file=sys.stderr)
+        return {}
+    try:
+        return store.adaptive_scores()
+    finally:
+        store.close()
+
+
+HEDGE_PERCENTILES = (50, 90, 99)
+
+
+def load_hedge_delay_ms(model: str, path: Path | str | None = None, percentile: int = 90) -> Optional[float]:
+    """The model's pNN successful-run latency (50, 90 or 99), or None without MIN_SAMPLES runs of telemetry."""
+    if percentile not in HEDGE_PERCENTILES:
+        raise ValueError(f"percentile must be one of {HEDGE_PERCENTILES}, got {percentile}")
+    target = Path(path) if path else default_path()
+    if not target.exists():
+        return None
+    try:
+        store = Telemetry(target)
+    except sqlite3.Error as exc:
+        print(f"[telemetry] unreadable {target}: {exc}", file=sys.stderr)
+        return None
+    try:
+        summary = store.summaries().get(model)
+    finally:
+        store.close()
+    if not summary or summary["runs"] < MIN_SAMPLES:
+        return None
+    return summary[f"p{percentile}_ms"]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Print per-model latency/outcome summaries.")
+    p.add_argument("--db", help=f"Telemetry database (default: ${TELEMETRY_ENV} or the XDG state dir)")
+    p.add_argument("--scores", action="store_true", help="Print the adaptive (demoted, score) map instead.")
+    args = p.parse_args()
+    path = Path(args.db) if args.db else default_path()
+    if not path.exists():
+        raise SystemExit(f"No telemetry at {path}")
+    store = Telemetry(path)
+    doc: Any = store.adaptive_scores() if args.scores else store.summaries()
+    store.close()
+    print(json.dumps(doc, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
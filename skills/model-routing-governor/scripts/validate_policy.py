@@ -1,22 +1,37 @@
 #!/usr/bin/env python3
-"""Validate model routing policy and alias files."""
+"""Validate model routing policy and alias files.
+
+`--analyze` adds a static analysis over the finite label domains (each key's
+`label_domains` values, or the values the policy mentions plus one "other"
+value standing for everything else). Every `when` / `when_any` clause is a
+box (a value set per key), so rule and constraint reachability and coverage
+are exact set computations. It reports unreachable rules, rules whose
+effects are always replaced by a later `stages` rule, constraints that never
+fire, and slots/models no surviving rule can reach. A rule with `notes` is
+never reported as overwritten: its notes still apply when a later rule
+replaces its stages. `--emit-pruned FILE`
+writes the policy without them: routes keep the same stages, candidates and
+blocks for every label set in the domains, but `matched_rules` no longer
+lists the pruned rules.
+"""
 
 from __future__ import annotations
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from router import CompiledPolicy, _canonicalize, load_policy_files, save_snapshot
 
+OTHER = "<other>"
 
-def load_json(path: Path) -> Dict[str, Any]:
-    try:
-        return json.loads(path.read_text())
-    except FileNotFoundError:
-        raise SystemExit(f"File not found: {path}")
-    except json.JSONDecodeError as exc:
-        raise SystemExit(f"Invalid JSON in {path}: {exc}")
+Box = Dict[str, FrozenSet[str]]
 
 
 def parse_args() -> argparse.Namespace:
@@ -25,6 +40,10 @@ def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Validate routing policy JSON and alias map JSON.")
     p.add_argument("--policy", default=str(skill_root / "assets" / "routing-policy.json"))
     p.add_argument("--aliases", default=str(skill_root / "assets" / "alias-map.json"))
+    p.add_argument("--no-snapshot", dest="snapshot", action="store_false", help="Parse the JSON files even if a compiled snapshot exists.")
+    p.add_argument("--startup-profile", action="store_true", help="Report time spent importing, loading and validating on stderr.")
+    p.add_argument("--analyze", action="store_true", help="Also report unreachable/overwritten rules, dead constraints and orphan slots/models.")
+    p.add_argument("--emit-pruned", metavar="FILE", help="Write the policy without the findings of --analyze to FILE (implies --analyze).")
     return p.parse_args()
 
 
@@ -83,6 +102,30 @@ def validate(policy: Dict[str, Any], alias_cfg: Dict[str, Any]) -> List[str]:
                 if stage["slot"] not in slots:
                     errors.append(f"Rule {rid} references unknown slot {stage['slot']!r}")
 
+    scoring = policy.get("scoring")
+    if scoring is not None:
+        if not isinstance(scoring, dict):
+            errors.append("'scoring' must be an object")
+            scoring = {}
+        for field in ["weights", "tier_points"]:
+            for name, value in scoring.get(field, {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    errors.append(f"Scoring {field}.{name} must be a number")
+        for label, by_value in scoring.get("budget_weights", {}).items():
+            if label not in ("cost_budget", "latency_budget"):
+                errors.append(f"Scoring budget_weights has unknown label {label!r}")
+            if not isinstance(by_value, dict):
+                errors.append(f"Scoring budget_weights.{label} must be an object")
+        for label, by_value in scoring.get("capability_labels", {}).items():
+            if not isinstance(by_value, dict):
+                errors.append(f"Scoring capability_labels.{label} must be an object")
+
+    domains = policy.get("label_domains")
+    if domains is not None:
+        if not isinstance(domains, dict) or not all(
+                isinstance(values, list) and all(isinstance(v, str) for v in values) for values in domains.values()):
+            errors.append("'label_domains' must map label keys to lists of strings")
+
     # Alias loop detection
     for src in aliases:
         seen = set()
@@ -97,16 +140,165 @@ def validate(policy: Dict[str, Any], alias_cfg: Dict[str, Any]) -> List[str]:
     return errors
 
 
+def _values(expected: Any) -> FrozenSet[str]:
+    return frozenset(expected if isinstance(expected, list) else [expected])
+
+
+def label_domains(policy: Dict[str, Any]) -> Dict[str, FrozenSet[str]]:
+    """Finite domain per routed key; OTHER stands for every undeclared value (and a missing label)."""
+    declared = policy.get("label_domains", {})
+    defaults = policy.get("defaults", {})
+    mentioned: Dict[str, set] = {}
+    for entry in list(policy.get("route_rules", [])) + list(policy.get("constraints", [])):
+        for cond in [entry.get("when") or {}] + list(entry.get("when_any", [])):
+            for key, expected in cond.items():
+                mentioned.setdefault(key, set()).update(_values(expected))
+    domains = {}
+    for key in mentioned:
+        values = set(declared.get(key, mentioned[key]))
+        if key in defaults:
+            values.add(str(defaults[key]))
+        if key not in declared or key not in defaults:
+            values.add(OTHER)
+        domains[key] = frozenset(values)
+    return domains
+
+
+def _boxes(entry: Dict[str, Any], domains: Dict[str, FrozenSet[str]]) -> List[Box]:
+    """The label region an entry matches, as a union of non-empty boxes."""
+    base = {key: domains[key] & _values(expected) for key, expected in (entry.get("when") or {}).items()}
+    clauses = entry.get("when_any")
+    if clauses is None:
+        candidates = [base]
+    else:
+        candidates = []
+        for cond in clauses:
+            box = dict(base)
+            for key, expected in cond.items():
+                box[key] = box.get(key, domains[key]) & _values(expected)
+            candidates.append(box)
+    return [box for box in candidates if all(box.values())]
+
+
+def _covered(box: Box, cover: List[Box], domains: Dict[str, FrozenSet[str]]) -> bool:
+    """True when every label set in `box` lies in some box of `cover`."""
+    relevant = []
+    for other in cover:
+        if all(box.get(k, domains[k]) & values for k, values in other.items()):
+            relevant.append(other)
+    if not relevant:
+        return False
+    for other in relevant:
+        if all(box.get(k, domains[k]) <= values for k, values in other.items()):
+            return True
+    # Split on a key the first relevant box only partly covers and check both halves.
+    other = relevant[0]
+    key = next(k for k, values in other.items() if not box.get(k, domains[k]) <= values)
+    current = box.get(key, domains[key])
+    inside, outside = current & other[key], current - other[key]
+    return _covered({**box, key: inside}, relevant, domains) and _covered({**box, key: outside}, relevant, domains)
+
+
+def analyze(policy: Dict[str, Any], alias_cfg: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Static findings; every list holds ids (rules, constraints, slots, models)."""
+    domains = label_domains(policy)
+    aliases = alias_cfg.get("aliases", {})
+    rules = sorted(policy.get("route_rules", []), key=lambda r: int(r.get("priority", 1000)))
+    regions = [_boxes(rule, domains) for rule in rules]
+    ids = [rule.get("id", f"route_rules[{i}]") for i, rule in enumerate(rules)]
+
+    unreachable = [ids[i] for i, region in enumerate(regions) if not region]
+    overwritten = []
+    for i, region in enumerate(regions):
+        if not region or rules[i].get("notes"):
+            continue
+        later = [box for j in range(i + 1, len(rules)) if "stages" in rules[j] for box in regions[j]]
+        if all(_covered(box, later, domains) for box in region):
+            overwritten.append(ids[i])
+
+    dead_constraints = [
+        c.get("id", f"constraints[{i}]") for i, c in enumerate(policy.get("constraints", [])) if not _boxes(c, domains)
+    ]
+
+    dead = set(unreachable) | set(overwritten)
+    used_slots = {
+        stage["slot"]
+        for rule_id, rule in zip(ids, rules) if rule_id not in dead
+        for stage in list(rule.get("stages", [])) + list(rule.get("augment_stages", []))
+    }
+    used_models = {
+        _canonicalize(name, aliases)
+        for slot_id in used_slots
+        for name in policy.get("slots", {}).get(slot_id, {}).get("candidates", [])
+    }
+    return {
+        "unreachable_rules": unreachable,
+        "overwritten_rules": overwritten,
+        "dead_constraints": dead_constraints,
+        "orphan_slots": sorted(set(policy.get("slots", {})) - used_slots),
+        "orphan_models": sorted(set(policy.get("models", {})) - used_models),
+    }
+
+
+def prune(policy: Dict[str, Any], findings: Dict[str, List[str]]) -> Dict[str, Any]:
+    """The policy without the entries `analyze` flagged."""
+    dead_rules = set(findings["unreachable_rules"]) | set(findings["overwritten_rules"])
+    dead_constraints = set(findings["dead_constraints"])
+    pruned = dict(policy)
+    pruned["route_rules"] = [r for i, r in enumerate(policy.get("route_rules", [])) if r.get("id", f"route_rules[{i}]") not in dead_rules]
+    pruned["constraints"] = [c for i, c in enumerate(policy.get("constraints", [])) if c.get("id", f"constraints[{i}]") not in dead_constraints]
+    pruned["slots"] = {k: v for k, v in policy.get("slots", {}).items() if k not in set(findings["orphan_slots"])}
+    pruned["models"] = {k: v for k, v in policy.get("models", {}).items() if k not in set(findings["orphan_models"])}
+    return pruned
+
+
+def _report(findings: Dict[str, List[str]]) -> None:
+    labels = {
+        "unreachable_rules": "unreachable rule (no label set in the domains matches it)",
+        "overwritten_rules": "rule always overwritten by a later 'stages' rule",
+        "dead_constraints": "constraint never fires",
+        "orphan_slots": "slot not used by any live rule",
+        "orphan_models": "model not in any live slot",
+    }
+    for kind, ids in findings.items():
+        for item in ids:
+            print(f"WARN: {labels[kind]}: {item}")
+    print("ANALYSIS: " + ", ".join(f"{len(ids)} {kind.replace('_', ' ')}" for kind, ids in findings.items()))
+
+
 def main() -> None:
+    started = time.perf_counter()
     args = parse_args()
-    policy = load_json(Path(args.policy))
-    aliases = load_json(Path(args.aliases))
+    loading = time.perf_counter()
+    policy, aliases, compiled, info = load_policy_files(Path(args.policy), Path(args.aliases), snapshot=args.snapshot)
+    validating = time.perf_counter()
     errors = validate(policy, aliases)
+    if not errors and compiled is None and args.snapshot:
+        # Valid sources: leave a snapshot behind for the routing CLIs.
+        try:
+            save_snapshot(info["fingerprint"], CompiledPolicy(policy, aliases=aliases["aliases"]), aliases)
+        except (TypeError, ValueError):
+            pass
+    if args.startup_profile:
+        done = time.perf_counter()
+        print(
+            f"[validate_policy] startup: import={(started - _IMPORT_START) * 1000:.2f}ms "
+            f"args={(loading - started) * 1000:.2f}ms load={(validating - loading) * 1000:.2f}ms "
+            f"validate={(done - validating) * 1000:.2f}ms snapshot={info['snapshot']}",
+            file=sys.stderr
+        )
     if errors:
         for err in errors:
             print(f"ERROR: {err}")
         sys.exit(1)
     print("OK: policy and alias map are structurally valid")
+    findings: Optional[Dict[str, List[str]]] = None
+    if args.analyze or args.emit_pruned:
+        findings = analyze(policy, aliases)
+        _report(findings)
+    if args.emit_pruned and findings is not None:
+        Path(args.emit_pruned).write_text(json.dumps(prune(policy, findings), indent=2, ensure_ascii=False) + "\n")
+        print(f"Wrote pruned policy to {args.emit_pruned}")
 
 
 if __name__ == "__main__":